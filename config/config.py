@@ -2,8 +2,10 @@ import streamlit as st
 from datetime import datetime
 import os
 from dotenv import load_dotenv
-from utils.database import init_db, get_all_customers, add_customer
+from utils.database import init_db, get_all_customers, add_customer, save_transaction
 from utils.helpers import calculate_risk_score, get_risk_category
+from utils.monitoring import MONITORING_ALERT_PREFIX
+from utils.transaction_store import TransactionStore, load_transaction_store, new_transaction_id
 from modules.auth.users import init_user_db
 
 # Load environment variables
@@ -246,15 +248,15 @@ def initialize_session_state():
             if alert["customer_id"] in st.session_state.customers
         ]
     
-    # Initialize transaction logs if not exist, but check for valid customer references
-    if 'transaction_logs' not in st.session_state:
-        st.session_state.transaction_logs = []
+    # Initialize the transaction store if not exist, but check for valid customer references
+    if 'transaction_store' not in st.session_state:
+        st.session_state.transaction_store = load_transaction_store(st.session_state.customers)
     else:
         # Clean up transactions for deleted customers
-        st.session_state.transaction_logs = [
-            tx for tx in st.session_state.transaction_logs 
-            if tx["customer_id"] in st.session_state.customers
-        ]
+        store = st.session_state.transaction_store
+        kept = [tx for tx in store.records() if tx["customer_id"] in st.session_state.customers]
+        if len(kept) != len(store):
+            st.session_state.transaction_store = TransactionStore.from_records(kept)
     
     # Initialize audit logs if not exist
     if 'audit_logs' not in st.session_state:
@@ -266,8 +268,8 @@ def initialize_session_state():
         conn = get_db()
         cursor = conn.cursor()
         
-        # Clear existing alerts
-        cursor.execute('DELETE FROM alerts')
+        # Clear existing alerts, keeping those written by the monitoring worker
+        cursor.execute("DELETE FROM alerts WHERE id NOT LIKE ?", (f"{MONITORING_ALERT_PREFIX}%",))
         conn.commit()
         
         # Reset session alerts
@@ -277,6 +279,18 @@ def initialize_session_state():
         _create_demo_alerts(st.session_state.customers)
         
         conn.close()
+    
+    # Pick up alerts raised by the background monitoring worker
+    _sync_monitoring_alerts()
+
+def _sync_monitoring_alerts():
+    """Merge worker-generated alerts from the database into session state"""
+    from utils.database import get_all_alerts
+    
+    known_ids = {alert["id"] for alert in st.session_state.alerts}
+    for alert in get_all_alerts(id_prefix=MONITORING_ALERT_PREFIX):
+        if alert["id"] not in known_ids and alert["customer_id"] in st.session_state.customers:
+            st.session_state.alerts.append(alert)
 
 def _create_demo_alerts(customers):
     """Create some demo alerts"""
@@ -339,15 +353,16 @@ def _create_demo_alerts(customers):
             print(f"Save result: {save_result}")  # Debug print
 
 def _create_demo_transactions(customers):
-    """Create some demo transactions"""
-    if 'transaction_logs' not in st.session_state:
-        st.session_state.transaction_logs = []
+    """Create some demo transactions; the session store loads them from the database"""
+    if 'transaction_store' in st.session_state:
+        # Rebuilt from the database with the demo history
+        del st.session_state.transaction_store
     
     # Add sample transactions for each customer
     for cust_id, customer in customers.items():
         # Add 2-3 transactions per customer
         for i in range(2):
-            tx_id = f"TX{len(st.session_state.transaction_logs) + 1:04d}"
+            tx_id = new_transaction_id("TX")
             amount = 50_000_000 if customer['income_level'] == "High" else 10_000_000
             
             transaction = {
@@ -360,7 +375,7 @@ def _create_demo_transactions(customers):
                 "notes": f"Monthly {customer['transaction_profile']}",
                 "risk_flag": customer['suspicious_activity']
             }
-            st.session_state.transaction_logs.append(transaction)
+            save_transaction(transaction)
 
 def get_env_variable(key, default=None):
     """Get environment variable with priority order:
@@ -0,0 +1,161 @@
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from modules.hybrid_verifier import StagePool
+from utils.database import (
+    DB_PATH,
+    get_customer,
+    enqueue_verification_jobs,
+    claim_verification_job,
+    complete_verification_job,
+    requeue_processing_verification_jobs
+)
+
+# Verifications running at once. Each one also uses the verifier's OCR
+# pool, so this stays small.
+BATCH_MAX_WORKERS = 2
+# Stage threads a verification can hold at once (OCR and vision run
+# concurrently when the cascade is off)
+STAGES_PER_VERIFICATION = 2
+BATCH_MAX_ATTEMPTS = 2
+BATCH_POLL_SECONDS = 1.0
+
+BATCH_UPLOAD_DIR = DB_PATH.parent / "batch_uploads"
+BATCH_FILE_TYPES = (".jpg", ".jpeg", ".png", ".pdf")
+
+
+def new_batch_id():
+    return f"BAT{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def create_batch_from_uploads(uploaded_files, doc_type, customer_id=None):
+    """Save uploaded files and enqueue a job for each; returns (batch_id, job count)"""
+    batch_id = new_batch_id()
+    batch_dir = BATCH_UPLOAD_DIR / batch_id
+    batch_dir.mkdir(parents=True, exist_ok=True)
+
+    files = []
+    for index, uploaded_file in enumerate(uploaded_files):
+        # Prefix with the position so files with the same name do not collide
+        path = batch_dir / f"{index:05d}_{Path(uploaded_file.name).name}"
+        path.write_bytes(uploaded_file.getvalue())
+        files.append((uploaded_file.name, str(path)))
+
+    return batch_id, enqueue_verification_jobs(batch_id, files, doc_type, customer_id)
+
+
+def create_batch_from_directory(directory, doc_type, customer_id=None):
+    """Enqueue a job for every image file in a local directory (in place, not copied)"""
+    directory = Path(directory).expanduser()
+    if not directory.is_dir():
+        raise ValueError(f"Directory not found: {directory}")
+
+    files = [
+        (path.name, str(path.resolve()))
+        for path in sorted(directory.iterdir())
+        if path.is_file() and path.suffix.lower() in BATCH_FILE_TYPES
+    ]
+    if not files:
+        raise ValueError(f"No {', '.join(BATCH_FILE_TYPES)} files in {directory}")
+
+    batch_id = new_batch_id()
+    return batch_id, enqueue_verification_jobs(batch_id, files, doc_type, customer_id)
+
+
+def summarize_verification(results, messages):
+    """Compact, JSON-safe record of a verification for the job table"""
+    combined = results.get("combined_data") or {}
+    ocr_results = results.get("ocr_results") or {}
+    cascade = results.get("cascade") or {}
+    return {
+        "status": results.get("status"),
+        "verification_status": combined.get("verification_status"),
+        "extracted_fields": combined.get("extracted_fields", {}),
+        "matches": combined.get("matches", {}),
+        "validation_scores": combined.get("validation_scores", {}),
+        "ocr_confidence": ocr_results.get("confidence", 0),
+        "path": cascade.get("path"),
+        "messages": [f"{level}: {message}" for level, message in messages if level != "success"]
+    }
+
+
+class BatchVerificationPool:
+    """Background threads running HybridDocumentVerifier over the verification_jobs table
+
+    Lives in the Streamlit server process so the UI can start it and poll
+    the table; jobs survive restarts and are picked up again on start.
+    """
+
+    def __init__(self, verifier, max_workers=BATCH_MAX_WORKERS, max_attempts=BATCH_MAX_ATTEMPTS):
+        self.verifier = verifier
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        # Own stage threads, so batch jobs never queue behind (or hold up)
+        # interactive verifications
+        self.stages = StagePool(max_workers * STAGES_PER_VERIFICATION, "batch-stage")
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        """Requeue jobs interrupted by a previous process and start the workers"""
+        requeued = requeue_processing_verification_jobs()
+        if requeued:
+            print(f"Requeued {requeued} interrupted verification jobs")
+        for index in range(self.max_workers):
+            thread = threading.Thread(target=self._run, name=f"batch-verify-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Stages abandoned after a timeout still hold their threads;
+            # take no new job until a full verification's worth is free
+            if self.stages.free() < STAGES_PER_VERIFICATION:
+                self._stop.wait(BATCH_POLL_SECONDS)
+                continue
+            try:
+                job = claim_verification_job()
+            except Exception as e:
+                print(f"Error claiming verification job: {str(e)}")
+                job = None
+            if job is None:
+                self._stop.wait(BATCH_POLL_SECONDS)
+                continue
+            self.process_job(job)
+
+    def process_job(self, job):
+        """Verify one claimed job and store its outcome"""
+        try:
+            customer = get_customer(job["customer_id"]) if job["customer_id"] else None
+            results, messages = self.verifier.verify_document_in_background(
+                job["file_path"], job["doc_type"], customer, stage_pool=self.stages
+            )
+            if results.get("status") != "completed":
+                raise RuntimeError("; ".join(message for level, message in messages if level == "error") or "Verification failed")
+            complete_verification_job(job["id"], result=summarize_verification(results, messages))
+        except Exception as e:
+            retry = job["attempts"] < self.max_attempts
+            print(f"Verification job {job['id']} failed: {str(e)}")
+            complete_verification_job(job["id"], error=str(e), retry=retry)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_batch_pool(verifier):
+    """Get the process-wide pool, starting it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or not _pool.running:
+            _pool = BatchVerificationPool(verifier)
+            _pool.start()
+    return _pool
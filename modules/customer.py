@@ -8,15 +8,20 @@ from utils.database import (
     delete_customer, 
     get_all_customers,
     archive_customer,
-    get_archived_customers  # Add this import
+    get_archived_customers,  # Add this import
+    enqueue_monitoring_event,
+    save_verification_result,
+    get_latest_verification_result,
+    get_customer_verification_results
 )
 from modules.hybrid_verifier import HybridDocumentVerifier
-import os
-import io
-import base64
+from utils.counterparty_graph import get_counterparty_graph
+from utils.vision_router import get_vision_router
+from utils.blob_store import get_blob_store
+from utils.pdf_document import PdfDocument, is_pdf, PDF_VISION_DPI
+import time
 import json
 from PIL import Image
-import google.generativeai as genai
 from modules.auth.session import login_required
 from modules.auth.roles import Resource, Permission
 
@@ -136,12 +141,52 @@ def _display_additional_info(customer_id, customer):
     st.subheader("Transaction Profile")
     st.write(customer['transaction_profile'])
     
+    # Counterparty network
+    _display_counterparty_network(customer_id)
+    
     # Related alerts
     _display_related_alerts(customer_id)
     
     # Customer transactions
     _display_customer_transactions(customer_id)
 
+def _display_counterparty_network(customer_id):
+    """Display counterparties and customers linked through them"""
+    st.subheader("Counterparty Network")
+    graph = get_counterparty_graph().refresh()
+    
+    counterparties = graph.counterparties_of(customer_id)
+    if not counterparties:
+        st.info("No counterparties recorded for this customer")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    shared = graph.shared_counterparty_customers(customer_id)
+    with col1:
+        st.metric("Counterparties (fan-out)", graph.fan_out_count(customer_id))
+    with col2:
+        st.metric("Customers Sharing Counterparties", len(shared))
+    with col3:
+        st.metric("2-Hop Linked Customers", len(graph.two_hop_neighbours(customer_id)))
+    
+    st.dataframe(
+        pd.DataFrame(counterparties, columns=["Counterparty", "Distinct Senders (fan-in)"]),
+        use_container_width=True
+    )
+    
+    if shared:
+        customers = st.session_state.customers
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "Customer": f"{cid} - {customers[cid]['full_name']}" if cid in customers else cid,
+                    "Shared Counterparties": count
+                }
+                for cid, count in shared.items()
+            ]),
+            use_container_width=True
+        )
+
 def _display_related_alerts(customer_id):
     """Display alerts related to the customer"""
     st.subheader("Related Alerts")
@@ -155,7 +200,8 @@ def _display_related_alerts(customer_id):
 def _display_customer_transactions(customer_id):
     """Display customer transactions"""
     st.subheader("Recent Transactions")
-    customer_transactions = [t for t in st.session_state.transaction_logs if t['customer_id'] == customer_id]
+    store = st.session_state.transaction_store
+    customer_transactions = store.records(store.filter(customer_id=customer_id))
     if customer_transactions:
         transactions_df = pd.DataFrame(customer_transactions)
         transactions_df['amount'] = transactions_df['amount'].apply(lambda x: f"Rp {x:,.0f}")
@@ -302,9 +348,15 @@ def _update_customer(customer_id, data):
         # Recalculate risk score
         data["risk_score"] = calculate_risk_score(data)
         data["risk_category"] = get_risk_category(data["risk_score"])
+        previous_category = st.session_state.customers[customer_id]["risk_category"]
         
         # Update database
         if update_customer(customer_id, data):
+            # Let the monitoring worker re-score and raise any escalation alerts
+            enqueue_monitoring_event("customer", {
+                "customer_id": customer_id,
+                "previous_risk_category": previous_category
+            })
             # Update session state only after successful database update
             st.session_state.customers[customer_id].update(data)
             add_audit_log("Edit Customer", f"Updated customer {customer_id} - {data['full_name']}")
@@ -360,8 +412,8 @@ def _handle_customer_deletion(customer_id):
 def _can_delete_customer(customer_id):
     """Check if customer can be deleted"""
     customer_alerts = [a for a in st.session_state.alerts if a['customer_id'] == customer_id]
-    customer_transactions = [t for t in st.session_state.transaction_logs if t['customer_id'] == customer_id]
-    return not (customer_alerts or customer_transactions)
+    has_transactions = len(st.session_state.transaction_store.filter(customer_id=customer_id)) > 0
+    return not (customer_alerts or has_transactions)
 
 def _customer_form(existing_data=None):
     """Handle customer form fields"""
@@ -507,7 +559,7 @@ def _evaluate_verification_results(results, customer):
         return "Failed", {}
 
 def verify_customer_documents(customer_id, customer):
-    """Enhanced document verification using Gemini Flash"""
+    """Enhanced document verification using the vision models"""
     st.subheader("🔍 Document Verification")
     
     # Display current documents
@@ -515,45 +567,105 @@ def verify_customer_documents(customer_id, customer):
     for doc in customer["documents"]:
         st.info(f"✓ {doc}")
     
+    _display_verification_history(customer_id)
+    
     # Document upload and verification
     doc_type = st.selectbox("Select Document Type", [
         "ID Card (KTP)",
         "Passport",
         "Proof of Address",
         "Tax ID (NPWP)",
-        "Business License"
+        "Business License",
+        "Bank Statement"
     ])
     
-    uploaded_file = st.file_uploader("Upload Document", type=["jpg", "jpeg", "png"])
+    uploaded_file = st.file_uploader("Upload Document", type=["jpg", "jpeg", "png", "pdf"])
     
     if uploaded_file:
         try:
-            image = Image.open(uploaded_file)
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
+            if is_pdf(uploaded_file):
+                # The vision model sees the first page, as in hybrid verification
+                document = PdfDocument(uploaded_file)
+                image = document.render_page(0, dpi=PDF_VISION_DPI).pil
+                caption = f"{doc_type} Preview (page 1 of {document.page_count})"
+            else:
+                image = Image.open(uploaded_file)
+                if image.mode != 'RGB':
+                    image = image.convert('RGB')
+                caption = f"{doc_type} Preview"
             
-            st.image(image, caption=f"{doc_type} Preview", width=400)
+            st.image(image, caption=caption, width=400)
             
             if st.button("Verify Document"):
-                with st.spinner("Analyzing document..."):
-                    results = analyze_document(image, doc_type, customer)
-                    
+                # The same file checked before for this customer is read back instead of analyzed again
+                content_hash = get_blob_store().put(uploaded_file.getvalue())
+                previous = get_latest_verification_result(content_hash, doc_type, customer_id, path="vision_only")
+                if previous:
+                    st.info(f"This document was already analyzed on {previous['created_at']}; showing that result")
+                    results = _results_from_record(previous)
+                else:
+                    with st.spinner("Analyzing document..."):
+                        started = time.monotonic()
+                        results = analyze_document(image, doc_type, customer)
                     if results:
-                        display_verification_results(results, customer_id, customer, doc_type)
-                    else:
-                        st.error("Failed to analyze document")
+                        save_verification_result(
+                            _verification_record(results, customer_id, doc_type, content_hash, time.monotonic() - started)
+                        )
+                
+                if results:
+                    display_verification_results(results, customer_id, customer, doc_type)
+                else:
+                    st.error("Failed to analyze document")
                         
         except Exception as e:
             st.error(f"Verification Error: {str(e)}")
 
+def _display_verification_history(customer_id):
+    """Earlier verification runs of the customer"""
+    history = get_customer_verification_results(customer_id)
+    if not history:
+        return
+    with st.expander(f"🕘 Verification History ({len(history)})"):
+        st.dataframe(pd.DataFrame([
+            {
+                "Date": record["created_at"],
+                "Document": record["doc_type"],
+                "Status": record["status"],
+                "Path": record["path"],
+                "Model": record["model"],
+                "Fields": ", ".join(field for field, value in record["fields"].items() if value),
+                "Seconds": round(record["timings"].get("total_seconds") or 0, 1)
+            }
+            for record in history
+        ]), hide_index=True, use_container_width=True)
+
+def _verification_record(results, customer_id, doc_type, content_hash, seconds):
+    """verification_results row for a vision model document analysis"""
+    return {
+        "customer_id": customer_id,
+        "doc_type": doc_type,
+        "content_hash": content_hash,
+        "status": results.get("verification_status", "Unknown"),
+        "path": "vision_only",
+        "model": results.get("model"),
+        "fields": results.get("extracted_info", {}),
+        "matches": results.get("matches", {}),
+        "confidence_scores": {"authenticity": results.get("authenticity_score")},
+        "timings": {"vision_seconds": seconds, "total_seconds": seconds}
+    }
+
+def _results_from_record(record):
+    """analyze_document results rebuilt from a stored verification_results row"""
+    return {
+        "extracted_info": record["fields"],
+        "matches": record["matches"],
+        "authenticity_score": record["confidence_scores"].get("authenticity") or 0,
+        "verification_status": record["status"]
+    }
+
 def analyze_document(image, doc_type, customer):
-    """Analyze document using Gemini"""
+    """Analyze document with the vision providers"""
     try:
-        # Convert image for Gemini
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='JPEG')
-        img_byte_arr = img_byte_arr.getvalue()
-        
         prompt = f"""Analyze this {doc_type} and verify if it matches the following customer information:
 Name: {customer['full_name']}
 NIK: {customer['nik']}
@@ -578,33 +690,18 @@ Provide a response in the following exact JSON format:
     "verification_status": "Verified/Manual Review/Failed"
 }}"""
 
-        # Create content for Gemini
-        content = {
-            "parts": [
-                {"text": prompt},
-                {"inline_data": {
-                    "mime_type": "image/jpeg",
-                    "data": base64.b64encode(img_byte_arr).decode('utf-8')
-                }}
-            ]
-        }
-        
-        # Generate Gemini response
-        api_key = os.getenv("GEMINI_API_KEY") or st.secrets["GEMINI_API_KEY"]
-        if not api_key:
-            st.error("Gemini API key not found")
-            return None
-            
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-2.0-flash-exp")
-        response = model.generate_content(content)
-        response_text = response.text.strip()
+        # Identical verifications are answered from the vision response cache;
+        # otherwise the router fails over or hedges across the vision providers
+        answer = get_vision_router().analyze(image, prompt)
+        response_text = answer["text"].strip()
         
         # Parse JSON response
         json_start = response_text.find('{')
         json_end = response_text.rfind('}') + 1
         if json_start >= 0 and json_end > json_start:
             results = json.loads(response_text[json_start:json_end])
+            results["payload"] = answer["payload"]
+            results["model"] = answer["model"]
             return results
         else:
             raise ValueError("No valid JSON found in response")
@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
+import numpy as np
 from modules.auth.session import login_required
 from modules.auth.roles import Resource, Permission, check_access
 
@@ -73,14 +73,11 @@ def _display_transaction_summary():
     st.subheader("Recent Transactions")
     
     # Get last 5 transactions
-    recent_transactions = sorted(
-        st.session_state.transaction_logs,
-        key=lambda x: datetime.strptime(x["date"], "%Y-%m-%d"),
-        reverse=True
-    )[:5]
-    
-    if recent_transactions:
-        transactions_df = pd.DataFrame(recent_transactions)
+    store = st.session_state.transaction_store
+    recent_rows = np.argsort(store.dates, kind="stable")[::-1][:5]
+    
+    if len(recent_rows):
+        transactions_df = pd.DataFrame(store.records(recent_rows))
         transactions_df["customer_name"] = transactions_df["customer_id"].apply(
             lambda x: st.session_state.customers[x]["full_name"]
         )
@@ -149,9 +146,9 @@ def _get_alert_metrics():
 
 def _display_transaction_metrics():
     """Display transaction-related metrics"""
-    transactions = st.session_state.transaction_logs
-    total_transactions = len(transactions)
-    high_risk_transactions = sum(1 for t in transactions if t["risk_flag"] == "High")
+    store = st.session_state.transaction_store
+    total_transactions = len(store)
+    high_risk_transactions = int(store.risk_flags.sum())
     
     col1, col2 = st.columns(2)
     with col1:
@@ -5,11 +5,18 @@ from datetime import datetime
 import time
 import cv2
 import numpy as np
-from PIL import Image
 import pytesseract
 from config.config import get_api_keys
 from utils.groq_client import GroqVisionClient
-from modules.hybrid_verifier import HybridDocumentVerifier
+from modules.hybrid_verifier import HybridDocumentVerifier, VISION_CASCADE
+from utils.ocr_cache import get_ocr_cache
+from utils.ocr_backend import get_ocr_backend, PytesseractBackend
+from utils.image_pipeline import ImagePipeline, scratch_buffer
+from utils.pdf_document import PdfDocument, is_pdf, iter_pdf_pages
+from utils.blob_store import get_blob_store
+from utils.database import save_document, save_document_result, get_verified_document, get_customer_documents
+from utils.database import get_cascade_summary, get_verification_batches, get_verification_jobs
+from modules.batch_verifier import get_batch_pool, create_batch_from_uploads, create_batch_from_directory
 
 # Set Tesseract path for Windows
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
@@ -17,20 +24,23 @@ pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tessera
 # Initialize Groq client
 groq_client = GroqVisionClient()
 
-# Initialize hybrid verifier without passing groq_client
-hybrid_verifier = HybridDocumentVerifier()  # Remove the argument
+# Initialize hybrid verifier; VISION_CASCADE chooses cascade or concurrent OCR and vision
+hybrid_verifier = HybridDocumentVerifier(cascade=VISION_CASCADE)
 
 def document_verification():
     """Handle document verification functionality"""
     st.title("Document Verification")
     
-    tab1, tab2 = st.tabs(["Document Review", "AI Document Analysis"])
+    tab1, tab2, tab3 = st.tabs(["Document Review", "AI Document Analysis", "Batch Verification"])
     
     with tab1:
         _document_review()
     
     with tab2:
         _basic_ai_document_analysis()
+    
+    with tab3:
+        _batch_verification()
 
 def _document_review():
     """Handle manual document review process"""
@@ -49,6 +59,7 @@ def _document_review():
         st.subheader("Current Documents")
         for doc in customer["documents"]:
             st.success(f"✓ {doc}")
+        _display_stored_documents(customer_id)
         
         # Document verification interface
         st.subheader("Document Upload & Verification")
@@ -84,14 +95,60 @@ def _handle_document_upload(customer_id, customer, doc_type):
                     verification_notes, uploaded_file
                 )
 
+# Writer tag of the results this page stores on documents
+DOCUMENT_REVIEW = "document_review"
+
+def _display_stored_documents(customer_id):
+    """Uploads kept in the blob store for a customer, with thumbnails made on first view"""
+    documents = get_customer_documents(customer_id)
+    if not documents:
+        return
+    
+    with st.expander(f"Stored uploads ({len(documents)})"):
+        store = get_blob_store()
+        columns = st.columns(4)
+        for index, document in enumerate(documents):
+            with columns[index % 4]:
+                try:
+                    st.image(str(store.thumbnail(document["content_hash"])))
+                except Exception as e:
+                    st.caption(f"No preview: {str(e)}")
+                result = document["verification_result"] if document["verified_by"] == DOCUMENT_REVIEW else {}
+                st.caption(
+                    f"{document['doc_type']} · {document['created_at']} · "
+                    f"{result.get('status') or 'Not reviewed'}"
+                )
+
+def _store_upload(customer_id, doc_type, uploaded_file):
+    """Keep the upload in the blob store; returns (document id, earlier result of an identical file)"""
+    data = uploaded_file.getvalue()
+    content_hash = get_blob_store().put(data)
+    previous = get_verified_document(content_hash, doc_type, customer_id, DOCUMENT_REVIEW)
+    document_id = save_document(customer_id, doc_type, uploaded_file.name, content_hash, len(data))
+    return document_id, previous["verification_result"] if previous else None
+
 def _process_verification(customer_id, customer, doc_type, doc_authentic, 
                         info_matches, not_expired, good_quality, verification_notes, uploaded_file=None):
     """Process document verification results with OCR verification"""
+    document_id = None
+    review = {}
     try:
-        if uploaded_file and uploaded_file.type.startswith('image'):
-            image = Image.open(uploaded_file)
-            image_array = np.array(image)
-            extracted_text = _perform_ocr(image_array)
+        previous = None
+        if uploaded_file:
+            document_id, previous = _store_upload(customer_id, doc_type, uploaded_file)
+        
+        if previous and "matches" in previous:
+            # Identical file already matched for this customer: no OCR needed
+            st.info("This file was already checked for this customer; reusing its data matching results")
+            review = {"matches": previous["matches"], "match_percentage": previous["match_percentage"]}
+            verification_notes += f"\nOCR Verification: {review['match_percentage']:.1f}% match with customer data."
+            if review["match_percentage"] < 70:
+                st.warning("⚠️ Low data match percentage. Please verify manually.")
+                save_document_result(document_id, {**review, "status": "Manual Review Required"}, DOCUMENT_REVIEW)
+                return False
+        elif uploaded_file and uploaded_file.type.startswith('image'):
+            pipeline = ImagePipeline.open(uploaded_file)
+            extracted_text = _perform_ocr(pipeline)
             
             # Perform data matching
             matches = _perform_data_matching(extracted_text, customer)
@@ -114,10 +171,13 @@ def _process_verification(customer_id, customer, doc_type, doc_authentic,
             
             # Update verification notes with OCR results
             verification_notes += f"\nOCR Verification: {match_percentage:.1f}% match with customer data."
+            review = {"matches": matches, "match_percentage": match_percentage}
             
             # Require manual confirmation for low match percentage
             if match_percentage < 70:
                 st.warning("⚠️ Low data match percentage. Please verify manually.")
+                if document_id:
+                    save_document_result(document_id, {**review, "status": "Manual Review Required"}, DOCUMENT_REVIEW)
                 return False
     except Exception as e:
         st.error(f"OCR Verification Error: {str(e)}")
@@ -134,8 +194,13 @@ def _process_verification(customer_id, customer, doc_type, doc_authentic,
         
         add_audit_log("Document Verification", f"Verified {doc_type} for customer {customer_id}")
         st.success(f"{doc_type} verified successfully")
+        status = "Verified"
     else:
         _handle_verification_failure(customer_id, doc_type, verification_notes)
+        status = "Failed"
+    
+    if document_id:
+        save_document_result(document_id, {**review, "status": status, "notes": verification_notes}, DOCUMENT_REVIEW)
 
 def _handle_verification_failure(customer_id, doc_type, verification_notes):
     """Handle document verification failure"""
@@ -182,22 +247,184 @@ def _basic_ai_document_analysis():
         _display_document_preview(uploaded_file, doc_type)
         
         if st.button("Run Analysis"):
-            results = _basic_document_analysis(uploaded_file, doc_type)
-            formatted_results = _format_basic_results(results)
-            _display_ai_analysis_results(formatted_results)
+            if is_pdf(uploaded_file):
+                _pdf_document_analysis(uploaded_file, doc_type)
+            else:
+                results = _basic_document_analysis(uploaded_file, doc_type)
+                formatted_results = _format_basic_results(results)
+                _display_ai_analysis_results(formatted_results)
+    
+    with st.expander("Vision Cascade Statistics"):
+        _display_cascade_summary()
+
+def _pdf_document_analysis(uploaded_file, doc_type):
+    """OCR a multi-page PDF, showing each page as soon as it is read"""
+    try:
+        document = PdfDocument(uploaded_file)
+    except Exception as e:
+        st.error(f"Could not open PDF: {str(e)}")
+        return
+    
+    update = None
+    with st.status(f"Reading {document.page_count} pages...", expanded=True) as status:
+        for update in iter_pdf_pages(document, doc_type, hybrid_verifier.ocr_processor):
+            result = update["result"]
+            found = ", ".join(update["fields"]) or "none yet"
+            st.write(f"Page {update['page'] + 1}: {result['confidence']:.0f}% confidence, fields found: {found}")
+            for level, message in update["messages"]:
+                getattr(st, level)(message)
+        
+        if update is None:
+            status.update(label="The PDF has no pages", state="error")
+            return
+        skipped = document.page_count - update["pages_done"]
+        label = f"Read {update['pages_done']} of {document.page_count} pages"
+        if update["complete"] and skipped:
+            label += " (stopped early, all required fields found)"
+        status.update(label=label, state="complete", expanded=False)
+    
+    st.subheader("Extracted Information")
+    if update["fields"]:
+        st.table(pd.DataFrame(
+            [
+                (field, value, f"{update['field_confidence'][field]:.0%}", update["field_pages"][field] + 1)
+                for field, value in update["fields"].items()
+            ],
+            columns=["Field", "Value", "Confidence", "Page"]
+        ))
+    else:
+        st.warning("No fields could be extracted from the PDF")
+    
+    add_audit_log("AI Document Analysis", f"Analyzed {doc_type} PDF ({update['pages_done']} pages read)")
+
+def _batch_verification():
+    """Queue many documents for background verification and track their progress"""
+    st.subheader("Batch Document Verification")
+    st.info("Documents are verified in the background; you can keep working while the batch runs")
+    
+    with st.form("batch_verification_form"):
+        doc_type = st.selectbox("Document Type", [
+            "ID Card (KTP)", "Passport", "Proof of Address", "Tax ID (NPWP)", "Bank Statement"
+        ], key="batch_doc_type")
+        customer_id = st.selectbox(
+            "Match against customer (optional)",
+            [None] + list(st.session_state.customers.keys()),
+            format_func=lambda x: "None" if x is None else f"{x} - {st.session_state.customers[x]['full_name']}",
+            key="batch_customer"
+        )
+        uploaded_files = st.file_uploader(
+            "Upload documents", type=["jpg", "jpeg", "png", "pdf"], accept_multiple_files=True, key="batch_upload"
+        )
+        directory = st.text_input("Or a local directory of scans", key="batch_directory")
+        
+        if st.form_submit_button("Start Batch"):
+            try:
+                if uploaded_files:
+                    batch_id, count = create_batch_from_uploads(uploaded_files, doc_type, customer_id)
+                elif directory:
+                    batch_id, count = create_batch_from_directory(directory, doc_type, customer_id)
+                else:
+                    st.warning("Upload files or enter a directory")
+                    batch_id = None
+                
+                if batch_id:
+                    get_batch_pool(hybrid_verifier)
+                    add_audit_log("Batch Verification", f"Queued {count} {doc_type} documents as {batch_id}")
+                    st.success(f"Queued {count} documents as batch {batch_id}")
+            except Exception as e:
+                st.error(f"Error creating batch: {str(e)}")
+    
+    _display_batch_status()
+
+@st.fragment(run_every=3)
+def _display_batch_status():
+    """Poll batch progress; reruns on its own without blocking the page"""
+    batches = get_verification_batches()
+    if not batches:
+        st.info("No verification batches yet")
+        return
+    
+    # Resume processing after a server restart if work is still queued
+    if any(batch["pending"] or batch["processing"] for batch in batches):
+        get_batch_pool(hybrid_verifier)
+    
+    st.dataframe(pd.DataFrame(batches), hide_index=True)
+    
+    batch_id = st.selectbox("Batch details", [batch["batch_id"] for batch in batches], key="batch_details")
+    batch = next(batch for batch in batches if batch["batch_id"] == batch_id)
+    st.progress((batch["done"] + batch["failed"]) / batch["total"], text=f"{batch['done'] + batch['failed']} of {batch['total']} processed")
+    
+    jobs = get_verification_jobs(batch_id)
+    st.dataframe(pd.DataFrame([
+        {
+            "File": job["file_name"],
+            "Status": job["status"],
+            "Result": (job["result"] or {}).get("verification_status"),
+            "NIK": (job["result"] or {}).get("extracted_fields", {}).get("nik"),
+            "Name": (job["result"] or {}).get("extracted_fields", {}).get("name"),
+            "OCR Confidence": round((job["result"] or {}).get("ocr_confidence", 0), 1),
+            "Path": (job["result"] or {}).get("path"),
+            "Error": job["error"]
+        }
+        for job in jobs
+    ]), hide_index=True)
+
+def _display_cascade_summary():
+    """Show how many verifications skipped the remote vision model"""
+    st.caption(
+        "Mode: " + ("cascade (vision only when OCR is inconclusive)" if hybrid_verifier.cascade
+                    else "concurrent (OCR and vision together); set VISION_CASCADE=1 for cascade")
+    )
+    summary = get_cascade_summary()
+    if not summary:
+        st.info("No hybrid verifications recorded yet")
+        return
+    
+    total = sum(path["count"] for path in summary.values())
+    skipped = summary.get("ocr_only", {}).get("count", 0)
+    vision_paths = [path for name, path in summary.items() if name != "ocr_only" and path["avg_vision_seconds"]]
+    avg_vision = sum(path["avg_vision_seconds"] for path in vision_paths) / len(vision_paths) if vision_paths else 0
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Verifications", total)
+    with col2:
+        st.metric("Vision Calls Avoided", skipped, f"{skipped / total:.0%}")
+    with col3:
+        st.metric("Vision Time Saved", f"{skipped * avg_vision:.1f}s")
+    
+    st.dataframe(pd.DataFrame([
+        {"Path": name, "Count": path["count"], "Avg OCR (s)": round(path["avg_ocr_seconds"], 2), "Avg Vision (s)": round(path["avg_vision_seconds"], 2)}
+        for name, path in summary.items()
+    ]))
+    
+    # Vision provider latencies since the app started
+    router = hybrid_verifier.vision_router.stats()
+    st.caption(
+        f"Hedged requests: {router['hedges']} ({router['hedge_wins']} won by the hedge, "
+        f"{router['hedges_skipped']} skipped at the in-flight limit), failovers: {router['failovers']}"
+    )
+    st.dataframe(pd.DataFrame([
+        {
+            "Provider": name,
+            "Calls": provider["calls"],
+            "Errors": provider["errors"],
+            "p50 (s)": round(provider["p50"], 2) if provider["p50"] is not None else None,
+            "p95 (s)": round(provider["p95"], 2) if provider["p95"] is not None else None
+        }
+        for name, provider in router["providers"].items()
+    ]), hide_index=True)
 
 def _basic_document_analysis(uploaded_file, doc_type):
     """Perform document analysis with hybrid approach"""
     try:
-        image = Image.open(uploaded_file)
-        
         # Get customer data if available
         customer_data = None
         if 'selected_customer' in st.session_state:
             customer_data = st.session_state.customers.get(st.session_state.selected_customer)
         
         # Perform hybrid verification
-        results = hybrid_verifier.verify_document(image, doc_type, customer_data)
+        results = hybrid_verifier.verify_document(uploaded_file, doc_type, customer_data)
         
         return {
             "extracted_text": results["ocr_data"]["raw_text"],
@@ -304,21 +531,34 @@ def _provide_verification_actions():
             add_audit_log("AI Document Verification", "Requested manual review after AI analysis")
             st.info("Manual review requested")
 
+# Cache key configuration of _perform_ocr's fixed preprocessing and tesseract call
+PERFORM_OCR_CONFIG = ("adaptive_threshold_11_2", "image_to_string")
+
 def _perform_ocr(image):
-    """Extract text from document using OCR"""
+    """Extract text from document using OCR, reusing cached text for repeat uploads"""
+    image = ImagePipeline.wrap(image)
+    cache = get_ocr_cache()
+    cache_key = cache.make_key(image, "document_review", (PERFORM_OCR_CONFIG, get_ocr_backend().name))
+    cached, _ = cache.get(cache_key)
+    if cached is not None:
+        return cached["text"]
+    
     try:
         # Enhance image for OCR
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = image.gray
         enhanced = cv2.adaptiveThreshold(
             gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-            cv2.THRESH_BINARY, 11, 2
+            cv2.THRESH_BINARY, 11, 2, dst=scratch_buffer("adaptive", gray.shape)
         )
         
         try:
-            # Check if Tesseract is accessible
-            pytesseract.get_tesseract_version()
+            backend = get_ocr_backend()
+            if isinstance(backend, PytesseractBackend):
+                # Check if Tesseract is accessible
+                pytesseract.get_tesseract_version()
             # Perform OCR
-            text = pytesseract.image_to_string(enhanced)
+            text = backend.image_to_string(enhanced)
+            cache.put(cache_key, "document_review", {"text": text})
             return text
         except pytesseract.TesseractNotFoundError:
             st.error("Tesseract is not properly configured. Please check the installation.")
@@ -368,8 +608,8 @@ def _perform_data_matching(extracted_text, customer_data):
 def _analyze_document_structure(image, doc_type):
     """Analyze document structure based on type"""
     try:
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        # Grayscale buffer shared with the other stages
+        gray = ImagePipeline.wrap(image).gray
         
         # Document type specific analysis
         if doc_type == "ID Card (KTP)":
@@ -1,7 +1,9 @@
 import streamlit as st
-import pandas as pd
+import sqlite3
 from datetime import datetime, timedelta
 from utils.helpers import add_audit_log, format_currency
+from utils.transaction_store import TRANSACTION_TYPES, load_transaction_store, new_transaction_id
+from utils.database import save_transaction, update_transaction_review, enqueue_monitoring_event, get_monitoring_queue_stats
 from modules.auth.session import login_required
 from modules.auth.roles import Resource, Permission
 
@@ -21,6 +23,12 @@ def transaction_monitoring():
     with tab3:
         _display_analytics()
 
+def _get_transaction_store():
+    """Get the session's columnar transaction store, loaded once from the saved transactions"""
+    if "transaction_store" not in st.session_state:
+        st.session_state.transaction_store = load_transaction_store(st.session_state.get("customers"))
+    return st.session_state.transaction_store
+
 def _display_transaction_log():
     """Display and filter transaction logs"""
     st.subheader("Transaction Monitoring")
@@ -37,8 +45,8 @@ def _display_transaction_log():
     with col2:
         type_filter = st.multiselect(
             "Filter by Type",
-            ["Transfer", "Cash Deposit", "Cash Withdrawal", "Salary", "Other"],
-            default=["Transfer", "Cash Deposit", "Cash Withdrawal", "Salary", "Other"]
+            TRANSACTION_TYPES,
+            default=TRANSACTION_TYPES
         )
     
     with col3:
@@ -47,9 +55,20 @@ def _display_transaction_log():
             ["All Transactions", "Flagged Only", "Unflagged Only"]
         )
     
+    _display_monitoring_status()
+    
     filtered_transactions = _apply_transaction_filters(customer_filter, type_filter, risk_filter)
     _display_filtered_transactions(filtered_transactions)
 
+def _display_monitoring_status():
+    """Show how much work is waiting for the background monitoring worker"""
+    queue = get_monitoring_queue_stats()
+    waiting = queue.get("pending", 0) + queue.get("processing", 0)
+    if waiting:
+        st.caption(f"⏳ {waiting} change(s) waiting for the monitoring worker")
+    if queue.get("failed"):
+        st.caption(f"⚠️ {queue['failed']} monitoring job(s) failed, check the worker log")
+
 def _add_transaction():
     """Add new transaction functionality"""
     st.subheader("Add New Transaction")
@@ -66,7 +85,7 @@ def _add_transaction():
         with col1:
             transaction_type = st.selectbox(
                 "Transaction Type",
-                ["Transfer", "Cash Deposit", "Cash Withdrawal", "Salary", "Other"]
+                TRANSACTION_TYPES
             )
             date = st.date_input("Transaction Date", value=datetime.today())
         
@@ -85,28 +104,30 @@ def _add_transaction():
                 _save_transaction(customer_id, transaction_type, date, amount, destination, notes, risk_flag)
 
 def _apply_transaction_filters(customer_filter, type_filter, risk_filter):
-    """Apply filters to transactions"""
-    filtered_transactions = st.session_state.transaction_logs
-    
-    if customer_filter != "All Customers":
-        filtered_transactions = [t for t in filtered_transactions if t["customer_id"] == customer_filter]
-    
-    if type_filter:
-        filtered_transactions = [t for t in filtered_transactions if t["type"] in type_filter]
+    """Apply filters to transactions and return the matching store rows"""
+    store = _get_transaction_store()
     
+    flagged = None
     if risk_filter == "Flagged Only":
-        filtered_transactions = [t for t in filtered_transactions if t["risk_flag"]]
+        flagged = True
     elif risk_filter == "Unflagged Only":
-        filtered_transactions = [t for t in filtered_transactions if not t["risk_flag"]]
+        flagged = False
     
-    return filtered_transactions
+    return store.filter(
+        customer_id=None if customer_filter == "All Customers" else customer_filter,
+        types=type_filter or None,
+        flagged=flagged
+    )
 
-def _display_filtered_transactions(filtered_transactions):
+def _display_filtered_transactions(filtered_rows):
     """Display filtered transactions and transaction details"""
-    if filtered_transactions:
-        df = pd.DataFrame(filtered_transactions)
-        df["customer_name"] = df["customer_id"].apply(lambda x: st.session_state.customers[x]["full_name"])
-        df["formatted_amount"] = df["amount"].apply(lambda x: f"Rp {x:,.0f}")
+    if len(filtered_rows):
+        store = _get_transaction_store()
+        df = store.to_dataframe(filtered_rows)
+        customer_names = {cid: c["full_name"] for cid, c in st.session_state.customers.items()}
+        df["customer_name"] = df["customer_id"].astype(str).map(customer_names)
+        df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+        df["formatted_amount"] = df["amount"].map(lambda x: f"Rp {x:,.0f}")
         
         display_columns = ["id", "customer_name", "date", "type", "formatted_amount", "destination", "notes", "risk_flag"]
         st.dataframe(
@@ -114,7 +135,7 @@ def _display_filtered_transactions(filtered_transactions):
             use_container_width=True
         )
         
-        _handle_transaction_details(filtered_transactions)
+        _handle_transaction_details(store.records(filtered_rows))
     else:
         st.info("No transactions match the selected filters")
 
@@ -156,7 +177,8 @@ def _validate_transaction(amount, destination):
 
 def _save_transaction(customer_id, transaction_type, date, amount, destination, notes, risk_flag):
     """Save new transaction and handle related actions"""
-    transaction_id = f"TRX{len(st.session_state.transaction_logs) + 1:03d}"
+    store = _get_transaction_store()
+    transaction_id = new_transaction_id()
     
     new_transaction = {
         "id": transaction_id,
@@ -169,40 +191,25 @@ def _save_transaction(customer_id, transaction_type, date, amount, destination,
         "risk_flag": risk_flag
     }
     
-    st.session_state.transaction_logs.append(new_transaction)
+    try:
+        saved = save_transaction(new_transaction)
+    except sqlite3.IntegrityError:
+        st.error(f"Transaction {transaction_id} already exists; nothing was saved")
+        return
+    if not saved:
+        st.error("Could not save the transaction")
+        return
+    
+    store.append(new_transaction)
     add_audit_log("Add Transaction", f"Added new transaction {transaction_id} for customer {customer_id}")
     
-    _check_suspicious_patterns(customer_id, transaction_type)
+    _check_suspicious_patterns(new_transaction)
     st.success(f"Transaction {transaction_id} added successfully")
 
-def _check_suspicious_patterns(customer_id, transaction_type):
-    """Check for suspicious transaction patterns"""
-    customer_transactions = [t for t in st.session_state.transaction_logs if t["customer_id"] == customer_id]
-    
-    recent_cash_deposits = [
-        t for t in customer_transactions 
-        if t["type"] == "Cash Deposit" 
-        and (datetime.strptime(t["date"], "%Y-%m-%d") > datetime.now() - timedelta(days=7))
-    ]
-    
-    if transaction_type == "Cash Deposit" and len(recent_cash_deposits) >= 3:
-        _create_structuring_alert(customer_id)
-
-def _create_structuring_alert(customer_id):
-    """Create alert for potential structuring"""
-    alert_id = f"ALT{len(st.session_state.alerts) + 1:03d}"
-    new_alert = {
-        "id": alert_id,
-        "customer_id": customer_id,
-        "date": datetime.now().strftime("%Y-%m-%d"),
-        "type": "Suspicious Pattern",
-        "description": "Multiple cash deposits detected within short period. Possible structuring.",
-        "status": "Open",
-        "severity": "High",
-        "assigned_to": "Risk Team"
-    }
-    st.session_state.alerts.append(new_alert)
-    st.warning("Alert created for suspicious transaction pattern")
+def _check_suspicious_patterns(transaction):
+    """Queue transaction for the monitoring worker, which runs the rules and writes alerts"""
+    if enqueue_monitoring_event("transaction", transaction) is None:
+        st.warning("Transaction saved but could not be queued for monitoring")
 
 def _display_basic_details(transaction):
     """Display basic transaction details"""
@@ -239,44 +246,28 @@ def _flag_transaction(transaction_id, reason):
 
 def _update_transaction_risk(transaction, risk_flag, notes):
     """Update transaction risk status and handle related actions"""
-    for t in st.session_state.transaction_logs:
-        if t["id"] == transaction["id"]:
-            t["risk_flag"] = risk_flag
-            t["notes"] = notes
+    store = _get_transaction_store()
+    store.update(transaction["id"], risk_flag=risk_flag, notes=notes)
+    if not update_transaction_review(transaction["id"], risk_flag, notes):
+        st.warning(f"Transaction {transaction['id']} was updated for this session but not saved")
     
     if risk_flag and not transaction["risk_flag"]:
-        _create_suspicious_transaction_alert(transaction)
+        enqueue_monitoring_event("transaction_flag", {**transaction, "risk_flag": True, "notes": notes})
         st.session_state.customers[transaction["customer_id"]]["suspicious_activity"] = True
         add_audit_log("Transaction Monitoring", f"Flagged transaction {transaction['id']} as suspicious")
-        st.warning("Alert created for suspicious transaction")
+        st.warning("Transaction flagged; alert queued for the monitoring worker")
     else:
         add_audit_log("Transaction Monitoring", f"Updated transaction {transaction['id']}")
         st.success("Transaction updated")
     
     st.experimental_rerun()
 
-def _create_suspicious_transaction_alert(transaction):
-    """Create alert for suspicious transaction"""
-    alert_id = f"ALT{len(st.session_state.alerts) + 1:03d}"
-    new_alert = {
-        "id": alert_id,
-        "customer_id": transaction["customer_id"],
-        "date": datetime.now().strftime("%Y-%m-%d"),
-        "type": "Suspicious Transaction",
-        "description": f"Suspicious transaction flagged: {transaction['type']} of Rp {transaction['amount']:,.0f}",
-        "status": "Open",
-        "severity": "High",
-        "assigned_to": "Risk Team"
-    }
-    st.session_state.alerts.append(new_alert)
-
 def _display_analytics():
     """Display transaction analytics and insights"""
     st.subheader("Transaction Analytics")
     
-    if st.session_state.transaction_logs:
-        df = pd.DataFrame(st.session_state.transaction_logs)
-        
+    store = _get_transaction_store()
+    if len(store):
         # Time period selector
         period = st.selectbox(
             "Analysis Period",
@@ -288,8 +279,9 @@ def _display_analytics():
         if period != "All Time":
             days = int(period.split()[1])
             cutoff_date = current_date - timedelta(days=days)
-            df['date'] = pd.to_datetime(df['date'])
-            df = df[df['date'] >= cutoff_date]
+            df = store.to_dataframe(store.filter(start_date=cutoff_date))
+        else:
+            df = store.to_dataframe()
         
         # Display key metrics
         col1, col2, col3, col4 = st.columns(4)
@@ -312,14 +304,13 @@ def _display_analytics():
         
         # Transaction type distribution
         st.subheader("Transaction Type Distribution")
-        type_dist = df['type'].value_counts()
+        type_dist = df['type'].value_counts()[lambda counts: counts > 0]
         st.bar_chart(type_dist)
         
         # Risk flagged transactions trend
         st.subheader("Risk Flagged Transactions")
         risk_df = df[df['risk_flag']].copy()
         if not risk_df.empty:
-            risk_df['date'] = pd.to_datetime(risk_df['date'])
             risk_trend = risk_df.groupby('date').size()
             st.line_chart(risk_trend)
         else:
@@ -328,7 +319,7 @@ def _display_analytics():
         # Largest transactions
         st.subheader("Top 5 Largest Transactions")
         largest_df = df.nlargest(5, 'amount')[['date', 'customer_id', 'type', 'amount', 'risk_flag']]
-        largest_df['customer_name'] = largest_df['customer_id'].apply(
+        largest_df['customer_name'] = largest_df['customer_id'].astype(str).map(
             lambda x: st.session_state.customers[x]['full_name']
         )
         largest_df['amount'] = largest_df['amount'].apply(format_currency)
@@ -0,0 +1,31 @@
+"""Background transaction monitoring worker
+
+Run alongside the Streamlit app:
+    python monitoring_worker.py
+"""
+import argparse
+from utils.database import init_db
+from utils.monitoring_worker import MonitoringWorker
+
+
+def main():
+    """Worker entry point"""
+    parser = argparse.ArgumentParser(description="KYCPy background monitoring worker")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to wait when the queue is empty")
+    parser.add_argument("--batch-size", type=int, default=100, help="Events claimed per batch")
+    parser.add_argument("--once", action="store_true", help="Process the current queue and exit")
+    args = parser.parse_args()
+
+    init_db()
+    worker = MonitoringWorker(batch_size=args.batch_size)
+
+    if args.once:
+        worker.start()
+        while worker.run_once():
+            pass
+    else:
+        worker.run_forever(poll_interval=args.poll_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils import database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Fresh SQLite database in a temporary directory"""
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "kyc.db")
+    database.init_db()
+    return database
@@ -0,0 +1,50 @@
+import io
+import numpy as np
+from PIL import Image
+from utils.blob_store import BlobStore, read_upload
+
+
+def _png(seed=0):
+    buffer = io.BytesIO()
+    pixels = np.random.default_rng(seed).integers(0, 255, (120, 160, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    store = BlobStore(tmp_path)
+    data = _png()
+    digest = store.put(data)
+
+    assert store.put(io.BytesIO(data).getvalue()) == digest
+    assert store.put(_png(seed=1)) != digest
+    assert len([path for path in tmp_path.rglob("*") if path.is_file()]) == 2
+    assert store.get(digest) == data
+
+
+def test_read_upload_accepts_paths_and_file_objects(tmp_path):
+    data = _png()
+    path = tmp_path / "upload.png"
+    path.write_bytes(data)
+    assert read_upload(path) == data
+    assert read_upload(str(path)) == data
+    assert read_upload(io.BytesIO(data)) == data
+
+
+def test_thumbnail_is_made_once_and_bounded(tmp_path):
+    store = BlobStore(tmp_path)
+    digest = store.put(_png())
+    thumbnail = store.thumbnail(digest, size=(64, 64))
+    assert max(Image.open(thumbnail).size) <= 64
+    assert store.thumbnail(digest, size=(64, 64)) == thumbnail
+
+
+def test_document_results_are_only_returned_to_their_writer(db):
+    digest = BlobStore.content_hash(_png())
+    review_id = db.save_document("CUS001", "Passport", "a.png", digest, 10)
+    db.save_document_result(review_id, {"matches": {"name": True}, "match_percentage": 100.0}, "document_review")
+
+    assert db.get_verified_document(digest, "Passport", "CUS001", "hybrid_verifier") is None
+    found = db.get_verified_document(digest, "Passport", "CUS001", "document_review")
+    assert found["id"] == review_id and found["verification_result"]["match_percentage"] == 100.0
+    assert db.get_verified_document(digest, "Passport", None, "document_review") is None
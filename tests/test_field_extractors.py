@@ -0,0 +1,23 @@
+from utils.field_extractors import (
+    DOCUMENT_FIELDS, CompiledFieldExtractor, SinglePassFieldExtractor, get_field_extractor, _synthetic_text
+)
+
+KTP_TEXT = "PROVINSI JAWA BARAT\nNIK : 3201012505780001\nNama : BAMBANG SURYANTO\nJenis Kelamin : laki-laki\n"
+
+
+def test_ktp_fields_and_confidence():
+    values, confidence = get_field_extractor("ID Card (KTP)").extract_with_confidence(KTP_TEXT)
+    assert values["nik"] == "3201012505780001"
+    assert values["name"] == "BAMBANG SURYANTO"
+    assert values["gender"] == "LAKI-LAKI"
+    assert values["rt_rw"] is None
+    # The bare 16-digit pattern has priority over the labeled one
+    assert confidence["nik"] == 0.7
+    assert confidence["rt_rw"] == 0.0
+
+
+def test_single_pass_finds_the_same_first_match_of_every_pattern():
+    for doc_type in ("ID Card (KTP)", "Passport", "Bank Statement"):
+        for text in (KTP_TEXT, _synthetic_text(doc_type, 5), ""):
+            fields = DOCUMENT_FIELDS[doc_type]
+            assert SinglePassFieldExtractor(fields).candidates(text) == CompiledFieldExtractor(fields).candidates(text)
@@ -0,0 +1,102 @@
+import io
+import threading
+import numpy as np
+from PIL import Image
+from utils import blob_store
+from utils.blob_store import BlobStore
+from modules import hybrid_verifier
+from modules.hybrid_verifier import HybridDocumentVerifier
+
+
+def _results(ocr_error=False, vision=True):
+    debug_info = {"error": "OCR stage failed"} if ocr_error else {}
+    return {
+        "ocr_results": {"raw_text": "", "parsed_data": {}, "confidence": 0, "debug_info": debug_info},
+        "vision_results": {"text": "NIK: 1"} if vision else None
+    }
+
+
+def test_only_runs_where_every_needed_stage_succeeded_are_reusable():
+    verifier = object.__new__(HybridDocumentVerifier)
+    assert verifier._stages_succeeded(_results(vision=False), "ocr_only")
+    assert verifier._stages_succeeded(_results(), "ocr_then_vision")
+    assert not verifier._stages_succeeded(_results(ocr_error=True), "concurrent")
+    assert not verifier._stages_succeeded(_results(vision=False), "ocr_then_vision")
+    assert not verifier._stages_succeeded(_results(vision=False), "concurrent")
+
+
+class _FakeBackend:
+    name = "fake"
+
+
+class _FakeOCR:
+    backend = _FakeBackend()
+
+    def process_document_in_background(self, image, doc_type):
+        return {"raw_text": "PROOF OF ADDRESS", "parsed_data": {}, "confidence": 90, "debug_info": {}}, []
+
+
+def _verifier(vision_answers):
+    verifier = object.__new__(HybridDocumentVerifier)
+    verifier.ocr_processor = _FakeOCR()
+    verifier.ocr_timeout = verifier.vision_timeout = 5
+    verifier.cascade = True
+    verifier._local = threading.local()
+    verifier.vision_calls = 0
+
+    def request_vision(image, doc_type):
+        answer = vision_answers[verifier.vision_calls]
+        verifier.vision_calls += 1
+        if isinstance(answer, Exception):
+            raise answer
+        return {"text": answer, "model": "stub", "provider": "stub", "payload": None}
+
+    verifier._request_vision = request_vision
+    return verifier
+
+
+def test_identical_upload_reuses_only_a_fully_successful_run(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "_store", BlobStore(tmp_path / "blobs"))
+    monkeypatch.setattr(hybrid_verifier, "save_cascade_decision", lambda decision: None)
+    buffer = io.BytesIO()
+    Image.fromarray(np.full((60, 80), 200, dtype=np.uint8)).save(buffer, "PNG")
+    upload = tmp_path / "bill.png"
+    upload.write_bytes(buffer.getvalue())
+
+    verifier = _verifier([TimeoutError("vision timed out"), "Name: ANNA", "unused"])
+    first, messages = verifier.verify_document_in_background(upload, "Proof of Address", {"id": "CUS001"})
+    assert first["status"] == "completed" and first["vision_results"] is None
+
+    second, _ = verifier.verify_document_in_background(upload, "Proof of Address", {"id": "CUS001"})
+    assert second["document"]["deduplicated"] is False
+    assert second["vision_results"]["text"] == "Name: ANNA"
+
+    third, _ = verifier.verify_document_in_background(upload, "Proof of Address", {"id": "CUS001"})
+    assert third["document"] == {**second["document"], "deduplicated": True}
+    assert third["ocr_results"] == second["ocr_results"]
+    assert verifier.vision_calls == 2
+
+    # Every run is in the history; only the successful one carries a reusable result
+    history = db.get_customer_verification_results("CUS001")
+    assert [record["result"] is not None for record in history] == [True, False]
+    conn = db.get_db()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM documents WHERE verification_result IS NOT NULL").fetchone()[0] == 0
+    finally:
+        conn.close()
+
+
+def test_cascade_off_runs_ocr_and_vision_concurrently(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "_store", BlobStore(tmp_path / "blobs"))
+    monkeypatch.setattr(hybrid_verifier, "save_cascade_decision", lambda decision: None)
+    buffer = io.BytesIO()
+    Image.fromarray(np.full((60, 80), 200, dtype=np.uint8)).save(buffer, "PNG")
+    upload = tmp_path / "bill.png"
+    upload.write_bytes(buffer.getvalue())
+
+    verifier = _verifier(["Name: ANNA"])
+    verifier.cascade = False
+    results, _ = verifier.verify_document_in_background(upload, "Proof of Address", {"id": "CUS001"})
+
+    assert results["cascade"]["path"] == "concurrent"
+    assert results["vision_results"]["text"] == "Name: ANNA"
@@ -0,0 +1,20 @@
+import numpy as np
+from utils.image_pipeline import ImagePipeline
+
+
+def test_rgba_array_drops_alpha_into_a_contiguous_buffer():
+    rgba = np.zeros((10, 12, 4), np.uint8)
+    rgba[..., 0] = 200
+    rgba[..., 3] = 255
+
+    pipeline = ImagePipeline.from_array(rgba)
+
+    assert pipeline.rgb.shape == (10, 12, 3) and pipeline.rgb.flags["C_CONTIGUOUS"]
+    assert pipeline.pil.size == (12, 10) and pipeline.pil.getpixel((0, 0)) == (200, 0, 0)
+    assert pipeline.gray.shape == (10, 12)
+    assert pipeline.content_hash == ImagePipeline.from_array(rgba[..., :3]).content_hash
+
+
+def test_rgb_array_is_wrapped_without_copying():
+    rgb = np.zeros((10, 12, 3), np.uint8)
+    assert ImagePipeline.from_array(rgb).rgb is rgb
@@ -0,0 +1,112 @@
+import sqlite3
+import pytest
+from utils.backtest import run_backtest
+from utils.monitoring import MonitoringEngine, StructuringRule, FanInRule, UnusualAmountRule
+from utils.transaction_store import new_transaction_id
+
+
+def _transaction(id, customer_id, date, amount=1_000_000, type="Transfer", destination="External Account"):
+    return {
+        "id": id, "customer_id": customer_id, "date": date, "type": type, "amount": amount,
+        "destination": destination, "notes": "", "risk_flag": False
+    }
+
+
+def _alerts(engine, transactions):
+    return [(rule, alert) for transaction in transactions for rule, alert in engine.process(transaction)]
+
+
+def test_structuring_alerts_on_third_deposit_within_window():
+    engine = MonitoringEngine(rules=[StructuringRule(min_deposits=3, window_days=7)])
+    deposits = [
+        _transaction(f"T{i}", "CUS001", date, type="Cash Deposit")
+        for i, date in enumerate(["2024-01-01", "2024-01-03", "2024-01-06"])
+    ]
+    alerts = _alerts(engine, deposits)
+    assert [rule for rule, _ in alerts] == ["structuring"]
+    assert alerts[0][1]["date"] == "2024-01-06"
+
+
+def test_structuring_ignores_deposits_outside_window():
+    engine = MonitoringEngine(rules=[StructuringRule(min_deposits=3, window_days=7)])
+    deposits = [
+        _transaction(f"T{i}", "CUS001", date, type="Cash Deposit")
+        for i, date in enumerate(["2024-01-01", "2024-01-08", "2024-01-15"])
+    ]
+    assert _alerts(engine, deposits) == []
+
+
+def test_structuring_handles_backdated_deposits():
+    def deposits(dates):
+        return [_transaction(f"T{i}", "CUS001", date, type="Cash Deposit") for i, date in enumerate(dates)]
+
+    # The backdated 01-05 completes three deposits in seven days even
+    # though a later deposit was seen first
+    engine = MonitoringEngine(rules=[StructuringRule(min_deposits=3, window_days=7)])
+    alerts = _alerts(engine, deposits(["2024-01-03", "2024-01-04", "2024-01-30", "2024-01-05"]))
+    assert [alert["date"] for _, alert in alerts] == ["2024-01-05"]
+
+    # A backdated deposit far from the others is not counted with them
+    engine = MonitoringEngine(rules=[StructuringRule(min_deposits=3, window_days=7)])
+    assert _alerts(engine, deposits(["2024-01-20", "2024-01-21", "2024-01-02"])) == []
+
+    # Deposits older than the backdating horizon are not evaluated
+    engine = MonitoringEngine(rules=[StructuringRule(min_deposits=2, window_days=7, max_backdate_days=30)])
+    assert _alerts(engine, deposits(["2024-01-02", "2024-06-01", "2024-01-03"])) == []
+
+
+def test_fan_in_alerts_once_when_threshold_is_reached():
+    engine = MonitoringEngine(rules=[FanInRule(threshold=3)])
+    transactions = [
+        _transaction(f"T{i}", f"CUS00{i % 4}", "2024-01-01", destination="Acc 123-456-789")
+        for i in range(6)
+    ]
+    alerts = _alerts(engine, transactions)
+    assert [rule for rule, _ in alerts] == ["fan_in"]
+    assert alerts[0][1]["customer_id"] == "CUS002"
+
+
+def test_unusual_amount_needs_history_then_flags_outlier():
+    engine = MonitoringEngine(rules=[UnusualAmountRule(min_history=5)])
+    history = [_transaction(f"T{i}", "CUS001", f"2024-01-{i + 1:02d}", amount=1_000_000 + i * 10_000) for i in range(5)]
+    assert _alerts(engine, history) == []
+
+    outlier = _transaction("T9", "CUS001", "2024-01-10", amount=90_000_000)
+    alerts = _alerts(engine, [outlier])
+    assert [rule for rule, _ in alerts] == ["unusual_amount"]
+
+
+def test_backtest_replays_in_date_order_and_matches_dispositioned_alerts():
+    transactions = [
+        _transaction("T3", "CUS001", "2024-01-06", type="Cash Deposit"),
+        _transaction("T1", "CUS001", "2024-01-01", type="Cash Deposit"),
+        _transaction("T2", "CUS001", "2024-01-03", type="Cash Deposit"),
+        _transaction("T4", "CUS002", "2024-02-01", type="Cash Deposit")
+    ]
+    dispositioned = [
+        {"customer_id": "CUS001", "type": "Suspicious Pattern", "date": "2024-01-04"},
+        {"customer_id": "CUS002", "type": "Suspicious Pattern", "date": "2024-03-01"}
+    ]
+    report = run_backtest(transactions, [StructuringRule()], dispositioned)
+
+    assert report.transactions == 4
+    assert report.alerts_by_rule == {"structuring": 1}
+    assert report.overlapping_alerts == 1
+    assert report.new_alerts == 0
+    assert report.missed_dispositioned == 1
+
+
+def test_transaction_ids_are_unique():
+    assert len({new_transaction_id() for _ in range(1000)}) == 1000
+
+
+def test_save_transaction_refuses_to_overwrite(db):
+    transaction = _transaction(new_transaction_id(), "CUS001", "2024-01-01")
+    assert db.save_transaction(transaction)
+    with pytest.raises(sqlite3.IntegrityError):
+        db.save_transaction({**transaction, "amount": 5})
+    assert db.get_transactions()[0]["amount"] == 1_000_000
+
+    assert db.update_transaction_review(transaction["id"], True, "reviewed")
+    saved = db.get_transactions()[0]
+    assert saved["risk_flag"] is True and saved["notes"] == "reviewed"
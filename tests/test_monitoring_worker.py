@@ -0,0 +1,76 @@
+from utils import monitoring_worker
+from utils.monitoring import MonitoringEngine, StructuringRule
+from utils.monitoring_worker import MonitoringWorker
+
+
+def _deposit(id):
+    return {
+        "id": id, "customer_id": "CUS001", "date": "2024-01-01", "type": "Cash Deposit",
+        "amount": 1_000_000, "destination": "Self Account", "notes": "", "risk_flag": False
+    }
+
+
+def _queue(db):
+    conn = db.get_db()
+    try:
+        return conn.execute("SELECT id, status, attempts, error FROM monitoring_queue ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def _worker(max_attempts=3):
+    worker = MonitoringWorker(max_attempts=max_attempts)
+    worker.engine = MonitoringEngine(rules=[StructuringRule(min_deposits=1)])
+    return worker
+
+
+def _failing_save_alert(db, monkeypatch, failures):
+    calls = []
+
+    def save_alert(alert):
+        calls.append(alert["id"])
+        return len(calls) > failures and db.save_alert(alert)
+
+    monkeypatch.setattr(monitoring_worker, "save_alert", save_alert)
+    return calls
+
+
+def test_failed_alert_write_is_retried_without_reprocessing(db, monkeypatch):
+    calls = _failing_save_alert(db, monkeypatch, failures=1)
+    worker = _worker()
+    event_id = db.enqueue_monitoring_event("transaction", _deposit("T1"))
+
+    worker.run_once()
+    assert _queue(db)[0][1] == "pending"
+    assert db.get_all_alerts() == []
+
+    worker.run_once()
+    assert _queue(db)[0][1:3] == ("done", 2)
+    assert worker.engine.processed == 1
+    assert calls == [f"MON{event_id:06d}"] * 2
+    assert [alert["id"] for alert in db.get_all_alerts()] == [f"MON{event_id:06d}"]
+
+
+def test_event_fails_after_max_attempts(db, monkeypatch):
+    _failing_save_alert(db, monkeypatch, failures=10)
+    worker = _worker(max_attempts=2)
+    db.enqueue_monitoring_event("transaction", _deposit("T1"))
+
+    worker.run_once()
+    worker.run_once()
+    assert worker.run_once() == 0
+    status, attempts, error = _queue(db)[0][1:]
+    assert (status, attempts) == ("failed", 2)
+    assert "Could not save alert" in error
+    assert worker.engine.processed == 1
+
+
+def test_evaluated_events_are_not_excluded_from_warm_up(db, monkeypatch):
+    _failing_save_alert(db, monkeypatch, failures=1)
+    worker = _worker()
+    db.enqueue_monitoring_event("transaction", _deposit("T1"))
+    db.enqueue_monitoring_event("transaction", _deposit("T2"))
+    worker.batch_size = 1
+
+    worker.run_once()
+    assert worker._pending_transaction_ids() == {"T2"}
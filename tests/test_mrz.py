@@ -0,0 +1,37 @@
+from utils.mrz import mrz_check_digit, parse_td3
+
+# ICAO 9303 part 4 specimen passport
+LINE1 = "P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<"
+LINE2 = "L898902C36UTO7408122F1204159ZE184226B<<<<<10"
+
+
+def test_check_digits_of_specimen_fields():
+    assert mrz_check_digit("L898902C3") == "6"
+    assert mrz_check_digit("740812") == "2"
+    assert mrz_check_digit("120415") == "9"
+    assert mrz_check_digit("ZE184226B<<<<<") == "1"
+
+
+def test_parse_td3_specimen_is_valid():
+    mrz = parse_td3(LINE1, LINE2)
+    assert mrz["valid"]
+    assert all(mrz["checks"].values())
+    assert mrz["name"] == "ANNA MARIA ERIKSSON"
+    assert mrz["passport_number"] == "L898902C3"
+    assert mrz["date_of_birth"] == "1974-08-12"
+    assert mrz["date_of_expiry"] == "2012-04-15"
+    assert mrz["sex"] == "F"
+
+
+def test_ocr_letter_digit_confusions_are_corrected_before_checking():
+    mrz = parse_td3(LINE1, LINE2.replace("7408122", "74O8I22"))
+    assert mrz["valid"]
+    assert mrz["date_of_birth"] == "1974-08-12"
+
+
+def test_wrong_digit_fails_its_check_and_the_composite():
+    mrz = parse_td3(LINE1, LINE2.replace("7408122", "7408132"))
+    assert not mrz["valid"]
+    assert not mrz["checks"]["date_of_birth"]
+    assert not mrz["checks"]["composite"]
+    assert mrz["checks"]["passport_number"]
@@ -0,0 +1,23 @@
+import pytest
+from utils.ocr_backend import TesserocrBackend
+
+
+def test_failed_engine_creation_does_not_use_up_the_pool():
+    backend = TesserocrBackend(pool_size=1)
+    attempts = []
+
+    def new_engine(*args):
+        attempts.append(args)
+        if len(attempts) <= 2:
+            raise RuntimeError("tessdata not found")
+        return "engine"
+
+    backend._new_engine = new_engine
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            backend._borrow("")
+
+    assert backend._borrow("") == "engine"
+    backend._release("", "engine")
+    assert backend._borrow("") == "engine"
+    assert len(attempts) == 3
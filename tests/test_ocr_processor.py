@@ -0,0 +1,59 @@
+import threading
+import time
+import numpy as np
+from utils import ocr_processor
+from utils.ocr_processor import OCRProcessor, PREPROCESS_VARIANTS
+
+GOOD = {"text": "NIK 3171234567890123", "confidence": 95}
+POOR = {"text": "", "confidence": 20}
+
+
+def make_processor(outcomes, delays=None):
+    processor = OCRProcessor(cache=False, max_workers=len(PREPROCESS_VARIANTS))
+    started = []
+    lock = threading.Lock()
+
+    def ocr_variant(name, gray):
+        with lock:
+            started.append(name)
+        time.sleep((delays or {}).get(name, 0.01))
+        return dict(outcomes[name], seconds=0.0)
+
+    processor._ocr_variant = ocr_variant
+    return processor, started
+
+
+def test_acceptable_top_variant_skips_the_rest(db):
+    order = OCRProcessor(cache=False).variant_stats.order("ID Card (KTP)")
+    processor, started = make_processor({name: GOOD for name in order})
+
+    result = processor._extract_best_text_adaptive(np.zeros((10, 10), np.uint8), "ID Card (KTP)")
+
+    assert result["variant"] == order[0]
+    assert len(started) == ocr_processor.ADAPTIVE_WINDOW
+    assert result["early_exit"]
+    assert result["variants_skipped"] == len(order) - ocr_processor.ADAPTIVE_WINDOW
+
+
+def test_misses_submit_the_next_variant_in_rank_order(db):
+    order = OCRProcessor(cache=False).variant_stats.order("ID Card (KTP)")
+    outcomes = {name: POOR for name in order}
+    outcomes[order[2]] = GOOD
+    processor, started = make_processor(outcomes)
+
+    result = processor._extract_best_text_adaptive(np.zeros((10, 10), np.uint8), "ID Card (KTP)")
+
+    assert result["variant"] == order[2]
+    assert started[:3] == list(order[:3])
+    assert len(started) <= 3 + ocr_processor.ADAPTIVE_WINDOW - 1
+    assert result["variants_skipped"] == len(order) - len(started)
+
+
+def test_no_acceptable_variant_runs_them_all(db):
+    order = OCRProcessor(cache=False).variant_stats.order("ID Card (KTP)")
+    processor, started = make_processor({name: POOR for name in order})
+
+    result = processor._extract_best_text_adaptive(np.zeros((10, 10), np.uint8), "ID Card (KTP)")
+
+    assert sorted(started) == sorted(order)
+    assert not result["early_exit"]
@@ -0,0 +1,24 @@
+from utils.transaction_store import load_transaction_store, new_transaction_id
+
+
+def _transaction(customer_id, date, amount):
+    return {
+        "id": new_transaction_id(), "customer_id": customer_id, "date": date, "type": "Transfer",
+        "amount": amount, "destination": "External Account", "notes": "", "risk_flag": amount > 100_000_000
+    }
+
+
+def test_store_is_loaded_from_saved_transactions(db):
+    for transaction in (
+        _transaction("CUS001", "2024-01-05", 10_000_000),
+        _transaction("CUS001", "2024-02-05", 150_000_000),
+        _transaction("CUS002", "2024-01-10", 5_000_000)
+    ):
+        db.save_transaction(transaction)
+
+    store = load_transaction_store()
+    assert len(store) == 3
+    assert store.records(store.filter(customer_id="CUS001", flagged=True))[0]["amount"] == 150_000_000
+
+    only_known = load_transaction_store({"CUS002"})
+    assert [tx["customer_id"] for tx in only_known.records()] == ["CUS002"]
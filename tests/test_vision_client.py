@@ -0,0 +1,149 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+import pytest
+from utils.vision_cache import VisionResponseCache
+from utils.vision_client import CircuitBreaker, CircuitOpenError, TokenBucket, VisionClient
+
+
+class StubProvider:
+    """Local HTTP server answering with a scripted sequence of status codes, then 200"""
+
+    def __init__(self):
+        self.statuses = []
+        self.hits = 0
+        self.delay = 0.0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                with stub._lock:
+                    stub.hits += 1
+                    status = stub.statuses.pop(0) if stub.statuses else 200
+                if status != 200:
+                    self.send_response(status)
+                    self.send_header("Retry-After", "0")
+                    self.end_headers()
+                    return
+                time.sleep(stub.delay)
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(b'{"text": "ok"}')
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/generate"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def post(self):
+        request = urllib.request.Request(self.url, data=b"{}", method="POST")
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())["text"]
+
+
+@pytest.fixture
+def stub():
+    provider = StubProvider()
+    yield provider
+    provider.server.shutdown()
+
+
+def _client(**kwargs):
+    options = {"rate": 100, "burst": 10, "backoff_base": 0.001}
+    options.update(kwargs)
+    return VisionClient("stub", **options)
+
+
+def test_throttling_and_server_errors_are_retried(stub):
+    stub.statuses = [429, 503, 500]
+    client = _client()
+    assert client.call(stub.post) == "ok"
+    assert stub.hits == 4
+    assert client.stats() == {"calls": 4, "retries": 3, "rejected": 0, "breaker": "closed"}
+
+
+def test_client_errors_are_not_retried(stub):
+    stub.statuses = [400]
+    client = _client()
+    with pytest.raises(urllib.error.HTTPError):
+        client.call(stub.post)
+    assert stub.hits == 1
+    assert client.breaker.state == "closed"
+
+
+def test_retries_give_up_after_max_retries(stub):
+    stub.statuses = [503] * 10
+    client = _client(max_retries=2)
+    with pytest.raises(urllib.error.HTTPError):
+        client.call(stub.post)
+    assert stub.hits == 3
+
+
+def test_concurrent_identical_requests_reach_the_provider_once(db, stub):
+    stub.statuses = [429]
+    stub.delay = 0.2
+    cache = VisionResponseCache()
+    client = _client()
+    image = np.zeros((8, 8), dtype=np.uint8)
+    answers = []
+    threads = [
+        threading.Thread(target=lambda: answers.append(cache.cached_call("model", "prompt", image, stub.post, client=client)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert answers == ["ok"] * 8
+    # One throttled attempt, then one successful one shared by every caller
+    assert stub.hits == 2
+    assert cache.cached_call("model", "prompt", image, stub.post, client=client) == "ok"
+    assert stub.hits == 2
+
+
+def test_breaker_opens_after_repeated_failures_and_recovers(stub):
+    stub.statuses = [503] * 3
+    client = _client(max_retries=5, breaker=CircuitBreaker(failure_threshold=3, reset_seconds=0.2))
+    with pytest.raises(CircuitOpenError):
+        client.call(stub.post)
+    assert stub.hits == 3
+    assert client.breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        client.call(stub.post)
+    assert stub.hits == 3
+
+    time.sleep(0.25)
+    assert client.call(stub.post) == "ok"
+    assert client.breaker.state == "closed"
+
+
+def test_half_open_breaker_allows_a_single_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+
+def test_token_bucket_allows_burst_then_refills_at_rate():
+    bucket = TokenBucket(rate=20, capacity=2)
+    start = time.monotonic()
+    for _ in range(2):
+        assert bucket.acquire()
+    assert time.monotonic() - start < 0.02
+    for _ in range(4):
+        assert bucket.acquire()
+    assert 0.15 <= time.monotonic() - start < 0.4
+    assert not bucket.acquire(timeout=0.001)
@@ -0,0 +1,85 @@
+import threading
+import time
+from utils.vision_router import VisionRouter
+
+
+class FakeProvider:
+    """Answers after a fixed delay; payload None mimics a cache hit
+
+    Named after a real provider, whose (closed) circuit breaker the router
+    consults when ordering providers.
+    """
+
+    def __init__(self, name, delay, payload=True, error=None):
+        self.name = name
+        self.model = f"{name}-model"
+        self.delay = delay
+        self.payload = payload
+        self.error = error
+        self.calls = 0
+
+    def analyze(self, image, prompt):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return f"{self.name} answer", ({"bytes": 1} if self.payload else None)
+
+
+def test_hedge_delay_warms_up_from_the_slowest_latency_seen():
+    router = VisionRouter([FakeProvider("gemini", 0)], hedge_min_samples=3, hedge_default_delay=8.0)
+    provider = router.providers[0]
+    assert router.hedge_delay(provider) == 8.0
+
+    router.latency["gemini"].record(0.5)
+    router.latency["gemini"].record(1.0)
+    assert router.hedge_delay(provider) == 2.0
+
+    router.latency["gemini"].record(5.0)
+    assert router.hedge_delay(provider) == router.latency["gemini"].percentile(95)
+    router.latency["gemini"].record(10.0)
+    assert router.hedge_delay(provider) > 8.0
+
+
+def test_cache_hits_are_not_recorded_as_provider_latency():
+    router = VisionRouter([FakeProvider("gemini", 0, payload=False)])
+    router.analyze(None, "prompt")
+    assert router.latency["gemini"].stats()["calls"] == 0
+
+
+def test_slow_primary_is_hedged_and_the_faster_answer_wins():
+    slow, fast = FakeProvider("gemini", 0.5), FakeProvider("groq", 0.01)
+    router = VisionRouter([slow, fast], hedge_default_delay=0.05)
+    start = time.monotonic()
+    answer = router.analyze(None, "prompt")
+    assert answer["provider"] == "groq" and answer["hedged"]
+    assert time.monotonic() - start < 0.3
+    assert router.stats()["hedge_wins"] == 1
+
+
+def test_error_fails_over_to_the_next_provider():
+    broken, backup = FakeProvider("gemini", 0, error=RuntimeError("503")), FakeProvider("groq", 0)
+    answer = VisionRouter([broken, backup]).analyze(None, "prompt")
+    assert answer["provider"] == "groq" and answer["failover"]
+    assert answer["errors"] == ["gemini: 503"]
+
+
+def test_hedges_are_bounded_while_earlier_pairs_still_run():
+    slow, backup = FakeProvider("gemini", 0.4), FakeProvider("groq", 0.4)
+    router = VisionRouter([slow, backup], hedge_default_delay=0.05, max_hedges_in_flight=1)
+    answers = []
+    threads = [threading.Thread(target=lambda: answers.append(router.analyze(None, "prompt"))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = router.stats()
+    assert len(answers) == 3
+    assert stats["hedges"] == 1 and stats["hedges_skipped"] == 2
+    assert backup.calls == 1
+
+    # The slot comes back once both requests of the hedged pair are done
+    time.sleep(0.1)
+    router.analyze(None, "prompt")
+    assert router.stats()["hedges"] == 2
@@ -0,0 +1,170 @@
+"""Replay historical transactions through monitoring rules
+
+Usage:
+    python -m utils.backtest --db data/kyc.db
+    python -m utils.backtest --file transactions.csv --rules structuring \
+        --param structuring.min_deposits=4 --param structuring.window_days=10
+"""
+import argparse
+import csv
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from utils.database import DB_PATH, get_transactions, get_dispositioned_alerts
+from utils.monitoring import MonitoringEngine, RULES, build_rules, sorted_transactions
+from utils.transaction_store import to_epoch_day
+
+# Alerts within this many days of a dispositioned alert of the same type
+# and customer are counted as the same finding
+OVERLAP_WINDOW_DAYS = 7
+
+
+@dataclass
+class BacktestReport:
+    """Summary of a backtest run"""
+    transactions: int = 0
+    elapsed_seconds: float = 0.0
+    alerts: list = field(default_factory=list)
+    alerts_by_rule: dict = field(default_factory=dict)
+    dispositioned_alerts: int = 0
+    overlapping_alerts: int = 0
+    new_alerts: int = 0
+    missed_dispositioned: int = 0
+
+    @property
+    def throughput(self):
+        """Transactions processed per second"""
+        return self.transactions / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def to_dict(self):
+        return {
+            "transactions": self.transactions,
+            "elapsed_seconds": round(self.elapsed_seconds, 4),
+            "throughput_tps": round(self.throughput, 1),
+            "total_alerts": len(self.alerts),
+            "alerts_by_rule": self.alerts_by_rule,
+            "dispositioned_alerts": self.dispositioned_alerts,
+            "overlapping_alerts": self.overlapping_alerts,
+            "new_alerts": self.new_alerts,
+            "missed_dispositioned": self.missed_dispositioned
+        }
+
+
+def load_transactions_from_file(path):
+    """Load transactions from a CSV, JSON array or JSON-lines file"""
+    path = Path(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.suffix.lower() == ".csv":
+            transactions = list(csv.DictReader(f))
+        elif path.suffix.lower() in (".jsonl", ".ndjson"):
+            transactions = [json.loads(line) for line in f if line.strip()]
+        else:
+            transactions = json.load(f)
+
+    for transaction in transactions:
+        transaction["amount"] = float(transaction["amount"])
+        flag = transaction.get("risk_flag", False)
+        transaction["risk_flag"] = flag if isinstance(flag, bool) else str(flag).lower() in ("1", "true", "yes")
+    return transactions
+
+
+def _match_dispositioned(alerts, dispositioned):
+    """Count generated alerts that overlap a dispositioned alert and vice versa"""
+    index = {}
+    for alert in dispositioned:
+        index.setdefault((alert["customer_id"], alert["type"]), []).append(to_epoch_day(alert["date"]))
+
+    matched = set()
+    overlapping = 0
+    for alert in alerts:
+        day = to_epoch_day(alert["date"])
+        key = (alert["customer_id"], alert["type"])
+        hits = [
+            (key, i) for i, d in enumerate(index.get(key, ()))
+            if abs(d - day) <= OVERLAP_WINDOW_DAYS
+        ]
+        if hits:
+            overlapping += 1
+            matched.update(hits)
+    return overlapping, len(dispositioned) - len(matched)
+
+
+def run_backtest(transactions, rules=None, dispositioned_alerts=None):
+    """Replay transactions in time order through a fresh monitoring engine"""
+    engine = MonitoringEngine(rules=rules if rules is not None else build_rules())
+    ordered = sorted_transactions(transactions)
+    dispositioned_alerts = dispositioned_alerts or []
+
+    report = BacktestReport(transactions=len(ordered))
+    by_rule = Counter()
+
+    start = time.perf_counter()
+    for transaction in ordered:
+        for rule_name, alert in engine.process(transaction):
+            by_rule[rule_name] += 1
+            report.alerts.append({**alert, "rule": rule_name})
+    report.elapsed_seconds = time.perf_counter() - start
+
+    report.alerts_by_rule = dict(by_rule)
+    report.dispositioned_alerts = len(dispositioned_alerts)
+    report.overlapping_alerts, report.missed_dispositioned = _match_dispositioned(
+        report.alerts, dispositioned_alerts
+    )
+    report.new_alerts = len(report.alerts) - report.overlapping_alerts
+    return report
+
+
+def _parse_params(values):
+    """Parse rule.param=value overrides into {rule: {param: value}}"""
+    params = {}
+    for value in values or []:
+        key, _, raw = value.partition("=")
+        rule, _, name = key.partition(".")
+        if rule not in RULES or not name:
+            raise ValueError(f"Invalid rule parameter: {value}")
+        try:
+            parsed = json.loads(raw)
+        except json.JSONDecodeError:
+            parsed = raw
+        params.setdefault(rule, {})[name] = parsed
+    return params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest transaction monitoring rules")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--db", default=str(DB_PATH), help="SQLite database with transactions and alerts tables")
+    source.add_argument("--file", help="CSV, JSON or JSONL file of transactions")
+    parser.add_argument("--alerts-db", help="Database to read dispositioned alerts from (defaults to --db)")
+    parser.add_argument("--rules", default=",".join(RULES), help=f"Comma separated rules ({', '.join(RULES)})")
+    parser.add_argument("--param", action="append", help="Rule parameter override, e.g. structuring.min_deposits=4")
+    parser.add_argument("--start", help="First transaction date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last transaction date (YYYY-MM-DD)")
+    parser.add_argument("--alerts-out", help="Write generated alerts to this JSON file")
+    args = parser.parse_args(argv)
+
+    if args.file:
+        transactions = load_transactions_from_file(args.file)
+        if args.start:
+            transactions = [t for t in transactions if t["date"] >= args.start]
+        if args.end:
+            transactions = [t for t in transactions if t["date"] <= args.end]
+    else:
+        transactions = get_transactions(args.start, args.end, db_path=args.db)
+
+    alerts_db = args.alerts_db or (None if args.file else args.db)
+    dispositioned = get_dispositioned_alerts(db_path=alerts_db) if alerts_db else []
+
+    rules = build_rules([name.strip() for name in args.rules.split(",") if name.strip()], _parse_params(args.param))
+    report = run_backtest(transactions, rules, dispositioned)
+
+    print(json.dumps(report.to_dict(), indent=2))
+    if args.alerts_out:
+        with open(args.alerts_out, "w", encoding="utf-8") as f:
+            json.dump(report.alerts, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
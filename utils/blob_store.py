@@ -0,0 +1,114 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from pathlib import Path
+from PIL import Image
+from utils.database import DB_PATH
+from utils.pdf_document import PdfDocument, is_pdf
+
+BLOB_STORE_DIR = DB_PATH.parent / "blobs"
+
+# Thumbnails are generated on first request and kept next to the blobs
+THUMBNAIL_SIZE = (256, 256)
+THUMBNAIL_PDF_DPI = 40
+THUMBNAIL_JPEG_QUALITY = 80
+
+
+def read_upload(source):
+    """Bytes of an uploaded file, file object or path"""
+    if isinstance(source, (str, Path)):
+        return Path(source).read_bytes()
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    position = source.tell()
+    data = source.read()
+    source.seek(position)
+    return data
+
+
+class BlobStore:
+    """Content-addressed file store: each file is kept once under its SHA-256
+
+    Blobs live at <root>/<2 hex>/<2 hex>/<sha256> so no directory grows
+    too large; writes go through a temporary file and a rename, so a
+    blob is either complete or absent.
+    """
+
+    def __init__(self, root=BLOB_STORE_DIR):
+        self.root = Path(root)
+        self.thumbnail_root = self.root / "thumbnails"
+
+    @staticmethod
+    def content_hash(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def path(self, digest):
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def exists(self, digest):
+        return self.path(digest).is_file()
+
+    def put(self, data):
+        """Store bytes and return their SHA-256; identical content is written once"""
+        digest = self.content_hash(data)
+        path = self.path(digest)
+        if path.is_file():
+            return digest
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return digest
+
+    def get(self, digest):
+        """Bytes of a stored blob"""
+        return self.path(digest).read_bytes()
+
+    def thumbnail(self, digest, size=THUMBNAIL_SIZE):
+        """Path of a JPEG thumbnail of an image or the first page of a PDF, created on first use"""
+        path = self.thumbnail_root / digest[:2] / f"{digest}_{size[0]}x{size[1]}.jpg"
+        if path.is_file():
+            return path
+
+        source = self.path(digest)
+        with open(source, "rb") as f:
+            pdf = is_pdf(f)
+        if pdf:
+            image = PdfDocument(source).render_page(0, dpi=THUMBNAIL_PDF_DPI).pil
+        else:
+            image = Image.open(source)
+            # Decode at a reduced size when the format supports it (JPEG)
+            image.draft("RGB", size)
+        image = image.convert("RGB")
+        image.thumbnail(size)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        buffered = io.BytesIO()
+        image.save(buffered, format="JPEG", quality=THUMBNAIL_JPEG_QUALITY)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(buffered.getvalue())
+        os.replace(tmp_path, path)
+        return path
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    """Get the process-wide blob store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = BlobStore()
+    return _store
@@ -0,0 +1,184 @@
+import re
+import threading
+from collections import defaultdict
+from utils.database import (
+    get_or_create_counterparty, upsert_counterparty_edge, get_counterparty_edges, get_unindexed_transactions
+)
+
+# Destinations that refer to the customer's own accounts are not counterparties
+SELF_DESTINATIONS = {"self", "self account", "own account", "rekening sendiri"}
+
+# Fan-in threshold used by the money-mule monitoring rule
+FAN_IN_ALERT_THRESHOLD = 5
+
+
+def normalize_counterparty(destination):
+    """Normalize free-text destination into a stable counterparty key
+
+    Account numbers keep only their digits so "123-456 789" and
+    "123456789" collapse to the same node; names are lower-cased with
+    punctuation and repeated whitespace removed.
+    """
+    if not destination:
+        return None
+
+    text = destination.strip().lower()
+    if text in SELF_DESTINATIONS:
+        return None
+
+    digits = re.sub(r'^(?:acc|acct|account|rek|rekening|no)\b[\s\.:#]*', '', text)
+    digits = re.sub(r'[\s\-\.]', '', digits)
+    if digits.isdigit() and len(digits) >= 6:
+        return f"acct:{digits}"
+
+    text = re.sub(r'[^\w\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return f"name:{text}" if text else None
+
+
+class CounterpartyGraph:
+    """Bipartite customer <-> counterparty adjacency index
+
+    Both directions are kept as dicts of sets in memory so fan-in,
+    fan-out and neighbourhood queries are set lookups; every ingested
+    edge is also written through to SQLite so the index can be rebuilt
+    on startup.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.customer_edges = defaultdict(set)      # customer_id -> {counterparty_id}
+        self.counterparty_edges = defaultdict(set)  # counterparty_id -> {customer_id}
+        self.counterparty_ids = {}                  # normalized_name -> counterparty_id
+        self.display_names = {}                     # counterparty_id -> display name
+        self._last_counterparty_id = 0
+        self._last_edge_rowid = 0
+
+    @classmethod
+    def load(cls):
+        """Build the in-memory index from the database, indexing saved transactions it has not seen"""
+        graph = cls()
+        graph.refresh()
+        graph.backfill()
+        return graph
+
+    def backfill(self):
+        """Ingest saved transactions missing from the graph (history and demo data); returns how many"""
+        transactions = get_unindexed_transactions()
+        for transaction in transactions:
+            self.ingest(transaction)
+        return len(transactions)
+
+    def refresh(self):
+        """Pull counterparties and edges written since the last load
+
+        Lets readers pick up edges ingested by another process (the
+        monitoring worker) without reloading the whole graph.
+        """
+        counterparties, edges = get_counterparty_edges(self._last_counterparty_id, self._last_edge_rowid)
+        with self._lock:
+            for counterparty_id, normalized_name, display_name in counterparties:
+                self.counterparty_ids[normalized_name] = counterparty_id
+                self.display_names[counterparty_id] = display_name
+                self._last_counterparty_id = max(self._last_counterparty_id, counterparty_id)
+            for customer_id, counterparty_id, _, _, _, rowid in edges:
+                self._add_edge(customer_id, counterparty_id)
+                self._last_edge_rowid = max(self._last_edge_rowid, rowid)
+        return self
+
+    def _add_edge(self, customer_id, counterparty_id):
+        self.customer_edges[customer_id].add(counterparty_id)
+        self.counterparty_edges[counterparty_id].add(customer_id)
+
+    def ingest(self, transaction, persist=True):
+        """Add a transaction's customer -> destination edge to the index
+
+        Returns the counterparty id, or None when the destination is not
+        a counterparty (empty or the customer's own account).
+        """
+        normalized = normalize_counterparty(transaction.get("destination"))
+        if normalized is None:
+            return None
+
+        with self._lock:
+            counterparty_id = self.counterparty_ids.get(normalized)
+            if counterparty_id is None:
+                if persist:
+                    counterparty_id = get_or_create_counterparty(
+                        normalized, transaction["destination"].strip(), transaction["date"]
+                    )
+                else:
+                    counterparty_id = len(self.counterparty_ids) + 1
+                self.counterparty_ids[normalized] = counterparty_id
+                self.display_names[counterparty_id] = transaction["destination"].strip()
+
+            self._add_edge(transaction["customer_id"], counterparty_id)
+
+        if persist:
+            upsert_counterparty_edge(
+                transaction["customer_id"], counterparty_id, transaction["amount"], transaction["date"],
+                transaction.get("id")
+            )
+        return counterparty_id
+
+    def lookup(self, destination):
+        """Get the counterparty id for a free-text destination, if known"""
+        normalized = normalize_counterparty(destination)
+        return self.counterparty_ids.get(normalized) if normalized else None
+
+    # ------------------------------------------------------------------
+    # Graph queries
+    # ------------------------------------------------------------------
+    def fan_in_count(self, counterparty_id):
+        """Number of distinct customers sending to a counterparty"""
+        return len(self.counterparty_edges.get(counterparty_id, ()))
+
+    def fan_out_count(self, customer_id):
+        """Number of distinct counterparties a customer sends to"""
+        return len(self.customer_edges.get(customer_id, ()))
+
+    def counterparties_of(self, customer_id):
+        """Counterparties of a customer with their fan-in, largest first"""
+        return sorted(
+            (
+                (self.display_names.get(cp, str(cp)), self.fan_in_count(cp))
+                for cp in self.customer_edges.get(customer_id, ())
+            ),
+            key=lambda item: item[1],
+            reverse=True
+        )
+
+    def shared_counterparty_customers(self, customer_id):
+        """Other customers sharing at least one counterparty, with the shared count"""
+        shared = defaultdict(int)
+        for counterparty_id in self.customer_edges.get(customer_id, ()):
+            for other in self.counterparty_edges[counterparty_id]:
+                if other != customer_id:
+                    shared[other] += 1
+        return dict(sorted(shared.items(), key=lambda item: item[1], reverse=True))
+
+    def two_hop_neighbours(self, customer_id):
+        """Customers linked through an intermediate customer but not directly
+
+        In the customer projection of the graph (customers connected when
+        they share a counterparty) these are the nodes at distance two.
+        """
+        direct = set(self.shared_counterparty_customers(customer_id))
+        second = set()
+        for neighbour in direct:
+            second.update(self.shared_counterparty_customers(neighbour))
+        return second - direct - {customer_id}
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_counterparty_graph():
+    """Get the process-wide counterparty graph, loading it on first use"""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = CounterpartyGraph.load()
+    return _graph
@@ -63,6 +63,219 @@ def init_db():
         )
     ''')
     
+    # Add transactions table
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id TEXT PRIMARY KEY,
+            customer_id TEXT NOT NULL,
+            date DATE NOT NULL,
+            type TEXT NOT NULL,
+            amount REAL NOT NULL,
+            destination TEXT,
+            notes TEXT,
+            risk_flag BOOLEAN NOT NULL,
+            FOREIGN KEY (customer_id) REFERENCES customers(id)
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date)')
+    
+    # Durable queue of work for the background monitoring worker
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS monitoring_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            enqueued_at TEXT NOT NULL,
+            claimed_at TEXT,
+            processed_at TEXT,
+            error TEXT
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_monitoring_queue_status ON monitoring_queue (status, id)')
+    
+    # Per document type win statistics of OCR preprocessing variants
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS ocr_variant_stats (
+            doc_type TEXT NOT NULL,
+            variant TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (doc_type, variant)
+        )
+    ''')
+    
+    # Per-customer online amount statistics (packed AmountProfile blobs)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS customer_amount_stats (
+            customer_id TEXT NOT NULL,
+            tx_type TEXT NOT NULL,
+            state BLOB NOT NULL,
+            last_updated DATE NOT NULL,
+            PRIMARY KEY (customer_id, tx_type)
+        )
+    ''')
+    
+    # Normalized counterparties seen in transaction destinations
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS counterparties (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            normalized_name TEXT UNIQUE NOT NULL,
+            display_name TEXT NOT NULL,
+            first_seen DATE NOT NULL
+        )
+    ''')
+    
+    # Customer <-> counterparty adjacency, one row per edge
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS customer_counterparties (
+            customer_id TEXT NOT NULL,
+            counterparty_id INTEGER NOT NULL,
+            tx_count INTEGER NOT NULL,
+            total_amount REAL NOT NULL,
+            first_date DATE NOT NULL,
+            last_date DATE NOT NULL,
+            PRIMARY KEY (customer_id, counterparty_id),
+            FOREIGN KEY (counterparty_id) REFERENCES counterparties(id)
+        )
+    ''')
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_customer_counterparties_counterparty
+        ON customer_counterparties (counterparty_id)
+    ''')
+    
+    # Transactions already counted on their edge, so re-ingesting one is a no-op
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS counterparty_transactions (
+            transaction_id TEXT PRIMARY KEY
+        )
+    ''')
+    # Edges from before transactions were tracked cannot be told apart from
+    # new ones; drop them so the graph is rebuilt from the transactions table
+    c.execute('SELECT EXISTS (SELECT 1 FROM counterparty_transactions)')
+    if not c.fetchone()[0]:
+        c.execute('DELETE FROM customer_counterparties')
+    
+    # OCR results keyed by image content hash, doc type and OCR configuration
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS ocr_cache (
+            cache_key TEXT PRIMARY KEY,
+            doc_type TEXT,
+            result TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_access TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_access ON ocr_cache (last_access)')
+    
+    # Vision model responses keyed by model, prompt hash and image hash.
+    # Times are epoch seconds so TTL checks are plain comparisons.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS vision_cache (
+            cache_key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_vision_cache_last_access ON vision_cache (last_access)')
+    
+    # Batch document verification jobs, one row per file
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS verification_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            batch_id TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            doc_type TEXT NOT NULL,
+            customer_id TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_verification_jobs_status ON verification_jobs (status, id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_verification_jobs_batch ON verification_jobs (batch_id)')
+    
+    # Path taken by each hybrid verification (OCR only or OCR + vision model)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS cascade_decisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            doc_type TEXT NOT NULL,
+            customer_id TEXT,
+            path TEXT NOT NULL,
+            reasons TEXT,
+            ocr_confidence REAL,
+            ocr_seconds REAL,
+            vision_seconds REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Uploaded files kept in the blob store, one row per upload, with the
+    # outcome of their verification
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id TEXT,
+            doc_type TEXT NOT NULL,
+            file_name TEXT,
+            content_hash TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            verification_result TEXT,
+            verified_by TEXT,
+            verified_at TEXT
+        )
+    ''')
+    try:
+        # Databases created before results were tagged with their writer
+        c.execute('ALTER TABLE documents ADD COLUMN verified_by TEXT')
+    except sqlite3.OperationalError:
+        pass
+    c.execute('CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents (content_hash, doc_type)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_documents_customer ON documents (customer_id, id)')
+    
+    # Outcome of every verification run, for history views and repeat checks
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS verification_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id TEXT,
+            doc_type TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            document_id INTEGER,
+            status TEXT NOT NULL,
+            path TEXT,
+            model TEXT,
+            fields TEXT,
+            matches TEXT,
+            confidence_scores TEXT,
+            timings TEXT,
+            result TEXT,
+            created_at TEXT NOT NULL
+        )
+    ''')
+    try:
+        # Databases created before full results were kept for reuse
+        c.execute('ALTER TABLE verification_results ADD COLUMN result TEXT')
+    except sqlite3.OperationalError:
+        pass
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_verification_results_customer
+        ON verification_results (customer_id, id)
+    ''')
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_verification_results_hash
+        ON verification_results (content_hash, doc_type, customer_id, id)
+    ''')
+    
     conn.commit()
     conn.close()
 
@@ -111,6 +324,16 @@ def get_all_customers():
     conn.close()
     return customers
 
+def get_customer(customer_id):
+    """Get a single customer from database"""
+    conn = get_db()
+    c = conn.cursor()
+    c.execute('SELECT * FROM customers WHERE id = ?', (customer_id,))
+    row = c.fetchone()
+    customer = db_to_dict(row, c) if row else None
+    conn.close()
+    return customer
+
 def refresh_customer_state():
     """Refresh customer state after database operations"""
     st.session_state.customers = get_all_customers()
@@ -393,3 +616,771 @@ def delete_alert(alert_id):
     finally:
         if conn:
             conn.close()
+
+
+def save_transaction(transaction):
+    """Insert a new transaction; raises sqlite3.IntegrityError if its id is already taken"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        columns = ["id", "customer_id", "date", "type", "amount", "destination", "notes", "risk_flag"]
+        cursor.execute(
+            f'INSERT INTO transactions ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+            [transaction.get(col) for col in columns]
+        )
+        conn.commit()
+        return True
+    except sqlite3.IntegrityError:
+        # Never overwrite an existing transaction with a new one
+        raise
+    except Exception as e:
+        print(f"Error saving transaction: {str(e)}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def update_transaction_review(transaction_id, risk_flag, notes):
+    """Update the risk flag and notes of a saved transaction"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(
+            'UPDATE transactions SET risk_flag = ?, notes = ? WHERE id = ?',
+            (risk_flag, notes, transaction_id)
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+    except Exception as e:
+        print(f"Error updating transaction: {str(e)}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def get_transactions(start_date=None, end_date=None, db_path=None):
+    """Get transactions ordered by date, optionally within a date range"""
+    try:
+        conn = sqlite3.connect(db_path) if db_path else get_db()
+        cursor = conn.cursor()
+        sql = 'SELECT * FROM transactions WHERE 1 = 1'
+        params = []
+        if start_date:
+            sql += ' AND date >= ?'
+            params.append(start_date)
+        if end_date:
+            sql += ' AND date <= ?'
+            params.append(end_date)
+        cursor.execute(sql + ' ORDER BY date, id', params)
+        transactions = [dict(zip([col[0] for col in cursor.description], row)) for row in cursor.fetchall()]
+        for transaction in transactions:
+            transaction["risk_flag"] = bool(transaction["risk_flag"])
+        return transactions
+    finally:
+        if conn:
+            conn.close()
+
+def get_dispositioned_alerts(db_path=None):
+    """Get alerts that analysts have closed or completed"""
+    try:
+        conn = sqlite3.connect(db_path) if db_path else get_db()
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM alerts WHERE status IN ('Closed', 'Completed') ORDER BY date")
+        return [dict(zip([col[0] for col in cursor.description], row)) for row in cursor.fetchall()]
+    finally:
+        if conn:
+            conn.close()
+
+def get_or_create_counterparty(normalized_name, display_name, seen_date):
+    """Get counterparty id by normalized name, creating it if needed"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(
+            'INSERT OR IGNORE INTO counterparties (normalized_name, display_name, first_seen) VALUES (?, ?, ?)',
+            (normalized_name, display_name, seen_date)
+        )
+        cursor.execute('SELECT id FROM counterparties WHERE normalized_name = ?', (normalized_name,))
+        counterparty_id = cursor.fetchone()[0]
+        conn.commit()
+        return counterparty_id
+    finally:
+        if conn:
+            conn.close()
+
+def upsert_counterparty_edge(customer_id, counterparty_id, amount, tx_date, transaction_id=None):
+    """Record a transaction on the customer -> counterparty edge, once per transaction id"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        if transaction_id is not None:
+            cursor.execute(
+                'INSERT OR IGNORE INTO counterparty_transactions (transaction_id) VALUES (?)', (transaction_id,)
+            )
+            if cursor.rowcount == 0:
+                return True
+        cursor.execute('''
+            INSERT INTO customer_counterparties
+            (customer_id, counterparty_id, tx_count, total_amount, first_date, last_date)
+            VALUES (?, ?, 1, ?, ?, ?)
+            ON CONFLICT (customer_id, counterparty_id) DO UPDATE SET
+                tx_count = tx_count + 1,
+                total_amount = total_amount + excluded.total_amount,
+                first_date = MIN(first_date, excluded.first_date),
+                last_date = MAX(last_date, excluded.last_date)
+        ''', (customer_id, counterparty_id, amount, tx_date, tx_date))
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error saving counterparty edge: {str(e)}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def get_unindexed_transactions():
+    """Saved, already monitored transactions not yet counted in the counterparty graph, oldest first"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT t.* FROM transactions t
+            LEFT JOIN counterparty_transactions c ON c.transaction_id = t.id
+            WHERE c.transaction_id IS NULL AND t.id NOT IN (
+                -- Still queued: the monitoring worker ingests these when it runs their rules
+                SELECT json_extract(payload, '$.id') FROM monitoring_queue
+                WHERE kind = 'transaction' AND status IN ('pending', 'processing')
+            )
+            ORDER BY t.date, t.id
+        ''')
+        return [dict(zip([col[0] for col in cursor.description], row)) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"Error loading unindexed transactions: {str(e)}")
+        return []
+    finally:
+        if conn:
+            conn.close()
+
+def get_counterparty_edges(after_counterparty_id=0, after_edge_rowid=0):
+    """Get counterparties and customer edges added after the given ids
+
+    Edges carry their rowid last so callers can refresh incrementally.
+    """
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT id, normalized_name, display_name FROM counterparties WHERE id > ? ORDER BY id',
+            (after_counterparty_id,)
+        )
+        counterparties = cursor.fetchall()
+        cursor.execute('''
+            SELECT customer_id, counterparty_id, tx_count, total_amount, last_date, rowid
+            FROM customer_counterparties WHERE rowid > ? ORDER BY rowid
+        ''', (after_edge_rowid,))
+        edges = cursor.fetchall()
+        return counterparties, edges
+    except Exception as e:
+        print(f"Error loading counterparty graph: {str(e)}")
+        return [], []
+    finally:
+        if conn:
+            conn.close()
+
+def get_all_alerts(id_prefix=None):
+    """Get all alerts, optionally only those whose id starts with a prefix"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        if id_prefix:
+            cursor.execute('SELECT * FROM alerts WHERE id LIKE ? ORDER BY date', (f"{id_prefix}%",))
+        else:
+            cursor.execute('SELECT * FROM alerts ORDER BY date')
+        return [dict(zip([col[0] for col in cursor.description], row)) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"Error getting alerts: {str(e)}")
+        return []
+    finally:
+        if conn:
+            conn.close()
+
+# Monitoring queue operations
+def enqueue_monitoring_event(kind, payload):
+    """Add a unit of work for the monitoring worker"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(
+            'INSERT INTO monitoring_queue (kind, payload, enqueued_at) VALUES (?, ?, ?)',
+            (kind, json.dumps(payload, default=str), datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+        conn.commit()
+        return cursor.lastrowid
+    except Exception as e:
+        print(f"Error enqueuing monitoring event: {str(e)}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+def claim_monitoring_events(limit=100):
+    """Atomically claim the oldest pending events for processing"""
+    conn = get_db()
+    conn.isolation_level = None
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute(
+            "SELECT id, kind, payload, attempts FROM monitoring_queue WHERE status = 'pending' ORDER BY id LIMIT ?",
+            (limit,)
+        )
+        rows = cursor.fetchall()
+        if rows:
+            cursor.executemany(
+                "UPDATE monitoring_queue SET status = 'processing', claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                [(datetime.now().strftime("%Y-%m-%d %H:%M:%S"), row[0]) for row in rows]
+            )
+        cursor.execute('COMMIT')
+        return [
+            {"id": row[0], "kind": row[1], "payload": json.loads(row[2]), "attempts": row[3] + 1}
+            for row in rows
+        ]
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+def complete_monitoring_event(event_id, error=None, retry=False):
+    """Mark a claimed event as done, failed, or pending again for retry"""
+    status = "done" if error is None else ("pending" if retry else "failed")
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(
+            'UPDATE monitoring_queue SET status = ?, processed_at = ?, error = ? WHERE id = ?',
+            (status, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), error, event_id)
+        )
+        conn.commit()
+    finally:
+        if conn:
+            conn.close()
+
+def update_monitoring_event_payload(event_id, payload):
+    """Replace the payload of a claimed event, e.g. to keep results a retry should reuse"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(
+            'UPDATE monitoring_queue SET payload = ? WHERE id = ?',
+            (json.dumps(payload, default=str), event_id)
+        )
+        conn.commit()
+    finally:
+        if conn:
+            conn.close()
+
+def requeue_stale_monitoring_events(older_than):
+    """Return events stuck in processing (e.g. after a worker crash) to the queue"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE monitoring_queue SET status = 'pending' WHERE status = 'processing' AND claimed_at < ?",
+            (older_than,)
+        )
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        if conn:
+            conn.close()
+
+def get_monitoring_queue_stats():
+    """Count queued monitoring events by status"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('SELECT status, COUNT(*) FROM monitoring_queue GROUP BY status')
+        return dict(cursor.fetchall())
+    except Exception as e:
+        print(f"Error reading monitoring queue: {str(e)}")
+        return {}
+    finally:
+        if conn:
+            conn.close()
+
+def get_ocr_variant_stats(doc_type):
+    """Get {variant: (attempts, wins)} for a document type"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('SELECT variant, attempts, wins FROM ocr_variant_stats WHERE doc_type = ?', (doc_type,))
+        return {variant: (attempts, wins) for variant, attempts, wins in cursor.fetchall()}
+    except Exception as e:
+        print(f"Error reading OCR variant stats: {str(e)}")
+        return {}
+    finally:
+        if conn:
+            conn.close()
+
+def record_ocr_variant_result(doc_type, attempted, winner):
+    """Count an attempt for every variant tried and a win for the chosen one"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO ocr_variant_stats (doc_type, variant, attempts, wins) VALUES (?, ?, 1, ?)
+            ON CONFLICT (doc_type, variant) DO UPDATE SET
+                attempts = attempts + 1,
+                wins = wins + excluded.wins
+        ''', [(doc_type, variant, 1 if variant == winner else 0) for variant in attempted])
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error saving OCR variant stats: {str(e)}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def get_ocr_cache_entry(cache_key):
+    """Get a cached OCR result (JSON text) and mark it as recently used"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('SELECT result FROM ocr_cache WHERE cache_key = ?', (cache_key,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute('UPDATE ocr_cache SET last_access = CURRENT_TIMESTAMP WHERE cache_key = ?', (cache_key,))
+        conn.commit()
+        return row[0]
+    except Exception as e:
+        print(f"Error reading OCR cache: {str(e)}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+def save_ocr_cache_entry(cache_key, doc_type, result, max_bytes):
+    """Store an OCR result and evict least recently used entries beyond max_bytes"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO ocr_cache (cache_key, doc_type, result, size)
+            VALUES (?, ?, ?, ?)
+        ''', (cache_key, doc_type, result, len(result)))
+        
+        cursor.execute('SELECT COALESCE(SUM(size), 0) FROM ocr_cache')
+        excess = cursor.fetchone()[0] - max_bytes
+        if excess > 0:
+            cursor.execute('SELECT cache_key, size FROM ocr_cache ORDER BY last_access, created_at')
+            evict = []
+            for key, size in cursor.fetchall():
+                if excess <= 0:
+                    break
+                if key != cache_key:
+                    evict.append((key,))
+                    excess -= size
+            cursor.executemany('DELETE FROM ocr_cache WHERE cache_key = ?', evict)
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error saving OCR cache: {str(e)}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def get_vision_cache_entry(cache_key, created_after, now):
+    """Get a cached vision response newer than created_after and mark it as used"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT response FROM vision_cache WHERE cache_key = ? AND created_at > ?',
+            (cache_key, created_after)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute('UPDATE vision_cache SET last_access = ? WHERE cache_key = ?', (now, cache_key))
+        conn.commit()
+        return row[0]
+    except Exception as e:
+        print(f"Error reading vision cache: {str(e)}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+def save_vision_cache_entry(cache_key, model, response, now, expired_before, max_entries):
+    """Store a vision response, drop expired rows and evict least recently used beyond max_entries"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO vision_cache (cache_key, model, response, created_at, last_access)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (cache_key, model, response, now, now))
+        cursor.execute('DELETE FROM vision_cache WHERE created_at <= ?', (expired_before,))
+        cursor.execute('''
+            DELETE FROM vision_cache WHERE cache_key IN (
+                SELECT cache_key FROM vision_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        ''', (max_entries,))
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error saving vision cache: {str(e)}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def save_cascade_decision(decision):
+    """Record which verification path a document took"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO cascade_decisions
+                (doc_type, customer_id, path, reasons, ocr_confidence, ocr_seconds, vision_seconds)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            decision["doc_type"],
+            decision.get("customer_id"),
+            decision["path"],
+            json.dumps(decision.get("reasons", [])),
+            decision.get("ocr_confidence"),
+            decision.get("ocr_seconds"),
+            decision.get("vision_seconds")
+        ))
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error saving cascade decision: {str(e)}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def get_cascade_summary():
+    """Count verifications per path with their average stage latencies"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT path, COUNT(*), AVG(ocr_seconds), AVG(vision_seconds)
+            FROM cascade_decisions
+            GROUP BY path
+        ''')
+        return {
+            path: {"count": count, "avg_ocr_seconds": ocr_seconds or 0.0, "avg_vision_seconds": vision_seconds or 0.0}
+            for path, count, ocr_seconds, vision_seconds in cursor.fetchall()
+        }
+    except Exception as e:
+        print(f"Error reading cascade decisions: {str(e)}")
+        return {}
+    finally:
+        if conn:
+            conn.close()
+
+def enqueue_verification_jobs(batch_id, files, doc_type, customer_id=None):
+    """Add one pending job per (file_name, file_path) to a batch"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cursor.executemany('''
+            INSERT INTO verification_jobs (batch_id, file_name, file_path, doc_type, customer_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(batch_id, file_name, file_path, doc_type, customer_id, now) for file_name, file_path in files])
+        conn.commit()
+        return cursor.rowcount
+    except Exception as e:
+        print(f"Error enqueuing verification jobs: {str(e)}")
+        return 0
+    finally:
+        if conn:
+            conn.close()
+
+def claim_verification_job():
+    """Atomically claim the oldest pending verification job, or None"""
+    conn = get_db()
+    conn.isolation_level = None
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute(
+            "SELECT * FROM verification_jobs WHERE status = 'pending' ORDER BY id LIMIT 1"
+        )
+        row = cursor.fetchone()
+        job = db_to_dict(row, cursor) if row else None
+        if job:
+            cursor.execute(
+                "UPDATE verification_jobs SET status = 'processing', started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), job["id"])
+            )
+            job["attempts"] += 1
+        cursor.execute('COMMIT')
+        return job
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+def complete_verification_job(job_id, result=None, error=None, retry=False):
+    """Store a job's result, or mark it failed / pending again for retry"""
+    status = "done" if error is None else ("pending" if retry else "failed")
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(
+            'UPDATE verification_jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?',
+            (
+                status,
+                json.dumps(result, default=str) if result is not None else None,
+                error,
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                job_id
+            )
+        )
+        conn.commit()
+    finally:
+        if conn:
+            conn.close()
+
+def requeue_processing_verification_jobs():
+    """Return jobs left in processing by a stopped worker pool to the queue"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute("UPDATE verification_jobs SET status = 'pending' WHERE status = 'processing'")
+        conn.commit()
+        return cursor.rowcount
+    except Exception as e:
+        print(f"Error requeuing verification jobs: {str(e)}")
+        return 0
+    finally:
+        if conn:
+            conn.close()
+
+def get_verification_batches():
+    """Per-batch job counts by status, newest batch first"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT batch_id, doc_type, MIN(created_at), COUNT(*),
+                   SUM(status = 'pending'), SUM(status = 'processing'),
+                   SUM(status = 'done'), SUM(status = 'failed')
+            FROM verification_jobs
+            GROUP BY batch_id
+            ORDER BY MIN(id) DESC
+        ''')
+        return [
+            {
+                "batch_id": row[0], "doc_type": row[1], "created_at": row[2], "total": row[3],
+                "pending": row[4], "processing": row[5], "done": row[6], "failed": row[7]
+            }
+            for row in cursor.fetchall()
+        ]
+    except Exception as e:
+        print(f"Error reading verification batches: {str(e)}")
+        return []
+    finally:
+        if conn:
+            conn.close()
+
+def get_verification_jobs(batch_id):
+    """All jobs of a batch with their decoded results"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM verification_jobs WHERE batch_id = ? ORDER BY id', (batch_id,))
+        jobs = [db_to_dict(row, cursor) for row in cursor.fetchall()]
+        for job in jobs:
+            job["result"] = json.loads(job["result"]) if job["result"] else None
+        return jobs
+    except Exception as e:
+        print(f"Error reading verification jobs: {str(e)}")
+        return []
+    finally:
+        if conn:
+            conn.close()
+
+def save_document(customer_id, doc_type, file_name, content_hash, size):
+    """Record an upload stored in the blob store and return its id"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO documents (customer_id, doc_type, file_name, content_hash, size, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (customer_id, doc_type, file_name, content_hash, size, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        conn.commit()
+        return cursor.lastrowid
+    except Exception as e:
+        print(f"Error saving document: {str(e)}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+def save_document_result(document_id, result, verified_by):
+    """Attach a verification result to a stored document, tagged with the component that wrote it"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(
+            'UPDATE documents SET verification_result = ?, verified_by = ?, verified_at = ? WHERE id = ?',
+            (json.dumps(result, default=str), verified_by, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), document_id)
+        )
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error saving document result: {str(e)}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def get_verified_document(content_hash, doc_type, customer_id, verified_by):
+    """Latest upload of identical content for the same doc type and customer verified by one component, or None
+
+    Each component stores its own result layout, so only results written
+    by verified_by are returned.
+    """
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT * FROM documents
+            WHERE content_hash = ? AND doc_type = ? AND customer_id IS ? AND verified_by = ?
+                AND verification_result IS NOT NULL
+            ORDER BY id DESC LIMIT 1
+        ''', (content_hash, doc_type, customer_id, verified_by))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        document = db_to_dict(row, cursor)
+        document["verification_result"] = json.loads(document["verification_result"])
+        return document
+    except Exception as e:
+        print(f"Error reading document: {str(e)}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+def get_customer_documents(customer_id):
+    """Stored uploads of a customer, newest first, with decoded results"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM documents WHERE customer_id = ? ORDER BY id DESC', (customer_id,))
+        documents = [db_to_dict(row, cursor) for row in cursor.fetchall()]
+        for document in documents:
+            if document["verification_result"]:
+                document["verification_result"] = json.loads(document["verification_result"])
+        return documents
+    except Exception as e:
+        print(f"Error reading customer documents: {str(e)}")
+        return []
+    finally:
+        if conn:
+            conn.close()
+
+VERIFICATION_RESULT_JSON_COLUMNS = ("fields", "matches", "confidence_scores", "timings")
+
+def _verification_result_row(row, cursor):
+    result = db_to_dict(row, cursor)
+    for column in VERIFICATION_RESULT_JSON_COLUMNS:
+        result[column] = json.loads(result[column]) if result[column] else {}
+    result["result"] = json.loads(result["result"]) if result["result"] else None
+    return result
+
+def save_verification_result(result):
+    """Store the outcome of a verification run and return its id
+
+    result["result"], when given, is the verifier's full output kept so an
+    identical document can be answered without verifying it again.
+    """
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO verification_results
+                (customer_id, doc_type, content_hash, document_id, status, path, model,
+                 fields, matches, confidence_scores, timings, result, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            result.get("customer_id"),
+            result["doc_type"],
+            result["content_hash"],
+            result.get("document_id"),
+            result["status"],
+            result.get("path"),
+            result.get("model"),
+            *(json.dumps(result.get(column) or {}, default=str) for column in VERIFICATION_RESULT_JSON_COLUMNS),
+            json.dumps(result["result"], default=str) if result.get("result") is not None else None,
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        ))
+        conn.commit()
+        return cursor.lastrowid
+    except Exception as e:
+        print(f"Error saving verification result: {str(e)}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+def get_latest_verification_result(content_hash, doc_type, customer_id=None, path=None, reusable=False):
+    """Newest result for identical content of a doc type and customer, or None
+
+    path limits the search to one path or a tuple of paths; reusable to
+    runs whose full output was kept for reuse.
+    """
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        query = '''
+            SELECT * FROM verification_results
+            WHERE content_hash = ? AND doc_type = ? AND customer_id IS ?
+        '''
+        params = [content_hash, doc_type, customer_id]
+        if path:
+            paths = (path,) if isinstance(path, str) else tuple(path)
+            query += f" AND path IN ({', '.join('?' * len(paths))})"
+            params.extend(paths)
+        if reusable:
+            query += " AND result IS NOT NULL"
+        cursor.execute(query + " ORDER BY id DESC LIMIT 1", params)
+        row = cursor.fetchone()
+        return _verification_result_row(row, cursor) if row else None
+    except Exception as e:
+        print(f"Error reading verification result: {str(e)}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+def get_customer_verification_results(customer_id, limit=50):
+    """Verification history of a customer, newest first"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT * FROM verification_results WHERE customer_id = ? ORDER BY id DESC LIMIT ?',
+            (customer_id, limit)
+        )
+        return [_verification_result_row(row, cursor) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"Error reading verification history: {str(e)}")
+        return []
+    finally:
+        if conn:
+            conn.close()
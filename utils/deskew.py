@@ -0,0 +1,120 @@
+"""Skew estimation by projection-profile search on a downsampled image, single-warp deskew
+
+Benchmark against the previous full-resolution minAreaRect approach:
+    python -m utils.deskew --width 4000 --height 3000 --angle 4
+"""
+import argparse
+import time
+import tracemalloc
+import cv2
+import numpy as np
+
+# Skew is estimated on an image no larger than this on its longest side
+ESTIMATE_MAX_SIDE = 600
+
+# Skews outside this range are not corrected (likely a rotated page, not skew)
+MAX_SKEW_DEGREES = 15
+
+# Corrections smaller than this are skipped to avoid a needless warp
+MIN_SKEW_DEGREES = 0.2
+
+
+def _downsample(gray, max_side=ESTIMATE_MAX_SIDE):
+    scale = max_side / max(gray.shape[:2])
+    if scale >= 1:
+        return gray
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def _profile_angle(small, max_angle):
+    """Angle whose horizontal projection profile is sharpest (text lines aligned)"""
+    _, binary = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    height, width = binary.shape
+    center = (width / 2, height / 2)
+
+    def score(angle):
+        matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+        rotated = cv2.warpAffine(binary, matrix, (width, height), flags=cv2.INTER_NEAREST)
+        rows = rotated.sum(axis=1, dtype=np.float64)
+        return float(np.sum(np.diff(rows) ** 2))
+
+    coarse = max(np.arange(-max_angle, max_angle + 0.5, 1.0), key=score)
+    return float(max(np.arange(coarse - 1.0, coarse + 1.01, 0.1), key=score))
+
+
+def estimate_skew_angle(gray, max_angle=MAX_SKEW_DEGREES):
+    """Skew in degrees (counter-clockwise correction for cv2.getRotationMatrix2D)
+
+    Text lines give the sharpest horizontal projection profile when level;
+    a 1 degree search is refined to 0.1 degrees around the best angle.
+    """
+    return _profile_angle(_downsample(gray), max_angle)
+
+
+def deskew(gray, angle=None, dst=None):
+    """Rotate the image by its estimated skew with a single warp, into dst when given"""
+    if angle is None:
+        angle = estimate_skew_angle(gray)
+    if abs(angle) < MIN_SKEW_DEGREES:
+        return gray
+    height, width = gray.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(
+        gray, matrix, (width, height), dst=dst, flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE
+    )
+
+
+def legacy_deskew(gray):
+    """The previous deskew: minAreaRect over every non-black pixel (benchmark only)"""
+    coords = np.column_stack(np.where(gray > 0))
+    angle = cv2.minAreaRect(coords)[-1]
+    if angle < -45:
+        angle = 90 + angle
+    center = tuple(np.array(gray.shape[1::-1]) / 2)
+    matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+    return cv2.warpAffine(gray, matrix, gray.shape[1::-1], flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+
+
+def _synthetic_document(width, height, angle):
+    """A page of text-like lines rotated by a known angle"""
+    page = np.full((height, width), 235, dtype=np.uint8)
+    rng = np.random.default_rng(0)
+    line_height = max(height // 40, 12)
+    scale = line_height / 30
+    for y in range(line_height * 2, height - line_height, line_height):
+        words = " ".join("".join(rng.choice(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"), 6)) for _ in range(12))
+        cv2.putText(page, words, (width // 20, y), cv2.FONT_HERSHEY_SIMPLEX, scale, 20, max(1, int(scale * 2)))
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), -angle, 1.0)
+    return cv2.warpAffine(page, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE)
+
+
+def _measure(fn, image, repeat):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(image)
+    elapsed = (time.perf_counter() - start) / repeat
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark fast deskew against the legacy minAreaRect deskew")
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--angle", type=float, default=4.0, help="Skew applied to the synthetic page (degrees)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    image = _synthetic_document(args.width, args.height, args.angle)
+    estimated = estimate_skew_angle(image)
+    print(f"Image {args.width}x{args.height}, applied skew {args.angle:.2f}, estimated {estimated:.2f}")
+
+    for name, fn in (("legacy", legacy_deskew), ("fast", deskew)):
+        elapsed, peak = _measure(fn, image, args.repeat)
+        print(f"{name:>7}: {elapsed * 1000:8.1f} ms  peak traced memory {peak / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,266 @@
+import argparse
 import re
+import threading
+import time
 from datetime import datetime
 
+
+def _pattern(regex, confidence, ignore_case=False, value=None, upper=False, date_format=None):
+    """One way of finding a field; value replaces the match text for keyword patterns"""
+    return {
+        "regex": regex,
+        "confidence": confidence,
+        "ignore_case": ignore_case,
+        "value": value,
+        "upper": upper,
+        "date_format": date_format
+    }
+
+
+NIK_PATTERNS = [
+    _pattern(r'\b\d{16}\b', 0.7),  # Basic 16-digit pattern
+    _pattern(r'NIK[:\s]*(\d{16})', 0.95),  # NIK label pattern
+    # Structured NIK pattern
+    _pattern(r'(?:^|\s)(\d{6}(?:0[1-9]|1[0-2])(?:0[1-9]|[12]\d|3[01])\d{6})(?:$|\s)', 0.85)
+]
+
+NAME_PATTERNS = [
+    _pattern(r'Nama[:\s]+([^\n]+)', 0.9, ignore_case=True),
+    _pattern(r'Name[:\s]+([^\n]+)', 0.9, ignore_case=True),
+    _pattern(r'(?<=\n)([A-Z][A-Z\s]+)(?=\n)', 0.4, ignore_case=True)
+]
+
+ADDRESS_PATTERNS = [
+    _pattern(r'Alamat[:\s]+([^\n]+)', 0.9, ignore_case=True),
+    _pattern(r'Address[:\s]+([^\n]+)', 0.9, ignore_case=True),
+    _pattern(r'(?<=\n)(?:Jl\.|Jalan)\s+[^\n]+', 0.6, ignore_case=True)
+]
+
+DATE_PATTERNS = [
+    _pattern(r'(\d{2}-\d{2}-\d{4})', 0.8, date_format="%d-%m-%Y"),
+    _pattern(r'(\d{2}/\d{2}/\d{4})', 0.8, date_format="%d/%m/%Y"),
+    _pattern(r'(\d{4}-\d{2}-\d{2})', 0.8, date_format="%Y-%m-%d")
+]
+
+# Bank statements and utility bills: who, where and when
+STATEMENT_FIELDS = {
+    "name": NAME_PATTERNS,
+    "address": ADDRESS_PATTERNS,
+    "date": DATE_PATTERNS
+}
+
+PASSPORT_DATE = r'([0-9]{1,2}\s+[a-z]{3,}\s+[0-9]{4}|[0-9]{1,2}/[0-9]{1,2}/[0-9]{4})'
+
+# Fields per document type, each with its patterns in priority order: the
+# first pattern that matches anywhere in the text wins. Confidence reflects
+# how specific the pattern is (a labeled value over a bare number).
+DOCUMENT_FIELDS = {
+    "ID Card (KTP)": {
+        "nik": NIK_PATTERNS,
+        "name": NAME_PATTERNS,
+        "birth_info": [_pattern(r'lahir[:\s]+([^\n]+)', 0.8)],
+        "gender": [
+            _pattern(r'laki-laki|pria', 0.8, value="LAKI-LAKI"),
+            _pattern(r'perempuan|wanita', 0.8, value="PEREMPUAN")
+        ],
+        "address": [_pattern(r'alamat[:\s]+([^\n]+)', 0.9)],
+        "rt_rw": [_pattern(r'\b(?:rt|rt/rw)[:\s]+(\d+/\d+)\b', 0.9)]
+    },
+    "Tax ID (NPWP)": {
+        # NPWP number (XX.XXX.XXX.X-XXX.XXX format)
+        "npwp_number": [_pattern(r'\b\d{2}.\d{3}.\d{3}.\d{1}-\d{3}.\d{3}\b', 0.9)],
+        "name": NAME_PATTERNS,
+        "address": [_pattern(r'alamat[:\s]+([^\n]+)', 0.9)]
+    },
+    "Passport": {
+        "passport_number": [_pattern(r'[A-Z]\d{7}', 0.6)],
+        "name": NAME_PATTERNS,
+        "nationality": [_pattern(r'nationality[:\s]+([^\n]+)', 0.8, ignore_case=True)],
+        "date_of_birth": [_pattern(rf'birth[:\s]+{PASSPORT_DATE}', 0.8, ignore_case=True)],
+        "date_of_issue": [_pattern(rf'issue[:\s]+{PASSPORT_DATE}', 0.8, ignore_case=True)],
+        "date_of_expiry": [_pattern(rf'expiry[:\s]+{PASSPORT_DATE}', 0.8, ignore_case=True)]
+    },
+    # Free-text answers of the vision models
+    "vision": {
+        "nik": [_pattern(r'nik[:\s]*(\d{16})', 0.9, ignore_case=True)],
+        "name": [_pattern(r'nama[:\s]*([^\n]+)', 0.9, ignore_case=True, upper=True)]
+    },
+    "Bank Statement": STATEMENT_FIELDS,
+    "Proof of Address": STATEMENT_FIELDS,
+    "generic": {
+        "date": DATE_PATTERNS,
+        "address": ADDRESS_PATTERNS
+    }
+}
+
+
+class CompiledFieldExtractor:
+    """Every field pattern of a document type compiled once, all fields extracted in one call
+
+    Patterns are searched per field in priority order and a field stops at
+    its first hit, so each is one C-level scan over the text. A single
+    pass over the text (SinglePassFieldExtractor) is 2-4x slower with
+    Python's backtracking engine, which tries every alternative at every
+    position and loses the literal-prefix search; run this module to
+    compare them.
+    """
+
+    def __init__(self, fields):
+        self.fields = {
+            field: [
+                (re.compile(pattern["regex"], re.IGNORECASE if pattern["ignore_case"] else 0), pattern)
+                for pattern in patterns
+            ]
+            for field, patterns in fields.items()
+        }
+
+    def _value(self, match, pattern):
+        if pattern["value"] is not None:
+            return pattern["value"]
+        value = (match.group(1) if match.re.groups else match.group(0)).strip()
+        return value.upper() if pattern["upper"] else value
+
+    def candidates(self, text, first_only=False):
+        """{field: [(value, pattern)]}: the first match of each pattern, in priority order"""
+        found = {}
+        if not text:
+            return found
+        for field, patterns in self.fields.items():
+            for regex, pattern in patterns:
+                match = regex.search(text)
+                if match:
+                    found.setdefault(field, []).append((self._value(match, pattern), pattern))
+                    if first_only:
+                        break
+        return found
+
+    def extract_with_confidence(self, text):
+        """Return ({field: value}, {field: confidence}); fields not found are None with confidence 0"""
+        values = {field: None for field in self.fields}
+        confidence = {field: 0.0 for field in self.fields}
+        for field, field_candidates in self.candidates(text, first_only=True).items():
+            values[field], pattern = field_candidates[0]
+            confidence[field] = pattern["confidence"]
+        return values, confidence
+
+    def extract(self, text):
+        """{field: value} for every field of the document type"""
+        return self.extract_with_confidence(text)[0]
+
+
+class SinglePassFieldExtractor(CompiledFieldExtractor):
+    """Same results as CompiledFieldExtractor from one scan of the text (benchmark only)
+
+    Every pattern becomes a lookahead in one alternation, so a single
+    finditer walks the text once and stops when every pattern has been
+    seen. Only the first alternative matching at a position is reported,
+    so at each hit the patterns still missing are tried at that position
+    too. Kept to measure against the per-pattern search, which is faster.
+    """
+
+    def __init__(self, fields):
+        super().__init__(fields)
+        self._order = [(field, regex, pattern) for field, patterns in self.fields.items() for regex, pattern in patterns]
+        self._combined = re.compile("|".join(
+            f"(?=(?{'i' if pattern['ignore_case'] else ''}:{pattern['regex']}))" for _, _, pattern in self._order
+        ))
+
+    def candidates(self, text, first_only=False):
+        found = {}
+        if not text:
+            return found
+        matches = [None] * len(self._order)
+        missing = set(range(len(self._order)))
+        for hit in self._combined.finditer(text):
+            position = hit.start()
+            for index in sorted(missing):
+                match = self._order[index][1].match(text, position)
+                if match:
+                    matches[index] = match
+                    missing.discard(index)
+            if not missing:
+                break
+
+        for (field, _, pattern), match in zip(self._order, matches):
+            if match is None or (first_only and field in found):
+                continue
+            found.setdefault(field, []).append((self._value(match, pattern), pattern))
+        return found
+
+
+_extractors = {}
+_extractors_lock = threading.Lock()
+
+
+def get_field_extractor(doc_type, fields=None):
+    """Compiled extractor for a document type, optionally limited to some of its fields"""
+    key = (doc_type, tuple(fields) if fields else None)
+    extractor = _extractors.get(key)
+    if extractor is None:
+        with _extractors_lock:
+            extractor = _extractors.get(key)
+            if extractor is None:
+                specs = DOCUMENT_FIELDS[doc_type]
+                if fields:
+                    specs = {field: specs[field] for field in fields}
+                extractor = _extractors[key] = CompiledFieldExtractor(specs)
+    return extractor
+
+
 class FieldExtractor:
     @staticmethod
     def extract_date(text):
         """Extract date with multiple format support"""
-        date_patterns = [
-            r'(\d{2}-\d{2}-\d{4})',
-            r'(\d{2}/\d{2}/\d{4})',
-            r'(\d{4}-\d{2}-\d{2})'
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, text)
-            if match:
-                try:
-                    return datetime.strptime(match.group(1), "%d-%m-%Y").date()
-                except ValueError:
-                    continue
+        for value, pattern in get_field_extractor("generic", ("date",)).candidates(text).get("date", []):
+            try:
+                return datetime.strptime(value, pattern["date_format"]).date()
+            except ValueError:
+                continue
         return None
 
     @staticmethod
     def extract_address(text):
         """Extract address with multiple format support"""
-        address_patterns = [
-            r'Alamat[:\s]+([^\n]+)',
-            r'Address[:\s]+([^\n]+)',
-            r'(?<=\n)(?:Jl\.|Jalan)\s+[^\n]+'
-        ]
-        
-        for pattern in address_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
-        return None
+        return get_field_extractor("generic", ("address",)).extract(text)["address"]
 
     # Add more field extractors as needed...
+
+
+def _synthetic_text(doc_type, lines):
+    """OCR-like text with the labeled fields of a document type near the end"""
+    filler = "PROVINSI JAWA BARAT KABUPATEN BEKASI 0123 4567 GOLONGAN DARAH O KEWARGANEGARAAN WNI"
+    labeled = {
+        "ID Card (KTP)": "NIK : 3201012505780001\nNama : BAMBANG SURYANTO\nTempat/Tgl Lahir : BEKASI, 25-05-1978\n"
+                         "Jenis Kelamin : LAKI-LAKI\nAlamat : JL. MERDEKA NO. 10\nRT/RW : 001/002\n",
+        "Passport": "Name: ANNA MARIA\nNationality: INDONESIA\nDate of birth: 12 AUG 1974\n"
+                    "Date of issue: 15 APR 2012\nDate of expiry: 15 APR 2022\nA1234567\n",
+        "Bank Statement": "Nama: ANNA MARIA\nAlamat: JL. SUDIRMAN 1\nTanggal 2024-01-31\n"
+    }.get(doc_type, "")
+    return "\n".join([filler] * lines) + "\n" + labeled
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark per-pattern field extraction against a single-pass scan")
+    parser.add_argument("--lines", type=int, nargs="+", default=[10, 100, 1000], help="Filler lines before the fields")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    for doc_type in ("ID Card (KTP)", "Passport", "Bank Statement"):
+        per_pattern = CompiledFieldExtractor(DOCUMENT_FIELDS[doc_type])
+        single_pass = SinglePassFieldExtractor(DOCUMENT_FIELDS[doc_type])
+        for lines in args.lines:
+            text = _synthetic_text(doc_type, lines)
+            if per_pattern.candidates(text) != single_pass.candidates(text):
+                raise AssertionError(f"Extractors disagree on {doc_type} ({lines} lines)")
+            timings = []
+            for extractor in (per_pattern, single_pass):
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    extractor.extract(text)
+                timings.append((time.perf_counter() - start) / args.repeat)
+            print(f"{doc_type:>15} {len(text):>7} chars: per-pattern {timings[0] * 1e6:9.1f} us  "
+                  f"single-pass {timings[1] * 1e6:9.1f} us  ({timings[1] / timings[0]:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
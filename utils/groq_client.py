@@ -1,10 +1,11 @@
 import os
 from groq import Groq
 from PIL import Image
-import base64
-import io
 import streamlit as st
 from config.config import get_env_variable
+from utils.vision_cache import get_vision_cache
+from utils.vision_client import get_vision_client, PROVIDER_BASE_URLS
+from utils.image_payload import get_image_payload
 
 class GroqVisionClient:
     def __init__(self):
@@ -15,15 +16,11 @@ class GroqVisionClient:
         if not api_key:
             raise Exception("Groq API key not found in environment variables or secrets")
             
-        self.client = Groq(api_key=api_key)
+        # Retries are handled by the shared vision client, not the SDK
+        self.client = Groq(api_key=api_key, base_url=PROVIDER_BASE_URLS["groq"], max_retries=0)
         
     def analyze_document(self, image, customer_data=None, context=None):
         """Analyze document using LLaMA vision model"""
-        # Convert image to base64
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        
         # Prepare the prompt
         system_prompt = """You are an expert document analyzer for KYC verification.
         Analyze the document image and extract relevant information.
@@ -36,7 +33,10 @@ class GroqVisionClient:
         if customer_data:
             user_prompt += f"\nVerify if it matches: {str(customer_data)}"
         
-        try:
+        def complete():
+            # Cropped, downsized JPEG shared with retries and other providers
+            payload = get_image_payload(image)
+            
             response = self.client.chat.completions.create(
                 model="llama-3.2-11b-vision-preview",
                 messages=[
@@ -45,14 +45,19 @@ class GroqVisionClient:
                         "role": "user",
                         "content": [
                             {"type": "text", "text": user_prompt},
-                            {"type": "image", "image": f"data:image/jpeg;base64,{img_str}"}
+                            {"type": "image", "image": payload.data_url}
                         ]
                     }
                 ],
                 temperature=0.1,
                 max_tokens=500
             )
-            
             return response.choices[0].message.content
+        
+        try:
+            return get_vision_cache().cached_call(
+                "llama-3.2-11b-vision-preview", f"{system_prompt}\n{user_prompt}", image, complete,
+                client=get_vision_client("groq")
+            )
         except Exception as e:
             raise Exception(f"Groq API error: {str(e)}")
@@ -1,10 +1,11 @@
 from groq import Groq
 import streamlit as st
-import base64
-import io
 from PIL import Image
 from datetime import datetime
 import os
+from utils.vision_cache import get_vision_cache
+from utils.vision_client import get_vision_client, PROVIDER_BASE_URLS
+from utils.image_payload import get_image_payload
 
 class GroqVisionClient:
     def __init__(self):
@@ -13,7 +14,8 @@ class GroqVisionClient:
             api_key = st.secrets.get("GROQ_API_KEY") or os.getenv("GROQ_API_KEY")
             if not api_key:
                 raise ValueError("No Groq API key found")
-            self.client = Groq(api_key=api_key)
+            # Retries are handled by the shared vision client, not the SDK
+            self.client = Groq(api_key=api_key, base_url=PROVIDER_BASE_URLS["groq"], max_retries=0)
             self.model = "llama-3.2-11b-vision-preview"
             st.success("✓ Groq Vision Client initialized successfully")
         except Exception as e:
@@ -25,36 +27,44 @@ class GroqVisionClient:
         try:
             # Show analysis progress
             with st.spinner("Analyzing document with Groq Vision..."):
-                # Convert and process image
-                buffered = io.BytesIO()
-                image.save(buffered, format="JPEG")
-                img_str = base64.b64encode(buffered.getvalue()).decode()
-                
                 # Get appropriate prompt for document type
                 system_prompt = self._get_document_prompt(doc_type)
+                user_prompt = "Please analyze this document and verify its authenticity."
+                payload_stats = {}
+
+                def complete():
+                    # Cropped, downsized JPEG shared with retries and other providers
+                    payload = get_image_payload(image)
+                    payload_stats.update(payload.stats())
+                    
+                    # Make API call
+                    response = self.client.chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {
+                                "role": "user", 
+                                "content": [
+                                    {"type": "text", "text": user_prompt},
+                                    {"type": "image", "image": payload.data_url}
+                                ]
+                            }
+                        ],
+                        temperature=0.1,
+                        max_tokens=1000
+                    )
+                    return response.choices[0].message.content
                 
-                # Make API call
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {
-                            "role": "user", 
-                            "content": [
-                                {"type": "text", "text": "Please analyze this document and verify its authenticity."},
-                                {"type": "image", "image": f"data:image/jpeg;base64,{img_str}"}
-                            ]
-                        }
-                    ],
-                    temperature=0.1,
-                    max_tokens=1000
+                text = get_vision_cache().cached_call(
+                    self.model, f"{system_prompt}\n{user_prompt}", image, complete, client=get_vision_client("groq")
                 )
                 
                 return {
-                    "text": response.choices[0].message.content,
+                    "text": text,
                     "confidence": 0.95,
                     "model": self.model,
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "payload": payload_stats or None
                 }
 
         except Exception as e:
@@ -84,7 +94,7 @@ def test_groq_connection():
     """Test Groq API connection"""
     try:
         api_key = st.secrets["GROQ_API_KEY"]
-        client = Groq(api_key=api_key)
+        client = Groq(api_key=api_key, base_url=PROVIDER_BASE_URLS["groq"])
         # Simple test request
         response = client.chat.completions.create(
             model="llama-3.2-11b-vision-preview",
@@ -106,7 +116,7 @@ def verify_groq_setup():
             st.error("❌ Groq API key not found")
             return False
             
-        client = Groq(api_key=api_key)
+        client = Groq(api_key=api_key, base_url=PROVIDER_BASE_URLS["groq"])
         response = client.chat.completions.create(
             model="llama-3.2-11b-vision-preview",
             messages=[{"role": "user", "content": "Test connection"}],
@@ -8,6 +8,27 @@ def validate_nik(nik):
         return False
     return True
 
+def validate_nik_structure(nik):
+    """Check the NIK's embedded region codes, birth date and serial number
+
+    Digits 1-6 are province/regency/district codes, 7-12 the birth date as
+    DDMMYY (day + 40 for women) and 13-16 a non-zero serial number.
+    """
+    if not validate_nik(nik):
+        return False
+    province = int(nik[0:2])
+    regency = int(nik[2:4])
+    district = int(nik[4:6])
+    day = int(nik[6:8])
+    month = int(nik[8:10])
+    if day > 40:
+        day -= 40
+    if not 11 <= province <= 94 or regency == 0 or district == 0:
+        return False
+    if not 1 <= day <= 31 or not 1 <= month <= 12:
+        return False
+    return nik[12:] != "0000"
+
 def calculate_risk_score(customer_data):
     """Calculate risk score based on various factors"""
     base_score = 0.2
@@ -0,0 +1,127 @@
+import base64
+import io
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+from PIL import Image
+from utils.ktp_layout import find_card_corners
+from utils.ocr_cache import image_hash
+from utils.image_pipeline import ImagePipeline
+
+# Longest side sent to vision models. Gemini and Llama vision downscale
+# larger inputs anyway, so extra pixels only cost upload time.
+VISION_MAX_SIDE = 1600
+VISION_JPEG_QUALITY = 85
+
+# Margin kept around a detected document, as a fraction of its size
+CROP_MARGIN = 0.03
+
+# Prepared payloads kept for retries and for other providers
+PAYLOAD_CACHE_ENTRIES = 16
+
+
+class ImagePayload:
+    """An image prepared once for vision APIs: cropped, resized, JPEG encoded"""
+
+    def __init__(self, jpeg_bytes, original_size, sent_size, cropped):
+        self.jpeg_bytes = jpeg_bytes
+        self.original_size = original_size
+        self.sent_size = sent_size
+        self.cropped = cropped
+        self._base64 = None
+
+    @property
+    def mime_type(self):
+        return "image/jpeg"
+
+    @property
+    def base64(self):
+        """Base64 text of the JPEG bytes, encoded on first use"""
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.jpeg_bytes).decode("utf-8")
+        return self._base64
+
+    @property
+    def data_url(self):
+        return f"data:{self.mime_type};base64,{self.base64}"
+
+    def stats(self):
+        """Payload size report"""
+        width, height = self.original_size
+        return {
+            "original_size": f"{width}x{height}",
+            "sent_size": f"{self.sent_size[0]}x{self.sent_size[1]}",
+            "cropped": self.cropped,
+            "raw_bytes": width * height * 3,
+            "jpeg_bytes": len(self.jpeg_bytes),
+            "base64_bytes": (len(self.jpeg_bytes) + 2) // 3 * 4
+        }
+
+
+def _crop_to_document(image, gray=None):
+    """Crop to the detected document outline, or return the image unchanged"""
+    if gray is None:
+        gray = np.array(image.convert("L"))
+    corners = find_card_corners(gray)
+    if corners is None:
+        return image, False
+
+    x0, y0 = corners.min(axis=0)
+    x1, y1 = corners.max(axis=0)
+    margin_x = (x1 - x0) * CROP_MARGIN
+    margin_y = (y1 - y0) * CROP_MARGIN
+    box = (
+        max(0, int(x0 - margin_x)),
+        max(0, int(y0 - margin_y)),
+        min(image.width, int(x1 + margin_x)),
+        min(image.height, int(y1 + margin_y))
+    )
+    return image.crop(box), True
+
+
+def prepare_image_payload(image, max_side=VISION_MAX_SIDE, quality=VISION_JPEG_QUALITY, crop=True):
+    """Crop, downsize and JPEG encode an image (PIL or ImagePipeline) for a vision model request"""
+    gray = None
+    if isinstance(image, ImagePipeline):
+        # Reuse the pipeline's buffers instead of converting the upload again
+        gray = image.gray
+        image = image.pil
+    original_size = image.size
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    cropped = False
+    if crop:
+        image, cropped = _crop_to_document(image, gray)
+
+    scale = max_side / max(image.size)
+    if scale < 1:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        # OpenCV's area interpolation is much faster than PIL's LANCZOS on large photos
+        image = Image.fromarray(cv2.resize(np.asarray(image), size, interpolation=cv2.INTER_AREA))
+
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=quality, optimize=True)
+    return ImagePayload(buffered.getvalue(), original_size, image.size, cropped)
+
+
+_payloads = OrderedDict()
+_payloads_lock = threading.Lock()
+
+
+def get_image_payload(image, max_side=VISION_MAX_SIDE, quality=VISION_JPEG_QUALITY):
+    """Prepared payload for an image, reused across retries and providers"""
+    key = (image_hash(image), max_side, quality)
+    with _payloads_lock:
+        payload = _payloads.get(key)
+        if payload is not None:
+            _payloads.move_to_end(key)
+            return payload
+
+    payload = prepare_image_payload(image, max_side, quality)
+    with _payloads_lock:
+        _payloads[key] = payload
+        while len(_payloads) > PAYLOAD_CACHE_ENTRIES:
+            _payloads.popitem(last=False)
+    return payload
@@ -0,0 +1,106 @@
+import threading
+import cv2
+import numpy as np
+from PIL import Image
+
+_scratch = threading.local()
+
+
+def scratch_buffer(name, shape, dtype=np.uint8):
+    """Per-thread reusable output buffer for OpenCV dst= arguments
+
+    The same memory is handed out again the next time this thread asks for
+    `name`, so a buffer is only valid until then; callers use them for
+    intermediate images consumed within the same stage. Buffers grow to the
+    largest image seen and are reused across documents by worker threads.
+    """
+    buffers = getattr(_scratch, "buffers", None)
+    if buffers is None:
+        buffers = _scratch.buffers = {}
+    dtype = np.dtype(dtype)
+    size = int(np.prod(shape))
+    flat = buffers.get((name, dtype.str))
+    if flat is None or flat.size < size:
+        flat = buffers[(name, dtype.str)] = np.empty(size, dtype=dtype)
+    return flat[:size].reshape(shape)
+
+
+class ImagePipeline:
+    """A document image decoded once and shared by every verification stage
+
+    Holds one canonical RGB buffer; the PIL image is a zero-copy view of it
+    and the grayscale buffer and content hash are computed on first use.
+    Stages receive the pipeline (or views of its buffers) instead of
+    converting the upload again.
+    """
+
+    def __init__(self, rgb):
+        self.rgb = rgb
+        self._gray = None
+        self._pil = None
+        self._content_hash = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, source):
+        """Decode an uploaded file, path or PIL image"""
+        image = source if isinstance(source, Image.Image) else Image.open(source)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return cls(np.asarray(image))
+
+    @classmethod
+    def from_array(cls, array):
+        """Wrap an RGB or grayscale array without copying it; RGBA drops alpha into a new buffer"""
+        array = np.ascontiguousarray(array)
+        if array.ndim == 2:
+            pipeline = cls(None)
+            pipeline._gray = array
+            return pipeline
+        if array.shape[2] > 3:
+            # The channel slice is a strided view; PIL and OpenCV need contiguous memory
+            array = np.ascontiguousarray(array[..., :3])
+        return cls(array)
+
+    @classmethod
+    def wrap(cls, image):
+        """Return image itself if it already is a pipeline, otherwise a pipeline over it"""
+        if isinstance(image, cls):
+            return image
+        if isinstance(image, Image.Image):
+            return cls.open(image)
+        return cls.from_array(np.asarray(image))
+
+    @property
+    def size(self):
+        height, width = (self.rgb if self.rgb is not None else self._gray).shape[:2]
+        return width, height
+
+    @property
+    def gray(self):
+        """Single-channel buffer, converted once"""
+        if self._gray is None:
+            with self._lock:
+                if self._gray is None:
+                    self._gray = cv2.cvtColor(self.rgb, cv2.COLOR_RGB2GRAY)
+        return self._gray
+
+    @property
+    def pil(self):
+        """PIL view of the RGB buffer (no copy)"""
+        if self._pil is None:
+            with self._lock:
+                if self._pil is None:
+                    if self.rgb is None:
+                        self._pil = Image.frombuffer("L", self.size, self._gray, "raw", "L", 0, 1)
+                    else:
+                        self._pil = Image.frombuffer("RGB", self.size, self.rgb, "raw", "RGB", 0, 1)
+        return self._pil
+
+    @property
+    def content_hash(self):
+        """Content hash shared by the OCR, vision and payload caches"""
+        if self._content_hash is None:
+            from utils.ocr_cache import image_hash
+            self._content_hash = image_hash(self.rgb if self.rgb is not None else self._gray)
+        return self._content_hash
@@ -0,0 +1,149 @@
+import cv2
+import numpy as np
+from utils.ocr_backend import get_ocr_backend
+from utils.image_pipeline import scratch_buffer
+
+# ID-1 card (85.60 x 53.98 mm) at roughly 300 DPI
+CARD_WIDTH = 1012
+CARD_HEIGHT = 638
+CARD_ASPECT = CARD_WIDTH / CARD_HEIGHT
+
+# Field value regions on a normalized KTP as (x0, y0, x1, y1) fractions of
+# the card. Labels sit left of x=0.25 and the photo right of x=0.72, so
+# the boxes cover only the printed values.
+KTP_FIELDS = {
+    "nik": {
+        "box": (0.20, 0.15, 0.76, 0.27),
+        "config": "--oem 3 --psm 7 -c tessedit_char_whitelist=0123456789",
+        "label": "nik"
+    },
+    "name": {
+        "box": (0.25, 0.27, 0.72, 0.335),
+        "config": "--oem 3 --psm 7 -l ind",
+        "label": "nama"
+    },
+    "birth_info": {
+        "box": (0.25, 0.335, 0.72, 0.395),
+        "config": "--oem 3 --psm 7 -l ind",
+        "label": "lahir"
+    },
+    "address": {
+        "box": (0.25, 0.445, 0.72, 0.505),
+        "config": "--oem 3 --psm 7 -l ind",
+        "label": "alamat"
+    },
+    "rt_rw": {
+        "box": (0.25, 0.505, 0.50, 0.56),
+        "config": "--oem 3 --psm 7 -c tessedit_char_whitelist=0123456789/",
+        "label": "rt/rw"
+    }
+}
+
+
+def _order_corners(points):
+    """Order four corner points as top-left, top-right, bottom-right, bottom-left"""
+    points = points.reshape(4, 2).astype(np.float32)
+    sums = points.sum(axis=1)
+    diffs = np.diff(points, axis=1).ravel()
+    return np.array([
+        points[np.argmin(sums)],
+        points[np.argmin(diffs)],
+        points[np.argmax(sums)],
+        points[np.argmax(diffs)]
+    ], dtype=np.float32)
+
+
+def find_card_corners(gray):
+    """Locate the card outline as four corners, or None if not found"""
+    height, width = gray.shape[:2]
+    scale = 800 / max(height, width) if max(height, width) > 800 else 1.0
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+
+    edges = cv2.Canny(cv2.GaussianBlur(small, (5, 5), 0), 50, 150)
+    edges = cv2.dilate(edges, np.ones((3, 3), np.uint8))
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    min_area = 0.2 * small.shape[0] * small.shape[1]
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:5]:
+        if cv2.contourArea(contour) < min_area:
+            break
+        approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+        if len(approx) == 4:
+            corners = _order_corners(approx) / scale
+            top = np.linalg.norm(corners[1] - corners[0])
+            side = np.linalg.norm(corners[3] - corners[0])
+            if side and 1.3 <= top / side <= 1.9:
+                return corners
+    return None
+
+
+def normalize_card(gray):
+    """Warp the card to the canonical size, falling back to a plain resize"""
+    corners = find_card_corners(gray)
+    card = scratch_buffer("ktp_card", (CARD_HEIGHT, CARD_WIDTH))
+    if corners is None:
+        return cv2.resize(gray, (CARD_WIDTH, CARD_HEIGHT), dst=card, interpolation=cv2.INTER_AREA)
+
+    target = np.array(
+        [[0, 0], [CARD_WIDTH - 1, 0], [CARD_WIDTH - 1, CARD_HEIGHT - 1], [0, CARD_HEIGHT - 1]],
+        dtype=np.float32
+    )
+    matrix = cv2.getPerspectiveTransform(corners, target)
+    return cv2.warpPerspective(gray, matrix, (CARD_WIDTH, CARD_HEIGHT), dst=card, flags=cv2.INTER_LINEAR)
+
+
+def crop_field(card, field):
+    """Crop and binarize one field region of a normalized card"""
+    x0, y0, x1, y1 = KTP_FIELDS[field]["box"]
+    crop = card[int(y0 * CARD_HEIGHT):int(y1 * CARD_HEIGHT), int(x0 * CARD_WIDTH):int(x1 * CARD_WIDTH)]
+    _, binary = cv2.threshold(
+        crop, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=scratch_buffer(f"ktp_{field}", crop.shape)
+    )
+    return binary
+
+
+def ocr_field(card, field, backend=None):
+    """OCR a single field crop with its field-specific configuration"""
+    backend = backend or get_ocr_backend()
+    data = backend.image_to_data(crop_field(card, field), config=KTP_FIELDS[field]["config"])
+    words = [word for word in data["text"] if word.strip()]
+    confidences = [float(conf) for conf in data["conf"] if float(conf) >= 0]
+    return {
+        "text": " ".join(words).strip(" :"),
+        "confidence": sum(confidences) / len(confidences) if confidences else 0
+    }
+
+
+def extract_ktp_fields(gray, executor=None, backend=None):
+    """OCR every KTP field region, concurrently when an executor is given
+
+    Returns {field: {"text", "confidence"}}; fields whose OCR failed are
+    returned with empty text.
+    """
+    card = normalize_card(gray)
+    if executor is None:
+        results = {}
+        for field in KTP_FIELDS:
+            try:
+                results[field] = ocr_field(card, field, backend)
+            except Exception:
+                results[field] = {"text": "", "confidence": 0}
+        return results
+
+    futures = {field: executor.submit(ocr_field, card, field, backend) for field in KTP_FIELDS}
+    results = {}
+    for field, future in futures.items():
+        try:
+            results[field] = future.result()
+        except Exception:
+            results[field] = {"text": "", "confidence": 0}
+    return results
+
+
+def to_labeled_text(fields):
+    """Render field results as "label: value" lines for the KTP text parser"""
+    return "\n".join(
+        f"{KTP_FIELDS[field]['label']}: {result['text']}"
+        for field, result in fields.items()
+        if result["text"]
+    )
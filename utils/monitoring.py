@@ -0,0 +1,205 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from utils.transaction_store import to_epoch_day
+from utils.counterparty_graph import CounterpartyGraph, FAN_IN_ALERT_THRESHOLD
+from utils.online_stats import OnlineStatsStore
+
+# Id prefix of alerts written by the background monitoring worker
+MONITORING_ALERT_PREFIX = "MON"
+
+
+class MonitoringRule:
+    """Base class for streaming transaction monitoring rules
+
+    Rules see transactions one at a time and keep whatever per-customer
+    state they need, so the same rule objects serve the live app and
+    historical backtests. Backtests replay in date order, but the live
+    app does not guarantee it (backdated entries, worker retries), so
+    rules must not assume it.
+    """
+    name = "rule"
+    alert_type = "Suspicious Pattern"
+    severity = "High"
+    assigned_to = "Risk Team"
+
+    def evaluate(self, transaction, context):
+        """Return a list of alert descriptions raised by this transaction"""
+        raise NotImplementedError
+
+    def reset(self):
+        """Drop all accumulated state"""
+
+    def _alert(self, transaction, description):
+        return {
+            "customer_id": transaction["customer_id"],
+            "date": transaction["date"],
+            "type": self.alert_type,
+            "description": description,
+            "severity": self.severity,
+            "assigned_to": self.assigned_to
+        }
+
+
+class StructuringRule(MonitoringRule):
+    """Multiple cash deposits by one customer within a short window
+
+    Deposit days are kept sorted, so a backdated deposit is counted in the
+    windows it falls into. Deposits are kept for max_backdate_days beyond
+    the window; one dated before that is not evaluated.
+    """
+    name = "structuring"
+
+    def __init__(self, min_deposits=3, window_days=7, max_backdate_days=90):
+        self.min_deposits = min_deposits
+        self.window_days = window_days
+        self.max_backdate_days = max_backdate_days
+        self.reset()
+
+    def reset(self):
+        self._deposits = defaultdict(list)  # customer_id -> sorted epoch days of cash deposits
+
+    def evaluate(self, transaction, context):
+        if transaction["type"] != "Cash Deposit":
+            return []
+
+        day = context["day"]
+        deposits = self._deposits[transaction["customer_id"]]
+        horizon = max(day, deposits[-1] if deposits else day) - self.window_days - self.max_backdate_days
+        if day <= horizon:
+            return []
+        insort(deposits, day)
+        del deposits[:bisect_right(deposits, horizon)]
+
+        # Windows of window_days ending on a deposit day from this one up to
+        # window_days later; in date order that is only the window ending today
+        ends = deposits[bisect_left(deposits, day):bisect_right(deposits, day + self.window_days - 1)]
+        if any(
+            bisect_right(deposits, end) - bisect_right(deposits, end - self.window_days) >= self.min_deposits
+            for end in set(ends)
+        ):
+            return [self._alert(
+                transaction,
+                "Multiple cash deposits detected within short period. Possible structuring."
+            )]
+        return []
+
+
+class FanInRule(MonitoringRule):
+    """Destination receiving funds from many distinct customers"""
+    name = "fan_in"
+
+    def __init__(self, threshold=FAN_IN_ALERT_THRESHOLD):
+        self.threshold = threshold
+
+    def evaluate(self, transaction, context):
+        counterparty_id = context.get("counterparty_id")
+        if counterparty_id is None or not context.get("new_edge"):
+            return []
+
+        graph = context["graph"]
+        fan_in = graph.fan_in_count(counterparty_id)
+        if fan_in == self.threshold:
+            return [self._alert(
+                transaction,
+                f"Destination '{graph.display_names.get(counterparty_id)}' receives funds from "
+                f"{fan_in} distinct customers. Possible money mule account."
+            )]
+        return []
+
+
+class UnusualAmountRule(MonitoringRule):
+    """Amount far outside the customer's own history for this transaction type"""
+    name = "unusual_amount"
+    alert_type = "Unusual Transaction"
+    severity = "Medium"
+
+    def __init__(self, z_threshold=3.0, quantile_threshold=0.995, min_history=5, stats=None):
+        self.z_threshold = z_threshold
+        self.quantile_threshold = quantile_threshold
+        self.min_history = min_history
+        self.stats = stats if stats is not None else OnlineStatsStore()
+
+    def reset(self):
+        if not self.stats.persist:
+            self.stats = OnlineStatsStore()
+
+    def evaluate(self, transaction, context):
+        # Persisted statistics already include replayed transactions
+        if context.get("warm_up") and self.stats.persist:
+            return []
+
+        score = self.stats.score(transaction)
+        self.stats.update(transaction)
+
+        if score["count"] < self.min_history:
+            return []
+        # A tail quantile is only meaningful once the history can resolve it
+        quantile_ready = score["count"] * (1 - self.quantile_threshold) >= 1
+        if score["zscore"] >= self.z_threshold or (quantile_ready and score["quantile"] >= self.quantile_threshold):
+            return [self._alert(
+                transaction,
+                f"{transaction['type']} of Rp {float(transaction['amount']):,.0f} is unusual for this customer "
+                f"(z-score {score['zscore']:.1f}, above {score['quantile']:.1%} of {score['count']} past "
+                f"transactions, recent average Rp {score['ewma']:,.0f})"
+            )]
+        return []
+
+
+RULES = {
+    StructuringRule.name: StructuringRule,
+    FanInRule.name: FanInRule,
+    UnusualAmountRule.name: UnusualAmountRule
+}
+
+
+def build_rules(names=None, params=None):
+    """Instantiate rules by name with optional per-rule keyword overrides"""
+    params = params or {}
+    return [RULES[name](**params.get(name, {})) for name in (names or RULES)]
+
+
+class MonitoringEngine:
+    """Streaming monitoring engine shared by the app and backtests
+
+    Each processed transaction is added to the counterparty graph and then
+    passed to every rule; the engine returns (rule name, alert) pairs.
+    """
+
+    def __init__(self, rules=None, graph=None, persist_graph=False):
+        self.rules = rules if rules is not None else build_rules()
+        self.graph = graph if graph is not None else CounterpartyGraph()
+        self.persist_graph = persist_graph
+        self.processed = 0
+
+    def process(self, transaction, emit=True, ingest=True):
+        """Run one transaction through the graph index and all rules"""
+        context = {"day": to_epoch_day(transaction["date"]), "graph": self.graph, "warm_up": not emit}
+
+        if ingest:
+            known = self.graph.lookup(transaction.get("destination"))
+            is_new = known is None or known not in self.graph.customer_edges.get(transaction["customer_id"], ())
+            context["counterparty_id"] = self.graph.ingest(transaction, persist=self.persist_graph)
+            context["new_edge"] = is_new
+
+        self.processed += 1
+        alerts = []
+        for rule in self.rules:
+            raised = rule.evaluate(transaction, context)
+            if emit:
+                alerts.extend((rule.name, alert) for alert in raised)
+        return alerts
+
+    def warm_up(self, transactions):
+        """Replay existing transactions to build rule state without alerting"""
+        for transaction in sorted_transactions(transactions):
+            self.process(transaction, emit=False, ingest=False)
+
+    def reset(self):
+        for rule in self.rules:
+            rule.reset()
+        self.processed = 0
+
+
+def sorted_transactions(transactions):
+    """Order transactions by date, then id, as the engine expects"""
+    return sorted(transactions, key=lambda t: (to_epoch_day(t["date"]), str(t["id"])))
@@ -0,0 +1,166 @@
+import json
+import signal
+import time
+from datetime import datetime, timedelta
+from utils.database import (
+    get_db,
+    get_transactions,
+    get_customer,
+    update_customer,
+    save_alert,
+    claim_monitoring_events,
+    complete_monitoring_event,
+    update_monitoring_event_payload,
+    requeue_stale_monitoring_events
+)
+from utils.helpers import calculate_risk_score, get_risk_category
+from utils.monitoring import MonitoringEngine, build_rules, MONITORING_ALERT_PREFIX
+from utils.counterparty_graph import get_counterparty_graph
+from utils.online_stats import get_online_stats_store
+
+
+class MonitoringWorker:
+    """Consumes the monitoring_queue table, runs rules and scoring, writes alerts
+
+    Runs outside Streamlit: the app only enqueues transactions and customer
+    changes and reads the alerts this worker saves.
+    """
+
+    def __init__(self, batch_size=100, max_attempts=3, warm_up_days=30, stale_after_minutes=10):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.warm_up_days = warm_up_days
+        self.stale_after_minutes = stale_after_minutes
+        self.running = False
+        self.engine = None
+        self.handlers = {
+            "transaction": self._handle_transaction,
+            "transaction_flag": self._handle_transaction_flag,
+            "customer": self._handle_customer
+        }
+
+    def start(self):
+        """Recover interrupted work and build the rule engine"""
+        cutoff = datetime.now() - timedelta(minutes=self.stale_after_minutes)
+        requeued = requeue_stale_monitoring_events(cutoff.strftime("%Y-%m-%d %H:%M:%S"))
+        if requeued:
+            print(f"Requeued {requeued} stale monitoring events")
+
+        rules = build_rules(params={"unusual_amount": {"stats": get_online_stats_store()}})
+        self.engine = MonitoringEngine(rules=rules, graph=get_counterparty_graph(), persist_graph=True)
+
+        # Rebuild windowed rule state from history that has already been monitored
+        since = (datetime.now() - timedelta(days=self.warm_up_days)).strftime("%Y-%m-%d")
+        pending = self._pending_transaction_ids()
+        history = [t for t in get_transactions(start_date=since) if t["id"] not in pending]
+        self.engine.warm_up(history)
+        print(f"Monitoring worker ready ({len(history)} transactions replayed)")
+
+    def _pending_transaction_ids(self):
+        """Ids of queued transactions the rules have not seen yet"""
+        conn = get_db()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT payload FROM monitoring_queue WHERE kind = 'transaction' AND status IN ('pending', 'processing')"
+            )
+            payloads = [json.loads(row[0]) for row in cursor.fetchall()]
+            # Events waiting only to retry their alert writes were already evaluated
+            return {payload["id"] for payload in payloads if "_alerts" not in payload}
+        finally:
+            conn.close()
+
+    def run_once(self):
+        """Process one batch of queued events and return how many were claimed"""
+        events = claim_monitoring_events(self.batch_size)
+        for event in events:
+            try:
+                self.handlers[event["kind"]](event)
+                complete_monitoring_event(event["id"])
+            except Exception as e:
+                retry = event["attempts"] < self.max_attempts
+                print(f"Monitoring event {event['id']} ({event['kind']}) failed: {str(e)}")
+                complete_monitoring_event(event["id"], error=str(e), retry=retry)
+        return len(events)
+
+    def run_forever(self, poll_interval=1.0):
+        """Poll the queue until stopped by SIGINT/SIGTERM"""
+        self.start()
+        self.running = True
+
+        def _stop(signum, frame):
+            self.running = False
+
+        signal.signal(signal.SIGINT, _stop)
+        signal.signal(signal.SIGTERM, _stop)
+
+        while self.running:
+            if self.run_once() == 0:
+                time.sleep(poll_interval)
+        print("Monitoring worker stopped")
+
+    # ------------------------------------------------------------------
+    # Handlers
+    # ------------------------------------------------------------------
+    def _save_alert(self, event, index, alert):
+        """Save an alert with an id derived from the event, so retries are idempotent"""
+        alert_id = f"{MONITORING_ALERT_PREFIX}{event['id']:06d}"
+        if index:
+            alert_id += f"-{index}"
+        saved = save_alert({
+            "id": alert_id,
+            **alert,
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "status": "Open"
+        })
+        if not saved:
+            raise RuntimeError(f"Could not save alert {alert_id}")
+
+    def _handle_transaction(self, event):
+        """Run monitoring rules on a newly saved transaction
+
+        The rules see each transaction once: their alerts are stored on the
+        queued event before being written, so a retry only repeats the
+        alert writes and never counts the transaction twice in the graph
+        or amount statistics.
+        """
+        payload = event["payload"]
+        alerts = payload.get("_alerts")
+        if alerts is None:
+            alerts = [alert for _, alert in self.engine.process(payload)]
+            update_monitoring_event_payload(event["id"], {**payload, "_alerts": alerts})
+        for index, alert in enumerate(alerts):
+            self._save_alert(event, index, alert)
+
+    def _handle_transaction_flag(self, event):
+        """Raise an alert for a transaction an analyst flagged as suspicious"""
+        transaction = event["payload"]
+        self._save_alert(event, 0, {
+            "customer_id": transaction["customer_id"],
+            "type": "Suspicious Transaction",
+            "description": f"Suspicious transaction flagged: {transaction['type']} of Rp {float(transaction['amount']):,.0f}",
+            "severity": "High",
+            "assigned_to": "Risk Team"
+        })
+        update_customer(transaction["customer_id"], {"suspicious_activity": True})
+
+    def _handle_customer(self, event):
+        """Re-score a changed customer and raise an alert on escalation to High risk"""
+        payload = event["payload"]
+        customer = get_customer(payload["customer_id"])
+        if customer is None:
+            return
+
+        risk_score = calculate_risk_score(customer)
+        risk_category = get_risk_category(risk_score)
+        if risk_score != customer["risk_score"] or risk_category != customer["risk_category"]:
+            update_customer(customer["id"], {"risk_score": risk_score, "risk_category": risk_category})
+
+        if risk_category == "High" and payload.get("previous_risk_category") != "High":
+            self._save_alert(event, 0, {
+                "customer_id": customer["id"],
+                "type": "Risk Escalation",
+                "description": f"Customer risk escalated from {payload.get('previous_risk_category')} to High (score {risk_score})",
+                "severity": "High",
+                "assigned_to": "Compliance Team"
+            })
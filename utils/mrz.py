@@ -0,0 +1,194 @@
+from datetime import date
+import cv2
+import numpy as np
+from utils.ocr_backend import get_ocr_backend
+from utils.image_pipeline import scratch_buffer
+
+# Passport booklets use the TD3 format: two lines of 44 characters
+MRZ_LINE_LENGTH = 44
+MRZ_CHARACTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789<"
+MRZ_CONFIG = f"--oem 3 --psm 6 -c tessedit_char_whitelist={MRZ_CHARACTERS}"
+
+# The MRZ is searched for in the bottom part of the page only
+MRZ_SEARCH_FRACTION = 0.45
+MRZ_DETECT_WIDTH = 600
+
+# Width the MRZ strip is scaled to before OCR (about 27 px per character)
+MRZ_OCR_WIDTH = 1200
+
+# Common OCR confusions, corrected by the kind of field they appear in
+_TO_DIGIT = str.maketrans("OQDIULZSBG", "0001112586")
+_TO_LETTER = str.maketrans("0125869", "OIZSBGG")
+
+
+def mrz_check_digit(value):
+    """ICAO 9303 check digit: weights 7, 3, 1 over digits, A=10..Z=35 and < = 0"""
+    total = 0
+    for index, char in enumerate(value):
+        if char.isdigit():
+            number = int(char)
+        elif char.isalpha():
+            number = ord(char) - ord("A") + 10
+        else:
+            number = 0
+        total += number * (7, 3, 1)[index % 3]
+    return str(total % 10)
+
+
+def find_mrz_region(gray):
+    """(x0, y0, x1, y1) of the MRZ lines near the bottom of the page, or None
+
+    Dark text on a light background is emphasized with a blackhat filter,
+    characters are merged into line blobs with a wide closing, and the
+    widest blobs in the lower part of the page are taken as the MRZ.
+    """
+    height, width = gray.shape[:2]
+    top = int(height * (1 - MRZ_SEARCH_FRACTION))
+    scale = min(1.0, MRZ_DETECT_WIDTH / width)
+    region = gray[top:]
+    small = cv2.resize(region, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else region
+
+    blackhat = cv2.morphologyEx(small, cv2.MORPH_BLACKHAT, cv2.getStructuringElement(cv2.MORPH_RECT, (13, 5)))
+    _, binary = cv2.threshold(blackhat, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (21, 3)))
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    small_width = small.shape[1]
+    lines = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w >= 0.4 * small_width and w / max(h, 1) >= 10:
+            lines.append((x, y, w, h))
+    if not lines:
+        return None
+
+    # The two bottom-most lines
+    lines = sorted(lines, key=lambda box: box[1])[-2:]
+    x0 = min(box[0] for box in lines)
+    y0 = min(box[1] for box in lines)
+    x1 = max(box[0] + box[2] for box in lines)
+    y1 = max(box[1] + box[3] for box in lines)
+    pad = max(y1 - y0, 1) * 0.25
+
+    def full(value):
+        return int(value / scale)
+
+    return (
+        max(0, full(x0 - pad)),
+        max(0, top + full(y0 - pad)),
+        min(width, full(x1 + pad)),
+        min(height, top + full(y1 + pad))
+    )
+
+
+def _mrz_lines(data):
+    """Join tesseract words into candidate MRZ lines with their mean confidence"""
+    lines = {}
+    for index, text in enumerate(data["text"]):
+        text = text.strip().upper().replace(" ", "")
+        if not text:
+            continue
+        key = (data["block_num"][index], data["line_num"][index])
+        line = lines.setdefault(key, {"text": "", "conf": []})
+        line["text"] += text
+        if float(data["conf"][index]) >= 0:
+            line["conf"].append(float(data["conf"][index]))
+    return [line for line in lines.values() if len(line["text"]) >= MRZ_LINE_LENGTH - 8 and "<" in line["text"]]
+
+
+def _fit(line):
+    return line[:MRZ_LINE_LENGTH].ljust(MRZ_LINE_LENGTH, "<")
+
+
+def _mrz_date(value, future):
+    """YYMMDD to ISO; future picks the century for expiry dates, otherwise birth dates are in the past"""
+    try:
+        year, month, day = int(value[0:2]), int(value[2:4]), int(value[4:6])
+        today = date.today()
+        century = 2000 if future or year <= today.year % 100 else 1900
+        return date(century + year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def parse_td3(line1, line2):
+    """Parse and check a two-line passport MRZ; "valid" is True when every check digit matches"""
+    line1, line2 = _fit(line1), _fit(line2)
+
+    # Correct confusions per field: letters in codes and names, digits in dates and check digits
+    line1 = line1[:2] + line1[2:5].translate(_TO_LETTER) + line1[5:].translate(_TO_LETTER)
+    line2 = (
+        line2[:9] + line2[9].translate(_TO_DIGIT) + line2[10:13].translate(_TO_LETTER)
+        + line2[13:20].translate(_TO_DIGIT) + line2[20].translate(_TO_LETTER)
+        + line2[21:28].translate(_TO_DIGIT) + line2[28:42] + line2[42:44].translate(_TO_DIGIT)
+    )
+
+    surname, _, given = line1[5:].partition("<<")
+    surname = surname.replace("<", " ").strip()
+    given_names = given.replace("<", " ").strip()
+
+    personal_number = line2[28:42]
+    checks = {
+        "passport_number": mrz_check_digit(line2[0:9]) == line2[9],
+        "date_of_birth": mrz_check_digit(line2[13:19]) == line2[19],
+        "date_of_expiry": mrz_check_digit(line2[21:27]) == line2[27],
+        # An empty personal number may carry "<" instead of a check digit
+        "personal_number": mrz_check_digit(personal_number) == line2[42] or (
+            personal_number.strip("<") == "" and line2[42] == "<"
+        ),
+        "composite": mrz_check_digit(line2[0:10] + line2[13:20] + line2[21:43]) == line2[43]
+    }
+
+    return {
+        "document_code": line1[0:2].replace("<", ""),
+        "issuing_country": line1[2:5].replace("<", ""),
+        "surname": surname,
+        "given_names": given_names,
+        "name": f"{given_names} {surname}".strip(),
+        "passport_number": line2[0:9].replace("<", ""),
+        "nationality": line2[10:13].replace("<", ""),
+        "date_of_birth": _mrz_date(line2[13:19], future=False),
+        "sex": line2[20].replace("<", "") or None,
+        "date_of_expiry": _mrz_date(line2[21:27], future=True),
+        "personal_number": personal_number.replace("<", ""),
+        "checks": checks,
+        "valid": line1[0] == "P" and all(checks.values()),
+        "lines": [line1, line2]
+    }
+
+
+def read_mrz(gray, backend=None):
+    """Locate, OCR and parse a passport MRZ; returns the parse_td3 result with confidence, or None"""
+    backend = backend or get_ocr_backend()
+    height, width = gray.shape[:2]
+    box = find_mrz_region(gray)
+    if box is None:
+        # Fall back to the bottom strip where the MRZ normally is
+        box = (0, int(height * 0.75), width, height)
+    x0, y0, x1, y1 = box
+    strip = gray[y0:y1, x0:x1]
+
+    scale = MRZ_OCR_WIDTH / strip.shape[1]
+    size = (MRZ_OCR_WIDTH, max(1, round(strip.shape[0] * scale)))
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    resized = cv2.resize(strip, size, dst=scratch_buffer("mrz_strip", size[::-1]), interpolation=interpolation)
+    _, binary = cv2.threshold(
+        resized, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=scratch_buffer("mrz_binary", resized.shape)
+    )
+
+    # Binarized strip first; the plain grayscale strip if its check digits fail
+    result = None
+    for image in (binary, resized):
+        lines = _mrz_lines(backend.image_to_data(image, config=MRZ_CONFIG))
+        if len(lines) < 2:
+            continue
+        line1, line2 = lines[-2:]
+        candidate = parse_td3(line1["text"], line2["text"])
+        confidences = line1["conf"] + line2["conf"]
+        candidate["confidence"] = float(np.mean(confidences)) if confidences else 0.0
+        candidate["region"] = [int(value) for value in box]
+        if result is None or candidate["valid"]:
+            result = candidate
+        if result["valid"]:
+            break
+    return result
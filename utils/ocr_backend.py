@@ -0,0 +1,184 @@
+import os
+import queue
+import shlex
+import threading
+import numpy as np
+import pytesseract
+from PIL import Image
+
+try:
+    import tesserocr
+except ImportError:  # optional, pytesseract is used instead
+    tesserocr = None
+
+# Engine to use: "auto" prefers the in-process engine when tesserocr is installed
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto")
+
+# Initialized tesseract engines kept per configuration
+ENGINE_POOL_SIZE = int(os.getenv("OCR_ENGINE_POOL_SIZE", "4"))
+
+
+def parse_tesseract_config(config):
+    """Split a pytesseract config string into (lang, oem, psm, variables)"""
+    lang, oem, psm, variables = "eng", None, None, {}
+    args = shlex.split(config or "")
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        value = args[i + 1] if i + 1 < len(args) else None
+        if arg == "-l":
+            lang = value
+        elif arg == "--oem":
+            oem = int(value)
+        elif arg == "--psm":
+            psm = int(value)
+        elif arg == "--dpi":
+            variables["user_defined_dpi"] = value
+        elif arg == "-c" and value and "=" in value:
+            key, _, val = value.partition("=")
+            variables[key] = val
+        else:
+            i += 1
+            continue
+        i += 2
+    return lang, oem, psm, variables
+
+
+class PytesseractBackend:
+    """Runs the tesseract binary once per call (loads the language models every time)"""
+
+    name = "pytesseract"
+
+    def image_to_data(self, image, config=""):
+        return pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+
+    def image_to_string(self, image, config=""):
+        return pytesseract.image_to_string(image, config=config)
+
+
+class TesserocrBackend:
+    """In-process tesseract through tesserocr with a pool of initialized engines
+
+    Loading the ind+eng models is the expensive part of a tesseract run, so
+    each engine is initialized once per configuration and reused. Engines
+    are not thread-safe; each call borrows one from the pool.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, pool_size=ENGINE_POOL_SIZE, tessdata_path=None):
+        self.pool_size = pool_size
+        self.tessdata_path = tessdata_path or os.getenv("TESSDATA_PREFIX")
+        self._pools = {}
+        self._created = {}
+        self._lock = threading.Lock()
+
+    def _new_engine(self, lang, oem, psm, variables):
+        kwargs = {"lang": lang}
+        if self.tessdata_path:
+            kwargs["path"] = self.tessdata_path
+        if oem is not None:
+            kwargs["oem"] = oem
+        if psm is not None:
+            kwargs["psm"] = psm
+        engine = tesserocr.PyTessBaseAPI(**kwargs)
+        for key, value in variables.items():
+            engine.SetVariable(key, value)
+        return engine
+
+    def _borrow(self, config):
+        """Take an engine for this config, creating one if the pool is not full"""
+        with self._lock:
+            pool = self._pools.setdefault(config, queue.Queue())
+            try:
+                return pool.get_nowait()
+            except queue.Empty:
+                create = self._created.get(config, 0) < self.pool_size
+                if create:
+                    self._created[config] = self._created.get(config, 0) + 1
+        if not create:
+            return pool.get()
+
+        # Built outside the lock; a failed build gives its slot back so
+        # later calls can try again instead of waiting on an engine that
+        # will never exist
+        try:
+            return self._new_engine(*parse_tesseract_config(config))
+        except Exception:
+            with self._lock:
+                self._created[config] -= 1
+            raise
+
+    def _release(self, config, engine):
+        self._pools[config].put(engine)
+
+    def _recognize(self, engine, image):
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        engine.SetImage(image)
+        engine.Recognize()
+
+    def image_to_data(self, image, config=""):
+        """Word level output shaped like pytesseract's Output.DICT"""
+        data = {key: [] for key in ("block_num", "line_num", "left", "top", "width", "height", "conf", "text")}
+        engine = self._borrow(config)
+        try:
+            self._recognize(engine, image)
+            level = tesserocr.RIL.WORD
+            block_num = line_num = 0
+            for word in tesserocr.iterate_level(engine.GetIterator(), level):
+                if word.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+                    block_num += 1
+                if word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                    line_num += 1
+                box = word.BoundingBox(level)
+                text = word.GetUTF8Text(level)
+                if box is None or text is None:
+                    continue
+                x0, y0, x1, y1 = box
+                data["block_num"].append(block_num)
+                data["line_num"].append(line_num)
+                data["left"].append(x0)
+                data["top"].append(y0)
+                data["width"].append(x1 - x0)
+                data["height"].append(y1 - y0)
+                data["conf"].append(word.Confidence(level))
+                data["text"].append(text)
+        finally:
+            engine.Clear()
+            self._release(config, engine)
+        return data
+
+    def image_to_string(self, image, config=""):
+        engine = self._borrow(config)
+        try:
+            self._recognize(engine, image)
+            return engine.GetUTF8Text()
+        finally:
+            engine.Clear()
+            self._release(config, engine)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_ocr_backend():
+    """Get the process-wide OCR backend (tesserocr when available, else pytesseract)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if OCR_BACKEND in ("auto", "tesserocr") and tesserocr is not None:
+                    try:
+                        backend = TesserocrBackend()
+                        # Fail here rather than on the first document if tessdata is missing
+                        backend._release("", backend._borrow(""))
+                        _backend = backend
+                    except Exception as e:
+                        print(f"tesserocr unavailable ({str(e)}), falling back to pytesseract")
+                elif OCR_BACKEND == "tesserocr":
+                    print("tesserocr is not installed, falling back to pytesseract")
+                if _backend is None:
+                    _backend = PytesseractBackend()
+    return _backend
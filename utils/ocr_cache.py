@@ -0,0 +1,113 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+from utils.database import get_ocr_cache_entry, save_ocr_cache_entry
+
+# In-process tier: most recently used results, bounded by entry count
+MEMORY_CACHE_ENTRIES = 128
+
+# On-disk tier: total serialized size kept in the ocr_cache table
+DISK_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+
+def image_hash(image):
+    """Content hash of the decoded pixels, independent of the upload's file name or encoding"""
+    content_hash = getattr(image, "content_hash", None)
+    if content_hash is not None:
+        # An ImagePipeline hashes its buffer once for every cache
+        return content_hash
+    pixels = np.ascontiguousarray(np.asarray(image))
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{pixels.dtype.str}{pixels.shape}".encode())
+    digest.update(pixels.data)
+    return digest.hexdigest()
+
+
+def _to_json(value):
+    """Serialize an OCR result, converting numpy scalars and arrays"""
+    def default(obj):
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        return str(obj)
+    return json.dumps(value, default=default)
+
+
+class OCRResultCache:
+    """Two-tier cache of OCR results keyed by image content, doc type and config
+
+    Streamlit reruns the script on every widget change; with this cache a
+    document that was already OCRed is answered from memory or from the
+    ocr_cache table instead of running tesseract again. Entries are kept
+    as JSON so every hit returns a fresh copy the caller may modify.
+    """
+
+    def __init__(self, memory_entries=MEMORY_CACHE_ENTRIES, disk_max_bytes=DISK_CACHE_MAX_BYTES, persist=True):
+        self.memory_entries = memory_entries
+        self.disk_max_bytes = disk_max_bytes
+        self.persist = persist
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+    @staticmethod
+    def make_key(image, doc_type, config):
+        """Cache key for an image OCRed as doc_type with the given configuration"""
+        config_hash = hashlib.blake2b(str(config).encode(), digest_size=8).hexdigest()
+        return f"{image_hash(image)}:{doc_type}:{config_hash}"
+
+    def get(self, key):
+        """Return (result, tier) for a cached key, or (None, None)"""
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+                self.hits["memory"] += 1
+                return json.loads(payload), "memory"
+
+        payload = get_ocr_cache_entry(key) if self.persist else None
+        if payload is None:
+            with self._lock:
+                self.misses += 1
+            return None, None
+
+        with self._lock:
+            self._remember(key, payload)
+            self.hits["disk"] += 1
+        return json.loads(payload), "disk"
+
+    def put(self, key, doc_type, result):
+        """Store a result in both tiers"""
+        payload = _to_json(result)
+        with self._lock:
+            self._remember(key, payload)
+        if self.persist:
+            save_ocr_cache_entry(key, doc_type, payload, self.disk_max_bytes)
+
+    def _remember(self, key, payload):
+        self._memory[key] = payload
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache():
+    """Get the process-wide OCR result cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OCRResultCache()
+    return _cache
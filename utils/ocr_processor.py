@@ -4,50 +4,199 @@ import numpy as np
 from PIL import Image
 import streamlit as st
 from datetime import datetime
-import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import time
+from utils.database import get_ocr_variant_stats, record_ocr_variant_result
+from utils.ktp_layout import extract_ktp_fields, to_labeled_text
+from utils.mrz import read_mrz
+from utils.field_extractors import DOCUMENT_FIELDS, get_field_extractor
+from utils.ocr_cache import get_ocr_cache
+from utils.ocr_backend import get_ocr_backend
+from utils.deskew import deskew
+from utils.image_pipeline import ImagePipeline, scratch_buffer
+
+# All preprocessing variants, in their historical order (ties go to the earlier one)
+PREPROCESS_VARIANTS = ("gray", "adaptive", "otsu_denoised", "deskewed", "otsu")
+
+# Named preprocessing profiles. fast and balanced first downscale to about
+# TARGET_DPI; only accurate pays for full-resolution non-local-means denoising.
+PREPROCESS_PROFILES = {
+    "fast": {"variants": ("gray", "otsu"), "downscale": True},
+    "balanced": {"variants": ("gray", "otsu", "adaptive", "deskewed"), "downscale": True},
+    "accurate": {"variants": ("gray", "adaptive", "otsu_denoised", "deskewed"), "downscale": False}
+}
+
+# Automatic profile selection: the cheapest profile whose thresholds the
+# image meets (minimum sharpness and contrast, maximum noise); anything
+# below the balanced thresholds uses the accurate profile
+PROFILE_QUALITY_THRESHOLDS = {
+    "fast": {"sharpness": 300, "contrast": 50, "noise": 3},
+    "balanced": {"sharpness": 80, "contrast": 30, "noise": 8}
+}
+
+# Longest physical side of each document type, used to downscale to TARGET_DPI
+TARGET_DPI = 300
+DOCUMENT_LONG_SIDE_MM = {
+    "ID Card (KTP)": 85.6,
+    "Tax ID (NPWP)": 85.6,
+    "Passport": 125
+}
+DEFAULT_LONG_SIDE_MM = 297  # A4
+
+# Mean word confidence at which adaptive OCR stops trying further variants
+EARLY_EXIT_CONFIDENCE = 80
+
+# Variants of one document OCRed at the same time in parallel adaptive mode
+ADAPTIVE_WINDOW = 2
+
+def estimate_image_quality(gray):
+    """Cheap quality estimate: sharpness, contrast and noise
+
+    Sharpness (Laplacian variance after a median filter, so noise does not
+    count as detail) and contrast (gray-level std) are measured on a copy
+    no larger than 1000px; noise is the robust std of the median-filter
+    residual on a full-resolution center crop, where text edges are too
+    few to move the median.
+    """
+    scale = 1000 / max(gray.shape[:2])
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+    
+    height, width = gray.shape[:2]
+    crop = gray[max(0, height // 2 - 512):height // 2 + 512, max(0, width // 2 - 512):width // 2 + 512]
+    residual = np.abs(crop.astype(np.int16) - cv2.medianBlur(crop, 3))
+    return {
+        "sharpness": float(cv2.Laplacian(cv2.medianBlur(small, 3), cv2.CV_64F).var()),
+        "contrast": float(small.std()),
+        "noise": float(np.median(residual)) * 1.4826
+    }
+
+class VariantStats:
+    """Persisted per document type win rates of preprocessing variants"""
 
-class OCRProcessor:
     def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}  # doc_type -> {variant: [attempts, wins]}
+
+    def _load(self, doc_type):
+        if doc_type not in self._stats:
+            loaded = get_ocr_variant_stats(doc_type)
+            self._stats[doc_type] = {name: list(loaded.get(name, (0, 0))) for name in PREPROCESS_VARIANTS}
+        return self._stats[doc_type]
+
+    def order(self, doc_type, variants=PREPROCESS_VARIANTS):
+        """Variants by smoothed win rate, best first (historical order breaks ties)"""
+        with self._lock:
+            stats = self._load(doc_type)
+            return sorted(
+                variants,
+                key=lambda name: -(stats[name][1] + 1) / (stats[name][0] + 2)
+            )
+
+    def record(self, doc_type, attempted, winner):
+        """Count attempts for the variants tried and a win for the winner"""
+        with self._lock:
+            stats = self._load(doc_type)
+            for name in attempted:
+                stats[name][0] += 1
+                if name == winner:
+                    stats[name][1] += 1
+        record_ocr_variant_result(doc_type, attempted, winner)
+
+class OCRProcessor:
+    def __init__(self, parallel=True, max_workers=None, adaptive=True, ktp_layout=True, cache=True, profile="auto",
+                 mrz=True):
         pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
         # Enhanced OCR configuration
         self.custom_config = r'--oem 3 --psm 6 -l ind+eng --dpi 300'
+        # In-process tesseract engines when available, the tesseract binary otherwise
+        self.backend = get_ocr_backend()
+        # Run preprocessing + OCR of each variant concurrently. Threads are
+        # enough: tesseract runs as a subprocess and OpenCV releases the GIL.
+        # Adaptive mode keeps at most ADAPTIVE_WINDOW of them busy per
+        # document, leaving the rest of the pool to other documents.
+        self.parallel = parallel
+        self.max_workers = max_workers or max(len(p["variants"]) for p in PREPROCESS_PROFILES.values())
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # Rank variants by past wins and stop once a good enough result is in
+        self.adaptive = adaptive
+        self.early_exit_confidence = EARLY_EXIT_CONFIDENCE
+        self.variant_stats = VariantStats()
+        # OCR KTP fields from their known regions before falling back to the full card
+        self.ktp_layout = ktp_layout
+        # Read passports from the machine-readable zone before the full page
+        self.mrz = mrz
+        # Preprocessing profile name, or "auto" to choose from image quality
+        self.profile = profile
+        # Reuse results for images already OCRed with the same configuration
+        self.cache = get_ocr_cache() if cache else None
+        # Per-thread list collecting messages instead of calling Streamlit
+        self._local = threading.local()
+
+    def _get_executor(self):
+        """Lazily create the bounded pool shared by all documents of this processor"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ocr")
+        return self._executor
 
     def extract_nik(self, text):
         """Extract NIK with advanced pattern matching"""
         if not text:
             return None
-            
-        nik_patterns = [
-            r'\b\d{16}\b',  # Basic 16-digit pattern
-            r'NIK[:\s]*(\d{16})',  # NIK label pattern
-            r'(?:^|\s)(\d{6}(?:0[1-9]|1[0-2])(?:0[1-9]|[12]\d|3[01])\d{6})(?:$|\s)'  # Structured NIK pattern
-        ]
-        
-        for pattern in nik_patterns:
-            match = re.search(pattern, text)
-            if match:
-                return match.group(1) if len(match.groups()) > 0 else match.group(0)
-        return None
+        return get_field_extractor("ID Card (KTP)", ("nik",)).extract(text)["nik"]
 
     def extract_name(self, text):
         """Extract name with advanced pattern matching"""
         if not text:
             return None
-            
-        name_patterns = [
-            r'Nama[:\s]+([^\n]+)',
-            r'Name[:\s]+([^\n]+)',
-            r'(?<=\n)([A-Z][A-Z\s]+)(?=\n)'
-        ]
-        
-        for pattern in name_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
-        return None
+        return get_field_extractor("ID Card (KTP)", ("name",)).extract(text)["name"]
+
+    def _notify(self, level, message):
+        """Show a Streamlit warning/error, or collect it when running on a background thread"""
+        messages = getattr(self._local, "messages", None)
+        if messages is not None:
+            messages.append((level, message))
+        else:
+            getattr(st, level)(message)
+
+    def process_document_in_background(self, image, doc_type):
+        """process_document for worker threads, returning (results, [(level, message)])
+
+        Streamlit calls only work on the script thread, so messages are
+        handed back for the caller to display.
+        """
+        self._local.messages = []
+        try:
+            return self.process_document(image, doc_type), self._local.messages
+        finally:
+            self._local.messages = None
+
+    def _cache_config(self):
+        """Settings that change OCR output and therefore belong in the cache key"""
+        return (self.custom_config, self.adaptive, self.ktp_layout, self.mrz, self.profile, PREPROCESS_VARIANTS, self.backend.name)
 
     def process_document(self, image, doc_type):
-        """Process document and return structured data"""
+        """Process document and return structured data, using the OCR result cache"""
+        image = ImagePipeline.wrap(image)
+        if self.cache is None:
+            return self._process_document(image, doc_type)
+
+        cache_key = self.cache.make_key(image, doc_type, self._cache_config())
+        results, tier = self.cache.get(cache_key)
+        if results is not None:
+            results["debug_info"]["cache"] = tier
+            return results
+
+        results = self._process_document(image, doc_type)
+        if "error" not in results["debug_info"]:
+            self.cache.put(cache_key, doc_type, results)
+        results["debug_info"]["cache"] = "miss"
+        return results
+
+    def _process_document(self, image, doc_type):
+        """Run OCR on a document and parse it"""
         results = {
             "raw_text": "",
             "parsed_data": {},
@@ -56,87 +205,378 @@ class OCRProcessor:
         }
         
         try:
-            preprocessed_images = self._preprocess_image(image)
-            best_result = self._extract_best_text(preprocessed_images)
+            if doc_type == "ID Card (KTP)" and self.ktp_layout:
+                roi_result = self._process_ktp_regions(image)
+                results["debug_info"]["ktp_fields"] = roi_result["fields"]
+                if roi_result["parsed_data"].get("nik"):
+                    results.update({
+                        "raw_text": roi_result["text"],
+                        "parsed_data": roi_result["parsed_data"],
+                        "confidence": roi_result["confidence"]
+                    })
+                    results["debug_info"]["field_confidence"] = roi_result["field_confidence"]
+                    results["debug_info"]["method"] = "ktp_regions"
+                    return results
+
+            mrz = None
+            if doc_type == "Passport" and self.mrz:
+                mrz = self._process_mrz(image)
+                results["debug_info"]["mrz"] = mrz
+                if mrz and mrz["valid"]:
+                    results.update({
+                        "raw_text": "\n".join(mrz["lines"]),
+                        "parsed_data": self._mrz_to_passport_data(mrz),
+                        "confidence": mrz["confidence"]
+                    })
+                    results["debug_info"]["field_confidence"] = self._mrz_field_confidence(mrz)
+                    results["debug_info"]["method"] = "mrz"
+                    return results
+            
+            gray, profile, quality = self._prepare_gray(image, doc_type)
+            variants = PREPROCESS_PROFILES[profile]["variants"]
+            results["debug_info"]["profile"] = profile
+            results["debug_info"]["quality"] = quality
+            
+            if self.adaptive:
+                best_result = self._extract_best_text_adaptive(gray, doc_type, variants)
+            elif self.parallel:
+                best_result = self._extract_best_text_parallel(gray, variants)
+            else:
+                preprocessed_images = self._preprocess_image(gray, variants)
+                best_result = self._extract_best_text(preprocessed_images)
             
             results["raw_text"] = best_result["text"]
             results["confidence"] = best_result["confidence"]
+            results["debug_info"]["variants"] = best_result.get("variants", {})
+            results["debug_info"]["selected_variant"] = best_result.get("variant")
+            results["debug_info"]["early_exit"] = best_result.get("early_exit", False)
+            results["debug_info"]["variants_skipped"] = best_result.get("variants_skipped", 0)
             
             # Parse data based on document type
             if doc_type == "ID Card (KTP)":
-                parsed_data = {
-                    "nik": self.extract_nik(best_result["text"]),
-                    "name": self.extract_name(best_result["text"]),
-                    # ... other fields ...
-                }
+                # NIK and name in one pass over the text
+                parsed_data, field_confidence = get_field_extractor(
+                    "ID Card (KTP)", ("nik", "name")
+                ).extract_with_confidence(best_result["text"])
+                # Fill fields the full-card pass missed from the region pass
+                if "ktp_fields" in results["debug_info"]:
+                    for field, value in roi_result["parsed_data"].items():
+                        if value and not parsed_data.get(field):
+                            parsed_data[field] = value
+                            field_confidence[field] = roi_result["field_confidence"].get(field, 0.0)
                 results["parsed_data"] = parsed_data
+                results["debug_info"]["field_confidence"] = field_confidence
+            elif doc_type == "Passport":
+                field_confidence = {}
+                parsed_data = self._parse_passport_data(best_result["text"], field_confidence)
+                # Fill fields the page pass missed from an MRZ whose check digits failed
+                if mrz:
+                    for field, value in self._mrz_to_passport_data(mrz).items():
+                        if value and not parsed_data.get(field):
+                            parsed_data[field] = value
+                            field_confidence[field] = self._mrz_field_confidence(mrz).get(field, 0.0)
+                results["parsed_data"] = parsed_data
+                results["debug_info"]["field_confidence"] = field_confidence
+            elif doc_type in DOCUMENT_FIELDS:
+                field_confidence = {}
+                results["parsed_data"] = self._parse_fields(doc_type, best_result["text"], {}, field_confidence)
+                results["debug_info"]["field_confidence"] = field_confidence
             
+            results["debug_info"]["method"] = "full_card"
             return results
             
         except Exception as e:
-            st.error(f"OCR Processing Error: {str(e)}")
+            self._notify("error", f"OCR Processing Error: {str(e)}")
+            results["debug_info"]["error"] = str(e)
             return results
 
-    def _preprocess_image(self, image):
-        """Advanced image preprocessing pipeline"""
-        img_array = np.array(image)
-        preprocessed = []
+    def _process_ktp_regions(self, image):
+        """OCR KTP field regions with field-specific configs and parse them"""
+        fields = extract_ktp_fields(
+            self._to_gray(image), executor=self._get_executor() if self.parallel else None, backend=self.backend
+        )
+        text = to_labeled_text(fields)
+        field_confidence = {}
+        parsed_data = self._parse_ktp_data(text, field_confidence)
+        if parsed_data.get("nik") and len(parsed_data["nik"]) != 16:
+            parsed_data["nik"] = None
+        
+        confidences = [result["confidence"] for result in fields.values() if result["text"]]
+        return {
+            "text": text,
+            "parsed_data": parsed_data,
+            "confidence": sum(confidences) / len(confidences) if confidences else 0,
+            "fields": fields,
+            "field_confidence": field_confidence
+        }
+
+    def _process_mrz(self, image):
+        """Read the passport MRZ; None when no MRZ lines were recognized"""
+        try:
+            return read_mrz(self._to_gray(image), backend=self.backend)
+        except Exception as e:
+            self._notify("warning", f"MRZ reading failed: {str(e)}")
+            return None
 
-        # Basic grayscale
-        gray = cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY)
-        preprocessed.append(gray)
+    def _mrz_to_passport_data(self, mrz):
+        """Passport fields from an MRZ read, in the _parse_passport_data layout"""
+        return {
+            "passport_number": mrz["passport_number"] or None,
+            "name": mrz["name"] or None,
+            "nationality": mrz["nationality"] or None,
+            "date_of_birth": mrz["date_of_birth"],
+            "date_of_issue": None,
+            "date_of_expiry": mrz["date_of_expiry"],
+            "sex": mrz["sex"],
+            "mrz_valid": mrz["valid"]
+        }
 
-        # Adaptive thresholding
-        adaptive = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
-        preprocessed.append(adaptive)
+    def _mrz_field_confidence(self, mrz):
+        """1.0 for fields protected by a matching check digit; names have no check digit"""
+        unchecked = 0.8 if mrz["valid"] else 0.4
+        return {
+            field: 1.0 if mrz["checks"].get(field) else unchecked
+            for field, value in self._mrz_to_passport_data(mrz).items()
+            if value and field not in ("mrz_valid", "date_of_issue")
+        }
 
-        # Denoising + Otsu's thresholding
-        denoised = cv2.fastNlMeansDenoising(gray)
-        _, otsu = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        preprocessed.append(otsu)
+    def _select_profile(self, gray):
+        """Configured profile, or the cheapest one the image quality allows"""
+        quality = estimate_image_quality(gray)
+        if self.profile != "auto":
+            return self.profile, quality
+        for profile in ("fast", "balanced"):
+            limits = PROFILE_QUALITY_THRESHOLDS[profile]
+            if (quality["sharpness"] >= limits["sharpness"] and quality["contrast"] >= limits["contrast"]
+                    and quality["noise"] <= limits["noise"]):
+                return profile, quality
+        return "accurate", quality
 
-        # Deskewing if needed
-        try:
-            coords = np.column_stack(np.where(gray > 0))
-            angle = cv2.minAreaRect(coords)[-1]
-            if angle < -45:
-                angle = 90 + angle
-            center = tuple(np.array(gray.shape[1::-1]) / 2)
-            matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
-            deskewed = cv2.warpAffine(gray, matrix, gray.shape[1::-1], flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
-            preprocessed.append(deskewed)
-        except Exception as e:
-            st.warning(f"Deskewing failed: {str(e)}")
+    def _prepare_gray(self, image, doc_type):
+        """Grayscale image, its profile and quality, downscaled to about TARGET_DPI if the profile asks"""
+        gray = self._to_gray(image)
+        profile, quality = self._select_profile(gray)
+        if PREPROCESS_PROFILES[profile]["downscale"]:
+            long_side_mm = DOCUMENT_LONG_SIDE_MM.get(doc_type, DEFAULT_LONG_SIDE_MM)
+            scale = (long_side_mm / 25.4 * TARGET_DPI) / max(gray.shape[:2])
+            if scale < 1:
+                size = (max(1, round(gray.shape[1] * scale)), max(1, round(gray.shape[0] * scale)))
+                gray = cv2.resize(
+                    gray, size, dst=scratch_buffer("ocr_scaled", size[::-1]), interpolation=cv2.INTER_AREA
+                )
+        return gray, profile, quality
+
+    def _to_gray(self, image):
+        """Single-channel view of an ImagePipeline, PIL image or array"""
+        return ImagePipeline.wrap(image).gray
+
+    def _preprocess_variant(self, name, gray):
+        """Build one preprocessing variant from the grayscale image"""
+        if name == "gray":
+            return gray
+
+        if name == "adaptive":
+            # Adaptive thresholding
+            return cv2.adaptiveThreshold(
+                gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2,
+                dst=scratch_buffer("adaptive", gray.shape)
+            )
+
+        if name == "otsu":
+            # Light median filter + Otsu's thresholding
+            blurred = cv2.medianBlur(gray, 3, dst=scratch_buffer("otsu_median", gray.shape))
+            _, otsu = cv2.threshold(
+                blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=scratch_buffer("otsu", gray.shape)
+            )
+            return otsu
+
+        if name == "otsu_denoised":
+            # Denoising + Otsu's thresholding
+            denoised = cv2.fastNlMeansDenoising(gray, dst=scratch_buffer("denoised", gray.shape))
+            _, otsu = cv2.threshold(
+                denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=scratch_buffer("otsu_denoised", gray.shape)
+            )
+            return otsu
+
+        if name == "deskewed":
+            # Skew estimated on a downsampled copy, then one full-size warp
+            return deskew(gray, dst=scratch_buffer("deskewed", gray.shape))
+
+        raise ValueError(f"Unknown preprocessing variant: {name}")
+
+    def _preprocess_image(self, gray, variants=PREPROCESS_VARIANTS):
+        """Advanced image preprocessing pipeline"""
+        preprocessed = []
+
+        for name in variants:
+            try:
+                preprocessed.append(self._preprocess_variant(name, gray))
+            except Exception as e:
+                self._notify("warning", f"Preprocessing variant '{name}' failed: {str(e)}")
 
         return preprocessed
 
+    def _score_ocr_data(self, data):
+        """Turn pytesseract image_to_data output into text and mean confidence"""
+        valid_confidences = [float(conf) for conf in data['conf'] if float(conf) >= 0]
+        if not valid_confidences:
+            return None
+        return {
+            "text": " ".join([word for word in data['text'] if word.strip()]),
+            "confidence": sum(valid_confidences) / len(valid_confidences)
+        }
+
     def _extract_best_text(self, preprocessed_images):
         """Extract text from preprocessed images and return best result"""
         best_result = {"text": "", "confidence": 0}
         
         for img in preprocessed_images:
             try:
-                data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
-                
-                # Calculate confidence
-                valid_confidences = [float(conf) for conf in data['conf'] if conf != '-1']
-                if valid_confidences:
-                    confidence = sum(valid_confidences) / len(valid_confidences)
-                    
-                    # Get text
-                    text = " ".join([word for word in data['text'] if word.strip()])
-                    
-                    if confidence > best_result["confidence"]:
-                        best_result = {
-                            "text": text,
-                            "confidence": confidence
-                        }
+                data = self.backend.image_to_data(img)
+                result = self._score_ocr_data(data)
+                if result and result["confidence"] > best_result["confidence"]:
+                    best_result = result
             except Exception as e:
-                st.warning(f"OCR extraction error: {str(e)}")
+                self._notify("warning", f"OCR extraction error: {str(e)}")
                 continue
                 
         return best_result
 
+    def _ocr_variant(self, name, gray):
+        """Preprocess and OCR a single variant (runs on a pool thread)"""
+        start = time.perf_counter()
+        img = self._preprocess_variant(name, gray)
+        data = self.backend.image_to_data(img)
+        result = self._score_ocr_data(data) or {"text": "", "confidence": 0}
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    def _run_variants(self, names, gray):
+        """OCR the named variants, concurrently when parallel, and return {name: result}
+
+        Streamlit calls are not made from pool threads; failures are
+        collected and reported here on the calling thread.
+        """
+        results = {}
+        if self.parallel and len(names) > 1:
+            executor = self._get_executor()
+            futures = {executor.submit(self._ocr_variant, name, gray): name for name in names}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    self._notify("warning", f"OCR variant '{name}' failed: {str(e)}")
+        else:
+            for name in names:
+                try:
+                    results[name] = self._ocr_variant(name, gray)
+                except Exception as e:
+                    self._notify("warning", f"OCR variant '{name}' failed: {str(e)}")
+        return results
+
+    def _select_best(self, results, order=PREPROCESS_VARIANTS):
+        """Highest confidence result, earliest variant in `order` on ties"""
+        best_result = {"text": "", "confidence": 0}
+        for name in order:
+            result = results.get(name)
+            if result and result["confidence"] > best_result["confidence"]:
+                best_result = {"text": result["text"], "confidence": result["confidence"], "variant": name}
+
+        best_result["variants"] = {
+            name: {"confidence": r["confidence"], "seconds": round(r["seconds"], 3)} for name, r in results.items()
+        }
+        return best_result
+
+    def _extract_best_text_parallel(self, gray, variants=PREPROCESS_VARIANTS):
+        """Preprocess and OCR all variants concurrently and return the best result"""
+        return self._select_best(self._run_variants(variants, gray), variants)
+
+    def _meets_exit_criteria(self, result, doc_type):
+        """Whether a variant's result is good enough to skip the remaining ones"""
+        if result["confidence"] < self.early_exit_confidence:
+            return False
+        if doc_type == "ID Card (KTP)":
+            nik = self.extract_nik(result["text"])
+            return bool(nik and len(nik) == 16)
+        return bool(result["text"].strip())
+
+    def _race_variants(self, order, gray, doc_type):
+        """OCR variants in learned order with ADAPTIVE_WINDOW in flight
+
+        Returns (results, winner, skipped), skipped being the number of
+        variants never started.
+
+        The top-ranked variants start together and each one that finishes
+        without an acceptable result makes room for the next in rank
+        order, so a miss costs one more variant rather than a full
+        sequential pass. Nothing new is submitted once any acceptable
+        result is in: the winner is the first acceptable variant in rank
+        order, so lower-ranked ones can no longer win and are skipped.
+        """
+        executor = self._get_executor()
+        remaining = list(order)
+        futures = {}
+        results = {}
+        acceptable = {}
+        winner = None
+        try:
+            while winner is None and (remaining or futures):
+                while remaining and len(futures) < ADAPTIVE_WINDOW and not any(acceptable.values()):
+                    name = remaining.pop(0)
+                    futures[executor.submit(self._ocr_variant, name, gray)] = name
+
+                future = next(as_completed(futures))
+                name = futures.pop(future)
+                try:
+                    results[name] = future.result()
+                    acceptable[name] = self._meets_exit_criteria(results[name], doc_type)
+                except Exception as e:
+                    acceptable[name] = False
+                    self._notify("warning", f"OCR variant '{name}' failed: {str(e)}")
+
+                for candidate in order:
+                    if candidate not in acceptable:
+                        break
+                    if acceptable[candidate]:
+                        winner = candidate
+                        break
+        finally:
+            skipped = len(remaining) + sum(future.cancel() for future in futures)
+        return results, winner, skipped
+
+    def _extract_best_text_adaptive(self, gray, doc_type, variants=PREPROCESS_VARIANTS):
+        """OCR variants in learned order, stopping at the first acceptable result
+
+        In parallel mode up to ADAPTIVE_WINDOW variants run at once, next
+        in rank order; otherwise they run one by one, best first. Win
+        statistics are updated afterwards.
+        """
+        order = self.variant_stats.order(doc_type, variants)
+
+        results = {}
+        winner = None
+        skipped = 0
+        if self.parallel and len(order) > 1:
+            results, winner, skipped = self._race_variants(order, gray, doc_type)
+        else:
+            for position, name in enumerate(order):
+                results.update(self._run_variants([name], gray))
+                if name in results and self._meets_exit_criteria(results[name], doc_type):
+                    winner = name
+                    skipped = len(order) - position - 1
+                    break
+
+        best_result = self._select_best(results, order)
+        if winner:
+            best_result.update({"text": results[winner]["text"], "confidence": results[winner]["confidence"], "variant": winner})
+        best_result["early_exit"] = skipped > 0
+        best_result["variants_skipped"] = skipped
+
+        if results:
+            self.variant_stats.record(doc_type, list(results), best_result.get("variant"))
+        return best_result
+
     def _extract_text(self, image):
         """Extract text with multiple configurations"""
         results = {
@@ -148,8 +588,7 @@ class OCRProcessor:
 
         try:
             # Default configuration
-            data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT, 
-                                           config=self.custom_config)
+            data = self.backend.image_to_data(image, config=self.custom_config)
             
             # Extract text blocks with confidence
             high_conf_blocks = []
@@ -226,7 +665,15 @@ class OCRProcessor:
         else:
             return self._parse_generic_data(text)
 
-    def _parse_ktp_data(self, text):
+    def _parse_fields(self, doc_type, text, data, field_confidence=None):
+        """Fill data with every field of doc_type found in one pass over the text"""
+        values, confidence = get_field_extractor(doc_type).extract_with_confidence(text)
+        data.update(values)
+        if field_confidence is not None:
+            field_confidence.update(confidence)
+        return data
+
+    def _parse_ktp_data(self, text, field_confidence=None):
         """Parse KTP-specific data"""
         data = {
             "nik": None,
@@ -239,60 +686,18 @@ class OCRProcessor:
             "marital_status": None,
             "occupation": None
         }
-        
-        # Find NIK (16 digits) using the extract_nik method
-        data["nik"] = self.extract_nik(text)
-        
-        # Find name using the extract_name method
-        data["name"] = self.extract_name(text)
-        
-        # Find birth info
-        birth_match = re.search(r'lahir[:\s]+([^\n]+)', text)
-        if birth_match:
-            data["birth_info"] = birth_match.group(1).strip()
-        
-        # Find gender
-        if "laki-laki" in text or "pria" in text:
-            data["gender"] = "LAKI-LAKI"
-        elif "perempuan" in text or "wanita" in text:
-            data["gender"] = "PEREMPUAN"
-        
-        # Find address
-        address_match = re.search(r'alamat[:\s]+([^\n]+)', text)
-        if address_match:
-            data["address"] = address_match.group(1).strip()
-        
-        # Find RT/RW
-        rt_rw_match = re.search(r'\b(?:rt|rt/rw)[:\s]+(\d+/\d+)\b', text)
-        if rt_rw_match:
-            data["rt_rw"] = rt_rw_match.group(1)
-        
-        return data
+        return self._parse_fields("ID Card (KTP)", text, data, field_confidence)
 
-    def _parse_npwp_data(self, text):
+    def _parse_npwp_data(self, text, field_confidence=None):
         """Parse NPWP-specific data"""
         data = {
             "npwp_number": None,
             "name": None,
             "address": None
         }
-        
-        # Find NPWP number (XX.XXX.XXX.X-XXX.XXX format)
-        npwp_match = re.search(r'\b\d{2}.\d{3}.\d{3}.\d{1}-\d{3}.\d{3}\b', text)
-        if npwp_match:
-            data["npwp_number"] = npwp_match.group()
-        
-        # Find name using the extract_name method
-        data["name"] = self.extract_name(text)
-        
-        # Find address
-        address_match = re.search(r'alamat[:\s]+([^\n]+)', text)
-        if address_match:
-            data["address"] = address_match.group(1).strip()
-        
-        return data
+        return self._parse_fields("Tax ID (NPWP)", text, data, field_confidence)
 
-    def _parse_passport_data(self, text):
+    def _parse_passport_data(self, text, field_confidence=None):
         """Parse Passport-specific data"""
         data = {
             "passport_number": None,
@@ -302,34 +707,7 @@ class OCRProcessor:
             "date_of_issue": None,
             "date_of_expiry": None
         }
-        
-        # Find passport number
-        passport_match = re.search(r'[A-Z]\d{7}', text)
-        if passport_match:
-            data["passport_number"] = passport_match.group()
-        
-        # Find name using the extract_name method
-        data["name"] = self.extract_name(text)
-        
-        # Find nationality
-        nationality_match = re.search(r'nationality[:\s]+([^\n]+)', text, re.IGNORECASE)
-        if nationality_match:
-            data["nationality"] = nationality_match.group(1).strip()
-        
-        # Find dates using patterns
-        dob_match = re.search(r'birth[:\s]+([0-9]{1,2}\s+[a-z]{3,}\s+[0-9]{4}|[0-9]{1,2}/[0-9]{1,2}/[0-9]{4})', text, re.IGNORECASE)
-        if dob_match:
-            data["date_of_birth"] = dob_match.group(1).strip()
-            
-        issue_match = re.search(r'issue[:\s]+([0-9]{1,2}\s+[a-z]{3,}\s+[0-9]{4}|[0-9]{1,2}/[0-9]{1,2}/[0-9]{4})', text, re.IGNORECASE)
-        if issue_match:
-            data["date_of_issue"] = issue_match.group(1).strip()
-            
-        expiry_match = re.search(r'expiry[:\s]+([0-9]{1,2}\s+[a-z]{3,}\s+[0-9]{4}|[0-9]{1,2}/[0-9]{1,2}/[0-9]{4})', text, re.IGNORECASE)
-        if expiry_match:
-            data["date_of_expiry"] = expiry_match.group(1).strip()
-        
-        return data
+        return self._parse_fields("Passport", text, data, field_confidence)
 
     def _parse_generic_data(self, text):
         """Parse generic document data"""
@@ -0,0 +1,190 @@
+import math
+import struct
+import threading
+import numpy as np
+from utils.database import get_db
+
+# Quantile sketch buckets: log-spaced between these amounts (IDR). Values
+# outside the range are clamped into the first/last bucket.
+SKETCH_MIN_AMOUNT = 1_000
+SKETCH_MAX_AMOUNT = 1_000_000_000_000
+SKETCH_BUCKETS = 96
+
+# Decay for the exponentially weighted mean (weight of the newest amount)
+EWMA_ALPHA = 0.1
+
+_LOG_MIN = math.log(SKETCH_MIN_AMOUNT)
+_LOG_SPAN = math.log(SKETCH_MAX_AMOUNT) - _LOG_MIN
+
+# count, mean, m2, ewma
+_HEADER = struct.Struct("<Iddd")
+
+
+def _bucket(amount):
+    """Sketch bucket index for an amount"""
+    if amount <= SKETCH_MIN_AMOUNT:
+        return 0
+    position = (math.log(amount) - _LOG_MIN) / _LOG_SPAN
+    return min(int(position * SKETCH_BUCKETS), SKETCH_BUCKETS - 1)
+
+
+class AmountProfile:
+    """Constant-memory running statistics of one customer's amounts for one type
+
+    Keeps Welford mean/variance of log amounts, an exponentially decayed
+    mean of raw amounts and a fixed log-bucket histogram used as a
+    streaming quantile sketch. Amounts span several orders of magnitude,
+    so the z-score is computed on the log scale.
+    """
+
+    __slots__ = ("count", "mean", "m2", "ewma", "sketch")
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, ewma=0.0, sketch=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.ewma = ewma
+        self.sketch = sketch if sketch is not None else np.zeros(SKETCH_BUCKETS, dtype=np.uint32)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def update(self, amount):
+        """Fold a new amount into the statistics"""
+        value = math.log1p(amount)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.ewma = amount if self.count == 1 else EWMA_ALPHA * amount + (1 - EWMA_ALPHA) * self.ewma
+        self.sketch[_bucket(amount)] += 1
+
+    def zscore(self, amount):
+        """Standard score of an amount against the history (log scale)"""
+        std = self.std
+        if std == 0:
+            return 0.0
+        return (math.log1p(amount) - self.mean) / std
+
+    def quantile(self, amount):
+        """Approximate fraction of past amounts at or below this amount"""
+        if self.count == 0:
+            return 0.0
+        bucket = _bucket(amount)
+        below = int(self.sketch[:bucket].sum())
+        # Assume the amount sits in the middle of its own bucket
+        return (below + self.sketch[bucket] / 2) / self.count
+
+    def value_at(self, q):
+        """Approximate amount at quantile q from the sketch"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        cumulative = np.cumsum(self.sketch)
+        bucket = int(np.searchsorted(cumulative, target))
+        bucket = min(bucket, SKETCH_BUCKETS - 1)
+        return math.exp(_LOG_MIN + (bucket + 0.5) / SKETCH_BUCKETS * _LOG_SPAN)
+
+    def to_bytes(self):
+        """Pack the profile into a compact blob"""
+        return _HEADER.pack(self.count, self.mean, self.m2, self.ewma) + self.sketch.tobytes()
+
+    @classmethod
+    def from_bytes(cls, blob):
+        count, mean, m2, ewma = _HEADER.unpack_from(blob)
+        sketch = np.frombuffer(blob, dtype=np.uint32, offset=_HEADER.size).copy()
+        return cls(count, mean, m2, ewma, sketch)
+
+
+class OnlineStatsStore:
+    """Per-customer, per-transaction-type amount profiles
+
+    With persist=True every update is written through to the
+    customer_amount_stats table (one small blob per profile).
+    """
+
+    def __init__(self, persist=False):
+        self.persist = persist
+        self.profiles = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls):
+        """Load all persisted profiles"""
+        store = cls(persist=True)
+        try:
+            conn = get_db()
+            cursor = conn.cursor()
+            cursor.execute('SELECT customer_id, tx_type, state FROM customer_amount_stats')
+            for customer_id, tx_type, state in cursor.fetchall():
+                store.profiles[(customer_id, tx_type)] = AmountProfile.from_bytes(state)
+        except Exception as e:
+            print(f"Error loading amount statistics: {str(e)}")
+        finally:
+            if conn:
+                conn.close()
+        return store
+
+    def profile(self, customer_id, tx_type):
+        """Get the profile for a customer and type, if any history exists"""
+        return self.profiles.get((customer_id, tx_type))
+
+    def score(self, transaction):
+        """Score a transaction against the customer's own history"""
+        profile = self.profile(transaction["customer_id"], transaction["type"])
+        if profile is None:
+            return {"count": 0, "zscore": 0.0, "quantile": 0.0, "ewma": 0.0}
+        amount = float(transaction["amount"])
+        return {
+            "count": profile.count,
+            "zscore": profile.zscore(amount),
+            "quantile": profile.quantile(amount),
+            "ewma": profile.ewma
+        }
+
+    def update(self, transaction):
+        """Fold a transaction into its profile"""
+        key = (transaction["customer_id"], transaction["type"])
+        with self._lock:
+            profile = self.profiles.get(key)
+            if profile is None:
+                profile = self.profiles[key] = AmountProfile()
+            profile.update(float(transaction["amount"]))
+            state = profile.to_bytes()
+
+        if self.persist:
+            self._save(key, state, transaction["date"])
+
+    def _save(self, key, state, last_date):
+        try:
+            conn = get_db()
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO customer_amount_stats (customer_id, tx_type, state, last_updated)
+                VALUES (?, ?, ?, ?)
+            ''', (key[0], key[1], state, last_date))
+            conn.commit()
+        except Exception as e:
+            print(f"Error saving amount statistics: {str(e)}")
+        finally:
+            if conn:
+                conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_online_stats_store():
+    """Get the process-wide persisted statistics store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = OnlineStatsStore.load()
+    return _store
@@ -0,0 +1,172 @@
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+import numpy as np
+from utils.image_pipeline import ImagePipeline
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # optional, PDF uploads are rejected without it
+    pdfium = None
+
+# Pages are rendered at this resolution for OCR, and at PDF_VISION_DPI for vision models
+PDF_RENDER_DPI = 300
+PDF_VISION_DPI = 150
+
+# Pages OCRed at once; each page also runs its preprocessing variants in parallel
+PDF_PAGE_WORKERS = 2
+PDF_MAX_PAGES = 30
+
+# Reading stops once these fields have been found on some page
+PDF_REQUIRED_FIELDS = {
+    "Bank Statement": ("name", "address", "date"),
+    "Proof of Address": ("name", "address", "date")
+}
+
+# pdfium is not thread-safe; every call into it goes through this lock
+_pdfium_lock = threading.Lock()
+
+
+def is_pdf(source):
+    """Whether an upload, path or file object is a PDF (by name, MIME type or magic bytes)"""
+    name = source if isinstance(source, (str, Path)) else getattr(source, "name", "")
+    if str(name).lower().endswith(".pdf") or getattr(source, "type", None) == "application/pdf":
+        return True
+    if hasattr(source, "read") and hasattr(source, "seek"):
+        position = source.tell()
+        header = source.read(5)
+        source.seek(position)
+        return header == b"%PDF-"
+    return False
+
+
+class PdfDocument:
+    """A PDF opened once whose pages are rasterized only when asked for"""
+
+    def __init__(self, source, dpi=PDF_RENDER_DPI):
+        if pdfium is None:
+            raise RuntimeError("PDF support requires the pypdfium2 package")
+        if isinstance(source, (str, Path)):
+            data = Path(source).read_bytes()
+        elif hasattr(source, "getvalue"):
+            data = source.getvalue()
+        else:
+            data = source.read()
+        self.dpi = dpi
+        with _pdfium_lock:
+            self._pdf = pdfium.PdfDocument(io.BytesIO(data))
+            self.page_count = len(self._pdf)
+
+    def render_page(self, index, dpi=None, grayscale=False):
+        """Rasterize one page into an ImagePipeline (grayscale is enough for OCR)"""
+        with _pdfium_lock:
+            page = self._pdf[index]
+            try:
+                bitmap = page.render(scale=(dpi or self.dpi) / 72, grayscale=grayscale, rev_byteorder=True)
+                # Copy out of pdfium's buffer before it is released
+                pixels = np.array(bitmap.to_numpy())
+                bitmap.close()
+            finally:
+                page.close()
+        if pixels.ndim == 3 and pixels.shape[2] == 1:
+            pixels = pixels[..., 0]
+        return ImagePipeline.from_array(pixels)
+
+
+def _merge_page_fields(merged, confidence, pages, page, result):
+    """Keep the most confident value of every field seen so far"""
+    field_confidence = result["debug_info"].get("field_confidence", {})
+    for field, value in result.get("parsed_data", {}).items():
+        score = field_confidence.get(field, 0.5)
+        if value and score > confidence.get(field, 0):
+            merged[field] = value
+            confidence[field] = score
+            pages[field] = page
+
+
+def iter_pdf_pages(document, doc_type, processor, required_fields=None, max_workers=PDF_PAGE_WORKERS,
+                   max_pages=PDF_MAX_PAGES):
+    """OCR pages in parallel and yield each page as it finishes, stopping once the required fields are found
+
+    Pages are rendered inside the workers, at most max_workers at a time,
+    so pages after an early stop are never rasterized. Every update is
+    {"page", "result", "messages", "fields", "field_confidence",
+    "field_pages", "pages_done", "complete"}.
+    """
+    if required_fields is None:
+        required_fields = PDF_REQUIRED_FIELDS.get(doc_type, ())
+    page_count = min(document.page_count, max_pages)
+    merged, confidence, field_pages = {}, {}, {}
+
+    def ocr_page(index):
+        pipeline = document.render_page(index, grayscale=True)
+        return processor.process_document_in_background(pipeline, doc_type)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pdf-page")
+    pending = {}
+    next_page = 0
+    pages_done = 0
+    try:
+        while next_page < page_count or pending:
+            while next_page < page_count and len(pending) < max_workers:
+                pending[executor.submit(ocr_page, next_page)] = next_page
+                next_page += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = pending.pop(future)
+                pages_done += 1
+                try:
+                    result, messages = future.result()
+                except Exception as e:
+                    result = {"raw_text": "", "parsed_data": {}, "confidence": 0, "debug_info": {"error": str(e)}}
+                    messages = [("warning", f"Page {page + 1} could not be read: {str(e)}")]
+                _merge_page_fields(merged, confidence, field_pages, page, result)
+                complete = bool(required_fields) and all(merged.get(field) for field in required_fields)
+                yield {
+                    "page": page,
+                    "result": result,
+                    "messages": messages,
+                    "fields": dict(merged),
+                    "field_confidence": dict(confidence),
+                    "field_pages": dict(field_pages),
+                    "pages_done": pages_done,
+                    "complete": complete
+                }
+                if complete:
+                    return
+    finally:
+        # Early stop or abandoned generator: drop pages not started yet
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def ocr_pdf_in_background(document, doc_type, processor):
+    """OCR a PDF like process_document_in_background: returns (results, [(level, message)])"""
+    pages = {}
+    messages = []
+    update = None
+    for update in iter_pdf_pages(document, doc_type, processor):
+        pages[update["page"]] = update["result"]
+        messages.extend(update["messages"])
+
+    confidences = [result["confidence"] for result in pages.values() if result.get("raw_text")]
+    results = {
+        "raw_text": "\n\n".join(pages[page]["raw_text"] for page in sorted(pages)),
+        "parsed_data": update["fields"] if update else {},
+        "confidence": sum(confidences) / len(confidences) if confidences else 0,
+        "debug_info": {
+            "method": "pdf",
+            "page_count": document.page_count,
+            "pages_read": sorted(pages),
+            "early_stop": bool(update and update["complete"]) and len(pages) < document.page_count,
+            "field_confidence": update["field_confidence"] if update else {},
+            "field_pages": update["field_pages"] if update else {},
+            "pages": {page: result["debug_info"] for page, result in pages.items()}
+        }
+    }
+    if not pages:
+        results["debug_info"]["error"] = "PDF has no pages"
+    return results, messages
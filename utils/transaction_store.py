@@ -0,0 +1,302 @@
+import uuid
+import numpy as np
+import pandas as pd
+from datetime import date, datetime
+from utils.database import get_transactions
+
+TRANSACTION_TYPES = ["Transfer", "Cash Deposit", "Cash Withdrawal", "Salary", "Other"]
+
+# Amounts are stored as integer minor units (sen) to avoid float drift
+MINOR_UNITS = 100
+
+_EPOCH = date(1970, 1, 1)
+
+
+def to_epoch_day(value):
+    """Convert a date, datetime or YYYY-MM-DD string to days since 1970-01-01"""
+    if isinstance(value, str):
+        value = datetime.strptime(value[:10], "%Y-%m-%d").date()
+    elif isinstance(value, datetime):
+        value = value.date()
+    return (value - _EPOCH).days
+
+
+def new_transaction_id(prefix="TRX"):
+    """Globally unique transaction id, e.g. TRX20240105143000-1a2b3c4d"""
+    return f"{prefix}{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def from_epoch_day(day):
+    """Convert days since 1970-01-01 back to a YYYY-MM-DD string"""
+    return str(np.datetime64(int(day), "D"))
+
+
+class TransactionStore:
+    """Columnar in-memory transaction store backed by NumPy arrays
+
+    Numeric columns live in preallocated arrays that grow geometrically:
+    dates as int64 epoch days, amounts as int64 minor units, types as
+    uint8 codes, customers as int32 indices and risk flags as a packed
+    bitset. Free-text columns (id, destination, notes) stay in object
+    arrays since they are only needed for display.
+    """
+
+    def __init__(self, capacity=1024):
+        capacity = max(int(capacity), 8)
+        self._size = 0
+        self._dates = np.zeros(capacity, dtype=np.int64)
+        self._amounts = np.zeros(capacity, dtype=np.int64)
+        self._types = np.zeros(capacity, dtype=np.uint8)
+        self._customers = np.zeros(capacity, dtype=np.int32)
+        self._flags = np.zeros((capacity + 7) // 8, dtype=np.uint8)
+        self._ids = np.empty(capacity, dtype=object)
+        self._destinations = np.empty(capacity, dtype=object)
+        self._notes = np.empty(capacity, dtype=object)
+
+        self._type_codes = {name: code for code, name in enumerate(TRANSACTION_TYPES)}
+        self._type_names = list(TRANSACTION_TYPES)
+        self._customer_codes = {}
+        self._customer_ids = []
+        self._row_by_id = {}
+
+    @classmethod
+    def from_records(cls, transactions):
+        """Build a store from a list of transaction dicts"""
+        store = cls(capacity=len(transactions) * 2)
+        store.extend(transactions)
+        return store
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return len(self._dates)
+
+    @property
+    def nbytes(self):
+        """Memory used by the numeric columns"""
+        return sum(a.nbytes for a in (self._dates, self._amounts, self._types, self._customers, self._flags))
+
+    # ------------------------------------------------------------------
+    # Encoding helpers
+    # ------------------------------------------------------------------
+    def type_code(self, transaction_type):
+        """Get (or register) the uint8 code for a transaction type"""
+        code = self._type_codes.get(transaction_type)
+        if code is None:
+            if len(self._type_names) >= 256:
+                raise ValueError("Too many distinct transaction types for uint8 encoding")
+            code = len(self._type_names)
+            self._type_codes[transaction_type] = code
+            self._type_names.append(transaction_type)
+        return code
+
+    def customer_index(self, customer_id, create=True):
+        """Get (or register) the int32 index for a customer id"""
+        index = self._customer_codes.get(customer_id)
+        if index is None and create:
+            index = len(self._customer_ids)
+            self._customer_codes[customer_id] = index
+            self._customer_ids.append(customer_id)
+        return index
+
+    def _grow(self, minimum):
+        """Grow every column to hold at least `minimum` rows"""
+        capacity = self.capacity
+        while capacity < minimum:
+            capacity *= 2
+        if capacity == self.capacity:
+            return
+
+        for name in ("_dates", "_amounts", "_types", "_customers", "_ids", "_destinations", "_notes"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype) if old.dtype != object else np.empty(capacity, dtype=object)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+        flags = np.zeros((capacity + 7) // 8, dtype=np.uint8)
+        flags[:len(self._flags)] = self._flags
+        self._flags = flags
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def append(self, transaction):
+        """Append a transaction dict and return its row index"""
+        if self._size >= self.capacity:
+            self._grow(self._size + 1)
+
+        row = self._size
+        self._dates[row] = to_epoch_day(transaction["date"])
+        self._amounts[row] = int(round(float(transaction["amount"]) * MINOR_UNITS))
+        self._types[row] = self.type_code(transaction["type"])
+        self._customers[row] = self.customer_index(transaction["customer_id"])
+        self._ids[row] = transaction["id"]
+        self._destinations[row] = transaction.get("destination", "")
+        self._notes[row] = transaction.get("notes", "")
+        self._size += 1
+        self.set_risk_flag(row, bool(transaction.get("risk_flag", False)))
+
+        self._row_by_id[transaction["id"]] = row
+        return row
+
+    def extend(self, transactions):
+        """Append many transaction dicts"""
+        self._grow(self._size + len(transactions))
+        for transaction in transactions:
+            self.append(transaction)
+
+    def set_risk_flag(self, row, flag):
+        """Set or clear the risk flag bit for a row"""
+        byte, bit = divmod(row, 8)
+        mask = np.uint8(1 << (7 - bit))
+        if flag:
+            self._flags[byte] |= mask
+        else:
+            self._flags[byte] &= ~mask
+
+    def risk_flag(self, row):
+        """Read the risk flag bit for a single row"""
+        byte, bit = divmod(row, 8)
+        return bool(self._flags[byte] & (1 << (7 - bit)))
+
+    def get(self, transaction_id):
+        """Transaction dict for an id, or None"""
+        row = self._row_by_id.get(transaction_id)
+        return None if row is None else self.record(row)
+
+    def update(self, transaction_id, risk_flag=None, notes=None):
+        """Update the mutable fields of a transaction"""
+        row = self._row_by_id.get(transaction_id)
+        if row is None:
+            return False
+        if risk_flag is not None:
+            self.set_risk_flag(row, risk_flag)
+        if notes is not None:
+            self._notes[row] = notes
+        return True
+
+    # ------------------------------------------------------------------
+    # Column views
+    # ------------------------------------------------------------------
+    @property
+    def dates(self):
+        return self._dates[:self._size]
+
+    @property
+    def amounts(self):
+        return self._amounts[:self._size]
+
+    @property
+    def types(self):
+        return self._types[:self._size]
+
+    @property
+    def customers(self):
+        return self._customers[:self._size]
+
+    @property
+    def risk_flags(self):
+        """Risk flag bitset unpacked to a boolean array"""
+        return np.unpackbits(self._flags, count=self._size).view(np.bool_)
+
+    # ------------------------------------------------------------------
+    # Vectorized filtering
+    # ------------------------------------------------------------------
+    def mask(self, customer_id=None, types=None, flagged=None, start_date=None, end_date=None,
+             min_amount=None):
+        """Build a boolean row mask for the given filters"""
+        mask = np.ones(self._size, dtype=bool)
+
+        if customer_id is not None:
+            index = self.customer_index(customer_id, create=False)
+            if index is None:
+                return np.zeros(self._size, dtype=bool)
+            mask &= self.customers == index
+
+        if types is not None:
+            codes = [self._type_codes[t] for t in types if t in self._type_codes]
+            mask &= np.isin(self.types, np.array(codes, dtype=np.uint8))
+
+        if flagged is not None:
+            flags = self.risk_flags
+            mask &= flags if flagged else ~flags
+
+        if start_date is not None:
+            mask &= self.dates >= to_epoch_day(start_date)
+        if end_date is not None:
+            mask &= self.dates <= to_epoch_day(end_date)
+
+        if min_amount is not None:
+            mask &= self.amounts >= int(round(min_amount * MINOR_UNITS))
+
+        return mask
+
+    def filter(self, **filters):
+        """Return the row indices matching the filters"""
+        return np.flatnonzero(self.mask(**filters))
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+    def record(self, row):
+        """Materialize a single row as a transaction dict"""
+        return {
+            "id": self._ids[row],
+            "customer_id": self._customer_ids[self._customers[row]],
+            "date": from_epoch_day(self._dates[row]),
+            "type": self._type_names[self._types[row]],
+            "amount": self._amounts[row] / MINOR_UNITS,
+            "destination": self._destinations[row],
+            "notes": self._notes[row],
+            "risk_flag": self.risk_flag(row)
+        }
+
+    def records(self, rows=None):
+        """Materialize rows as transaction dicts"""
+        if rows is None:
+            rows = range(self._size)
+        return [self.record(row) for row in rows]
+
+    def to_dataframe(self, rows=None):
+        """Export rows to a pandas DataFrame
+
+        With rows=None the integer columns are wrapped without copying and
+        types/customers become Categoricals over the existing code arrays.
+        Dates are widened to datetime64[s] (pandas has no day resolution)
+        and selecting rows necessarily gathers into new arrays first.
+        """
+        if rows is None:
+            dates, amounts = self.dates, self.amounts
+            types, customers = self.types, self.customers
+            flags = self.risk_flags
+            ids, destinations, notes = (
+                self._ids[:self._size], self._destinations[:self._size], self._notes[:self._size]
+            )
+        else:
+            rows = np.asarray(rows, dtype=np.intp)
+            dates, amounts = self.dates[rows], self.amounts[rows]
+            types, customers = self.types[rows], self.customers[rows]
+            flags = self.risk_flags[rows]
+            ids, destinations, notes = self._ids[rows], self._destinations[rows], self._notes[rows]
+
+        return pd.DataFrame({
+            "id": ids,
+            "customer_id": pd.Categorical.from_codes(customers, categories=self._customer_ids),
+            "date": dates.view("datetime64[D]").astype("datetime64[s]", copy=False),
+            "type": pd.Categorical.from_codes(types, categories=self._type_names),
+            "amount_minor": amounts,
+            "amount": amounts / MINOR_UNITS,
+            "destination": destinations,
+            "notes": notes,
+            "risk_flag": flags
+        }, copy=False)
+
+
+def load_transaction_store(customer_ids=None):
+    """Store holding the saved transaction history, optionally only for customer_ids"""
+    transactions = get_transactions()
+    if customer_ids is not None:
+        transactions = [tx for tx in transactions if tx["customer_id"] in customer_ids]
+    return TransactionStore.from_records(transactions)
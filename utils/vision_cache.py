@@ -0,0 +1,92 @@
+import hashlib
+import threading
+import time
+from utils.database import get_vision_cache_entry, save_vision_cache_entry
+from utils.ocr_cache import image_hash
+from utils.vision_client import SingleFlight
+
+# Responses older than this are treated as misses and purged
+VISION_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+# Least recently used responses beyond this count are evicted
+VISION_CACHE_MAX_ENTRIES = 2000
+
+
+class VisionResponseCache:
+    """Disk-backed cache of remote vision model responses
+
+    Keyed by (model, prompt hash, image hash) so an identical verification
+    of the same document is answered from the vision_cache table instead
+    of a paid API call. Only the response text is cached; callers rebuild
+    their own result structures around it.
+    """
+
+    def __init__(self, ttl_seconds=VISION_CACHE_TTL_SECONDS, max_entries=VISION_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model, prompt, image):
+        prompt_hash = hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).hexdigest()
+        return f"{model}:{prompt_hash}:{image_hash(image)}"
+
+    def get(self, key):
+        """Cached response text for a key, or None if missing or expired"""
+        now = time.time()
+        response = get_vision_cache_entry(key, now - self.ttl_seconds, now)
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return response
+
+    def put(self, key, model, response):
+        now = time.time()
+        save_vision_cache_entry(key, model, response, now, now - self.ttl_seconds, self.max_entries)
+
+    def cached_call(self, model, prompt, image, call, client=None):
+        """Return the cached response for this request, or make the call and cache its text
+
+        Concurrent identical requests wait for the first one instead of
+        calling the provider again. With a VisionClient the call goes
+        through its rate limiter, retries and circuit breaker.
+        """
+        key = self.make_key(model, prompt, image)
+
+        def load():
+            response = self.get(key)
+            if response is None:
+                response = client.call(call) if client else call()
+                if response:
+                    self.put(key, model, response)
+            return response
+
+        return self._flight.do(key, load)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_vision_cache():
+    """Get the process-wide vision response cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = VisionResponseCache()
+    return _cache
@@ -0,0 +1,273 @@
+import os
+import random
+import threading
+import time
+
+# Requests per second and burst size allowed per provider, shared by every
+# verification in the process (batch workers included)
+PROVIDER_LIMITS = {
+    "gemini": {"rate": float(os.getenv("GEMINI_RATE_LIMIT", "4")), "burst": 4},
+    "groq": {"rate": float(os.getenv("GROQ_RATE_LIMIT", "2")), "burst": 2}
+}
+
+# Provider endpoints; point these at a local stub server to test without the real APIs
+PROVIDER_BASE_URLS = {
+    "gemini": os.getenv("GEMINI_BASE_URL"),
+    "groq": os.getenv("GROQ_BASE_URL")
+}
+
+# Retries of 429, 5xx and connection errors, with full-jitter exponential backoff
+VISION_MAX_RETRIES = 4
+VISION_BACKOFF_BASE = 0.5
+VISION_BACKOFF_MAX = 20.0
+
+# Limiter waits longer than this fail the request instead of queueing it
+VISION_LIMIT_WAIT = 60.0
+
+# Consecutive failures that open the breaker, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30.0
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Exception class names used by the provider SDKs for throttling and outages
+RETRYABLE_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "RateLimitError", "APIConnectionError", "APITimeoutError"
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while its circuit breaker is open"""
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token if one is available, otherwise return the seconds until one is"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout=None):
+        """Block until a token is taken; False if that would take longer than timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._reserve()
+            if wait == 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Stops calls to a failing provider for a while, then lets one trial call through
+
+    closed: calls pass and consecutive failures are counted. open: calls
+    fail fast until reset_seconds have passed. half_open: a single trial
+    call is allowed; its success closes the breaker, its failure reopens it.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go out now"""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._trial_running = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def retry_in(self):
+        """Seconds until the breaker lets a trial call through"""
+        with self._lock:
+            return max(0.0, self._opened_at + self.reset_seconds - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution and its result"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "result": None, "error": None}
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+
+def error_status(error):
+    """HTTP status of an SDK or urllib error, if it carries one"""
+    for source in (error, getattr(error, "response", None)):
+        for attr in ("status_code", "code", "status"):
+            value = getattr(source, attr, None)
+            value = value() if callable(value) else value
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def is_retryable(error):
+    """Throttling, server errors and dropped connections are retried; anything else is not"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERRORS:
+        return True
+    return error_status(error) in RETRYABLE_STATUS
+
+
+def _retry_after(error):
+    """Seconds from a Retry-After header on the error, if any"""
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class VisionClient:
+    """Rate limiting, retries and a circuit breaker around one provider's API calls"""
+
+    def __init__(self, provider, rate, burst, max_retries=VISION_MAX_RETRIES,
+                 backoff_base=VISION_BACKOFF_BASE, backoff_max=VISION_BACKOFF_MAX, breaker=None):
+        self.provider = provider
+        self.limiter = TokenBucket(rate, burst)
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.base_url = PROVIDER_BASE_URLS.get(provider)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def _backoff(self, attempt, error):
+        """Full jitter: uniform in [0, base * 2^attempt], capped, and never shorter than Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = _retry_after(error)
+        return min(self.backoff_max, max(delay, retry_after)) if retry_after else delay
+
+    def call(self, fn):
+        """Run fn() under the provider's rate limit, retrying transient failures"""
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                with self._lock:
+                    self.rejected += 1
+                raise CircuitOpenError(
+                    f"{self.provider} is unavailable after repeated failures; retrying in {self.breaker.retry_in():.0f}s"
+                )
+            if not self.limiter.acquire(timeout=VISION_LIMIT_WAIT):
+                raise TimeoutError(f"{self.provider} rate limit queue is full")
+
+            with self._lock:
+                self.calls += 1
+            try:
+                result = fn()
+            except Exception as e:
+                retryable = is_retryable(e)
+                if retryable:
+                    self.breaker.record_failure()
+                else:
+                    # The provider answered; a bad request is not an outage
+                    self.breaker.record_success()
+                if not retryable or attempt == self.max_retries:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self._backoff(attempt, e))
+                continue
+            self.breaker.record_success()
+            return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "rejected": self.rejected,
+                "breaker": self.breaker.state
+            }
+
+
+def gemini_client_options():
+    """Extra genai.configure arguments sending Gemini requests to GEMINI_BASE_URL when it is set"""
+    base_url = PROVIDER_BASE_URLS["gemini"]
+    if not base_url:
+        return {}
+    return {"transport": "rest", "client_options": {"api_endpoint": base_url}}
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_vision_client(provider):
+    """Get the process-wide client of a vision provider"""
+    client = _clients.get(provider)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(provider)
+            if client is None:
+                client = _clients[provider] = VisionClient(provider, **PROVIDER_LIMITS[provider])
+    return client
@@ -0,0 +1,354 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import streamlit as st
+from utils.vision_cache import get_vision_cache
+from utils.vision_client import get_vision_client, gemini_client_options, PROVIDER_BASE_URLS
+from utils.image_payload import get_image_payload
+
+try:
+    import google.generativeai as genai
+except ImportError:  # optional, the Gemini provider is skipped without it
+    genai = None
+
+try:
+    from groq import Groq
+except ImportError:  # optional, the Groq provider is skipped without it
+    Groq = None
+
+# Providers in order of preference; the first one available is the primary
+VISION_PROVIDERS = [name.strip() for name in os.getenv("VISION_PROVIDERS", "gemini,groq").split(",") if name.strip()]
+
+GEMINI_VISION_MODEL = "gemini-2.0-flash-exp"
+GROQ_VISION_MODEL = "llama-3.2-11b-vision-preview"
+
+# Hedging: when the primary has not answered after its HEDGE_PERCENTILE
+# latency, the next provider is asked too and the first good answer wins.
+# With fewer than HEDGE_MIN_SAMPLES latencies the percentile is not
+# trusted: the delay is HEDGE_WARMUP_FACTOR times the slowest latency seen
+# so far, never above HEDGE_DEFAULT_DELAY (used when none is known yet).
+HEDGE_ENABLED = os.getenv("VISION_HEDGE", "1") == "1"
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WARMUP_FACTOR = 2.0
+HEDGE_DEFAULT_DELAY = 8.0
+
+# Hedged requests whose pair (primary and hedge) is still running, losers
+# included. Beyond this no new hedge is started, so abandoned requests
+# cannot take the threads that primary requests need.
+HEDGE_MAX_IN_FLIGHT = 4
+
+# Threads for primary and failover requests; hedges get their own on top
+ROUTER_WORKERS = 8
+
+# Latencies kept per provider for the percentiles
+LATENCY_WINDOW = 500
+
+
+def _secret(*keys):
+    """Streamlit secret at the given path, or None when missing or outside Streamlit"""
+    try:
+        value = st.secrets
+        for key in keys:
+            value = value[key]
+        return value
+    except Exception:
+        return None
+
+
+class GeminiVisionProvider:
+    """Gemini multimodal model through google.generativeai"""
+
+    name = "gemini"
+
+    def __init__(self, api_key, model=GEMINI_VISION_MODEL):
+        self.model = model
+        genai.configure(api_key=api_key, **gemini_client_options())
+        self._model = genai.GenerativeModel(model)
+
+    def analyze(self, image, prompt):
+        """Response text for the prompt and document image; raises on failure"""
+        payload_stats = {}
+
+        def generate():
+            # Cropped, downsized JPEG shared with retries and other providers
+            payload = get_image_payload(image)
+            payload_stats.update(payload.stats())
+            content = {
+                "parts": [
+                    {"text": prompt},
+                    {"inline_data": {"mime_type": payload.mime_type, "data": payload.base64}}
+                ]
+            }
+            return self._model.generate_content(content).text
+
+        text = get_vision_cache().cached_call(self.model, prompt, image, generate, client=get_vision_client(self.name))
+        return text, payload_stats or None
+
+
+class GroqVisionProvider:
+    """Llama vision model through the Groq API"""
+
+    name = "groq"
+
+    def __init__(self, api_key, model=GROQ_VISION_MODEL):
+        self.model = model
+        # Retries are handled by the shared vision client, not the SDK
+        self._client = Groq(api_key=api_key, base_url=PROVIDER_BASE_URLS["groq"], max_retries=0)
+
+    def analyze(self, image, prompt):
+        """Response text for the prompt and document image; raises on failure"""
+        payload_stats = {}
+
+        def complete():
+            payload = get_image_payload(image)
+            payload_stats.update(payload.stats())
+            response = self._client.chat.completions.create(
+                model=self.model,
+                messages=[{
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        {"type": "image", "image": payload.data_url}
+                    ]
+                }],
+                temperature=0.1,
+                max_tokens=1000
+            )
+            return response.choices[0].message.content
+
+        text = get_vision_cache().cached_call(self.model, prompt, image, complete, client=get_vision_client(self.name))
+        return text, payload_stats or None
+
+
+class LatencyTracker:
+    """Latencies of a provider's recent successful calls and its error count"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def record(self, seconds, ok=True):
+        with self._lock:
+            self.calls += 1
+            if ok:
+                self._latencies.append(seconds)
+            else:
+                self.errors += 1
+
+    def percentile(self, q, min_samples=1):
+        """q-th percentile latency in seconds, or None with fewer than min_samples calls"""
+        with self._lock:
+            if len(self._latencies) < max(1, min_samples):
+                return None
+            return float(np.percentile(self._latencies, q))
+
+    def slowest(self):
+        """Slowest recorded latency in seconds, or None when nothing was recorded"""
+        with self._lock:
+            return max(self._latencies) if self._latencies else None
+
+    def stats(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            calls, errors = self.calls, self.errors
+        return {
+            "calls": calls,
+            "errors": errors,
+            "p50": float(np.percentile(latencies, 50)) if latencies else None,
+            "p95": float(np.percentile(latencies, 95)) if latencies else None
+        }
+
+
+class VisionRouter:
+    """Sends a vision request to the preferred provider, failing over and hedging across the others
+
+    Providers are tried in order. An error moves on to the next provider
+    at once; a primary slower than its own p95 (HEDGE_PERCENTILE) gets a
+    hedged request to the next provider and whichever good answer comes
+    first is returned, so one slow backend does not set the tail latency
+    of verifications. A losing request that has not started is cancelled;
+    one already running cannot be stopped and finishes in the background
+    (its answer still lands in the vision cache). At most
+    max_hedges_in_flight hedged pairs run at once, on threads of their own.
+
+    Latencies are only recorded for requests that reached the provider:
+    cache hits and callers that shared another caller's request (vision
+    cache single-flight) say nothing about the provider's speed.
+    """
+
+    def __init__(self, providers, hedge=HEDGE_ENABLED, hedge_percentile=HEDGE_PERCENTILE,
+                 hedge_min_samples=HEDGE_MIN_SAMPLES, hedge_default_delay=HEDGE_DEFAULT_DELAY,
+                 hedge_warmup_factor=HEDGE_WARMUP_FACTOR, max_hedges_in_flight=HEDGE_MAX_IN_FLIGHT):
+        self.providers = list(providers)
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_warmup_factor = hedge_warmup_factor
+        self.latency = {provider.name: LatencyTracker() for provider in self.providers}
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+        self.failovers = 0
+        self._hedge_slots = threading.BoundedSemaphore(max_hedges_in_flight)
+        self._executor = ThreadPoolExecutor(
+            max_workers=ROUTER_WORKERS + max_hedges_in_flight, thread_name_prefix="vision"
+        )
+
+    def hedge_delay(self, provider):
+        """Seconds to wait on a provider before hedging
+
+        Its HEDGE_PERCENTILE latency once hedge_min_samples are recorded;
+        before that hedge_warmup_factor times the slowest latency seen,
+        capped at hedge_default_delay, which also applies with no samples.
+        """
+        tracker = self.latency[provider.name]
+        delay = tracker.percentile(self.hedge_percentile, self.hedge_min_samples)
+        if delay is not None:
+            return delay
+        slowest = tracker.slowest()
+        if slowest is None:
+            return self.hedge_default_delay
+        return min(self.hedge_default_delay, self.hedge_warmup_factor * slowest)
+
+    def _release_hedge_slot(self, futures):
+        """Give the hedge slot back once every request of the hedged pair has finished"""
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def finished(future):
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self._hedge_slots.release()
+
+        for future in futures:
+            future.add_done_callback(finished)
+
+    def _ordered(self):
+        """Providers with a closed breaker first, keeping the configured preference"""
+        return sorted(self.providers, key=lambda provider: get_vision_client(provider.name).breaker.state == "open")
+
+    def _timed(self, provider, image, prompt):
+        start = time.monotonic()
+        try:
+            text, payload = provider.analyze(image, prompt)
+            if not text:
+                raise ValueError(f"{provider.name} returned an empty answer")
+        except Exception:
+            self.latency[provider.name].record(time.monotonic() - start, ok=False)
+            raise
+        seconds = time.monotonic() - start
+        # Cache hits and single-flight followers never build a payload
+        if payload is not None:
+            self.latency[provider.name].record(seconds)
+        return {"text": text, "payload": payload, "provider": provider.name, "model": provider.model, "seconds": seconds}
+
+    def analyze(self, image, prompt):
+        """First good answer as {"text", "payload", "provider", "model", "seconds", "hedged", "failover", "errors"}"""
+        if not self.providers:
+            raise RuntimeError("No vision provider is configured")
+
+        waiting = list(self._ordered())
+        running = {}
+        errors = []
+        hedged = False
+
+        def start_next():
+            provider = waiting.pop(0)
+            running[self._executor.submit(self._timed, provider, image, prompt)] = provider
+
+        start_next()
+        first = next(iter(running.values()))
+        may_hedge = self.hedge
+        while running:
+            # Only the first request in flight is hedged; failover requests are not
+            timeout = self.hedge_delay(first) if may_hedge and waiting and not hedged and not errors else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                may_hedge = False
+                if not self._hedge_slots.acquire(blocking=False):
+                    # Too many hedged pairs still running: keep waiting on the primary
+                    with self._lock:
+                        self.hedges_skipped += 1
+                    continue
+                # Primary is slower than usual: hedge with the next provider
+                hedged = True
+                with self._lock:
+                    self.hedges += 1
+                start_next()
+                self._release_hedge_slot(list(running))
+                continue
+
+            for future in done:
+                provider = running.pop(future)
+                try:
+                    answer = future.result()
+                except Exception as e:
+                    errors.append(f"{provider.name}: {str(e)}")
+                    continue
+                # The loser is cancelled if it has not started yet
+                for loser in running:
+                    loser.cancel()
+                with self._lock:
+                    if hedged and provider is not first:
+                        self.hedge_wins += 1
+                    if errors:
+                        self.failovers += 1
+                answer.update({"hedged": hedged, "failover": bool(errors), "errors": errors})
+                return answer
+
+            if not running and waiting:
+                # Every request so far failed: fail over to the next provider
+                start_next()
+
+        raise RuntimeError("All vision providers failed: " + "; ".join(errors))
+
+    def stats(self):
+        with self._lock:
+            router = {
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "hedges_skipped": self.hedges_skipped,
+                "failovers": self.failovers
+            }
+        router["providers"] = {name: tracker.stats() for name, tracker in self.latency.items()}
+        return router
+
+
+def _default_providers():
+    """Providers whose SDK is installed and API key is set, in VISION_PROVIDERS order"""
+    providers = []
+    for name in VISION_PROVIDERS:
+        if name == "gemini" and genai is not None:
+            api_key = os.getenv("GEMINI_API_KEY") or _secret("api", "GEMINI_API_KEY") or _secret("GEMINI_API_KEY")
+            if api_key:
+                providers.append(GeminiVisionProvider(api_key))
+        elif name == "groq" and Groq is not None:
+            api_key = os.getenv("GROQ_API_KEY") or _secret("GROQ_API_KEY")
+            if api_key:
+                providers.append(GroqVisionProvider(api_key))
+    return providers
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_vision_router():
+    """Get the process-wide vision router"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = VisionRouter(_default_providers())
+    return _router